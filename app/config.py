@@ -1,9 +1,66 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     neo4j_uri: str = "bolt://localhost:7697"
     neo4j_user: str = "neo4j"
     neo4j_password: str = "password"
+    neo4j_max_connection_pool_size: int = 50
+    neo4j_connection_acquisition_timeout: float = 60.0
+    # Shared GDS projection catalog
+    projection_idle_ttl_seconds: float = 300.0
+    projection_memory_budget_bytes: int = 2 * 1024 ** 3
+    max_concurrent_projections: int = 4
+    orphan_projection_min_age_seconds: float = 900.0
+    orphan_sweep_interval_seconds: float = 300.0
+    # Pagination of ranked results
+    pagination_default_limit: int = 50
+    pagination_prefetch_pages: int = 5
+    result_set_ttl_seconds: float = 600.0
+    result_set_max_entries: int = 256
+    # Result cache (backend: memory or redis)
+    result_cache_enabled: bool = True
+    result_cache_backend: str = "memory"
+    result_cache_redis_url: str = "redis://localhost:6379/0"
+    result_cache_max_bytes: int = 256 * 1024 ** 2
+    result_cache_ttl_seconds: float = 3600.0
+    result_cache_fingerprint_ttl_seconds: float = 1.0
+    # Optional query returning a last-write marker as `marker`,
+    # e.g: "MATCH (m:GraphMeta) RETURN m.updated_at as marker"
+    result_cache_write_marker_query: Optional[str] = None
+    # Anomaly detection: KLL sketch size (quantile rank error ~ 2.3 / k^0.97)
+    anomaly_sketch_k: int = 200
+    # Online anomaly monitors
+    monitor_interval_seconds: float = 10.0
+    monitor_alert_history: int = 1000
+    monitor_change_log_size: int = 100_000
+    # Degrees observed before a monitor starts raising alerts
+    monitor_min_observations: int = 30
+    # Background jobs
+    job_workers: int = 2
+    job_queue_size: int = 100
+    job_retention_seconds: float = 3600.0
+    # In-process CSR snapshots (native engines)
+    snapshot_memory_budget_bytes: int = 1024 ** 3
+    snapshot_fetch_size: int = 10000
+    snapshot_default_weight: float = 1.0
+    # ALT landmark indexes (distance vectors memory-mapped from this directory)
+    landmark_index_dir: str = "data/landmarks"
+    landmark_count: int = 16
+    # Default time budget of a k-shortest paths query
+    k_shortest_time_budget_seconds: float = 5.0
+    # Largest sources x targets distance matrix computed by one request
+    path_matrix_max_pairs: int = 1_000_000
+    # GRAIL labelings of a reachability index (more: fewer searches, larger index)
+    reachability_traversals: int = 5
+    # Batch link prediction: memory budget of one scoring chunk, directory of the exported pairs
+    link_batch_memory_bytes: int = 256 * 1024 * 1024
+    link_batch_export_dir: str = "data/exports"
+    # Process pool of the native engines (None: one worker per CPU)
+    engine_workers: Optional[int] = None
+    # Below this amount of work (e.g: sources x relationships) engines run in-process
+    engine_parallel_min_work: int = 50_000_000
     app_name: str = "GraphAnalysis"
     debug: bool = False
 
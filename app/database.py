@@ -1,30 +1,43 @@
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase, AsyncDriver
 from app.config import settings
 
 class Neo4jConnection:
     def __init__(self):
-        # self._driver: AsyncDriver | None = None
-        self._driver = GraphDatabase.driver(
+        self._driver: AsyncDriver | None = None
+
+    def _create_driver(self) -> AsyncDriver:
+        return AsyncGraphDatabase.driver(
             settings.neo4j_uri,
-            auth=(settings.neo4j_user, settings.neo4j_password)
+            auth=(settings.neo4j_user, settings.neo4j_password),
+            max_connection_pool_size=settings.neo4j_max_connection_pool_size,
+            connection_acquisition_timeout=settings.neo4j_connection_acquisition_timeout
         )
 
-    def connect(self):
+    async def connect(self) -> AsyncDriver:
+        """Open the driver pool (called from the application lifespan)"""
+        if self._driver is None:
+            self._driver = self._create_driver()
+        await self.verify_connectivity()
         return self._driver
 
-    def verify_connectivity(self):
+    async def verify_connectivity(self):
         try:
-            self._driver.verify_connectivity()
+            await self._driver.verify_connectivity()
             print("Neo4j connection is established")
         except Exception as e:
             print(f"Connection error: {e}")
 
-    def close(self):
+    async def close(self):
         if self._driver:
-            self._driver.close()
+            await self._driver.close()
+            self._driver = None
             print("Neo4j driver is unconnected successfully")
 
-    def get_driver(self):
+    def get_driver(self) -> AsyncDriver:
+        # The driver does not open any connection until the first session,
+        # so it is safe to create it lazily outside of the lifespan (e.g: scripts)
+        if self._driver is None:
+            self._driver = self._create_driver()
         return self._driver
 
-neo4j_connection = Neo4jConnection()
\ No newline at end of file
+neo4j_connection = Neo4jConnection()
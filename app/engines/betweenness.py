@@ -0,0 +1,247 @@
+import asyncio
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.engines.csr import CSRGraph
+from app.engines.parallel import attach, chunks, map_reduce, report_progress, share, use_pool, worker_count
+from app.engines.union_find import UnionFind
+
+# Constant of the Riondato-Kornaropoulos sample size (c ~ 0.5)
+RK_CONSTANT = 0.5
+TASKS_PER_WORKER = 4
+# Smallest first round of the progressive pair sampling
+FIRST_ROUND_SAMPLES = 1024
+
+
+def expand(offsets: np.ndarray, targets: np.ndarray, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """All (u, v) edges leaving the frontier nodes"""
+    starts = offsets[frontier]
+    counts = offsets[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return frontier[:0], targets[:0]
+    positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+    return np.repeat(frontier, counts), targets[positions]
+
+
+def shortest_path_dag(offsets: np.ndarray, targets: np.ndarray, source: int,
+                      target: int = -1) -> Tuple[np.ndarray, np.ndarray, List[Tuple[np.ndarray, np.ndarray]]]:
+    """
+    Level-synchronous BFS from source
+
+    Returns (dist, sigma, levels): sigma counts the shortest paths, levels[d] holds
+    the DAG edges from distance d to d + 1. Stops early once target is reached.
+    """
+    n = len(offsets) - 1
+    dist = np.full(n, -1, dtype=np.int64)
+    sigma = np.zeros(n)
+    dist[source] = 0
+    sigma[source] = 1.0
+    levels = []
+    frontier = np.array([source], dtype=np.int64)
+    depth = 0
+    while len(frontier):
+        u, v = expand(offsets, targets, frontier)
+        dist[v[dist[v] == -1]] = depth + 1
+        on_dag = dist[v] == depth + 1
+        u, v = u[on_dag], v[on_dag]
+        if len(v) == 0:
+            break
+        np.add.at(sigma, v, sigma[u])
+        levels.append((u, v))
+        if target >= 0 and dist[target] >= 0:
+            break
+        frontier = np.unique(v)
+        depth += 1
+    return dist, sigma, levels
+
+
+def brandes_chunk(shared: dict, sources: np.ndarray) -> np.ndarray:
+    """Sum of the Brandes dependencies of a chunk of sources (runs in a pool worker)"""
+    arrays = attach(shared)
+    offsets, targets = arrays["offsets"], arrays["targets"]
+    scores = np.zeros(len(offsets) - 1)
+    for source in sources:
+        _, sigma, levels = shortest_path_dag(offsets, targets, int(source))
+        delta = np.zeros(len(scores))
+        for u, v in reversed(levels):
+            np.add.at(delta, u, sigma[u] / sigma[v] * (1.0 + delta[v]))
+        delta[source] = 0.0
+        scores += delta
+    return scores
+
+
+def rk_chunk(shared: dict, samples: int, seed: int) -> np.ndarray:
+    """
+    Riondato-Kornaropoulos samples: pick a random pair, a random shortest path
+    between them (by sigma), and count its inner nodes
+    """
+    arrays = attach(shared)
+    offsets, targets = arrays["offsets"], arrays["targets"]
+    n = len(offsets) - 1
+    rng = np.random.default_rng(seed)
+    counts = np.zeros(n)
+    for _ in range(samples):
+        source, target = rng.choice(n, size=2, replace=False)
+        dist, sigma, levels = shortest_path_dag(offsets, targets, int(source), int(target))
+        if dist[target] < 0:
+            continue
+        current = int(target)
+        while dist[current] > 1:
+            u, v = levels[dist[current] - 1]
+            predecessors = u[v == current]
+            weights = sigma[predecessors]
+            current = int(rng.choice(predecessors, p=weights / weights.sum()))
+            counts[current] += 1.0
+    return counts
+
+
+def vertex_diameter_bound(graph: CSRGraph, undirected: bool) -> int:
+    """
+    Upper bound of the vertex diameter (nodes on the longest shortest path), over every
+    weakly connected component
+
+    - undirected: one BFS per component (run together as a multi-source BFS); a root of
+      eccentricity e bounds the component diameter by 2e, hence 2e + 1 nodes
+    - directed: shortest paths can be much longer than the undirected distances, so the
+      size of the largest component is used, as Riondato-Kornaropoulos do
+    """
+    n = graph.node_count
+    sets = UnionFind(n)
+    sets.union_many(graph.edge_sources().astype(np.int64), graph.targets.astype(np.int64))
+    component = sets.compress()
+    sizes = np.bincount(component, minlength=n)
+    if not undirected:
+        return int(sizes.max())
+    roots = np.flatnonzero(component == np.arange(n))
+    dist = np.full(n, -1, dtype=np.int64)
+    dist[roots] = 0
+    frontier = roots
+    depth = 0
+    while len(frontier):
+        _, v = expand(graph.offsets, graph.targets, frontier)
+        frontier = np.unique(v[dist[v] == -1])
+        depth += 1
+        dist[frontier] = depth
+    eccentricity = np.zeros(n, dtype=np.int64)
+    np.maximum.at(eccentricity, component, dist)
+    return int(np.minimum(sizes[roots], 2 * eccentricity[roots] + 1).max())
+
+
+def rk_sample_size(epsilon: float, delta: float, vertex_diameter: int) -> int:
+    return int(math.ceil(RK_CONSTANT / epsilon ** 2 * (
+        math.floor(math.log2(max(vertex_diameter - 2, 1))) + 1 + math.log(1.0 / delta))))
+
+
+def rk_epsilon(samples: int, delta: float, vertex_diameter: int) -> float:
+    """Error bound guaranteed (with probability 1 - delta) by a number of samples"""
+    return math.sqrt(RK_CONSTANT / samples * (
+        math.floor(math.log2(max(vertex_diameter - 2, 1))) + 1 + math.log(1.0 / delta)))
+
+
+def bernstein_epsilon(counts: np.ndarray, samples: int, delta: float) -> float:
+    """
+    Largest empirical Bernstein deviation (Maurer-Pontil) of the per-node sample means,
+    holding for all the nodes at once with probability 1 - delta
+
+    A sample counts a node at most once, so its variance is p(1 - p): low-betweenness
+    nodes, i.e. almost all of them, converge long before the worst-case sample size.
+    """
+    if samples < 2:
+        return math.inf
+    log_term = math.log(4 * len(counts) / delta)
+    p = counts / samples
+    variance = float((p * (1 - p)).max()) * samples / (samples - 1)
+    return math.sqrt(2 * variance * log_term / samples) + 7 * log_term / (3 * (samples - 1))
+
+
+def progressive_schedule(limit: int) -> List[int]:
+    """Cumulative sample sizes of the rounds: doubling from limit / 64 (at least FIRST_ROUND_SAMPLES) to limit"""
+    size = min(limit, max(FIRST_ROUND_SAMPLES, limit // 64))
+    schedule = [size]
+    while size < limit:
+        size = min(limit, size * 2)
+        schedule.append(size)
+    return schedule
+
+
+async def betweenness(graph: CSRGraph, undirected: bool = False, sampling_size: Optional[int] = None,
+                      sampling_seed: int = 42, epsilon: Optional[float] = None, delta: float = 0.1,
+                      max_samples: Optional[int] = None) -> Tuple[np.ndarray, dict]:
+    """
+    Betweenness centrality on a CSR graph
+
+    - exact (default): Brandes from every node
+    - sampling_size: Brandes from a random subset of sources, scaled by n / sampling_size
+    - epsilon: Riondato-Kornaropoulos pair sampling, |estimate - exact| <= epsilon * n(n-1)
+      with probability 1 - delta. Samples are drawn in doubling rounds, stopped as soon as
+      the empirical Bernstein bound reaches epsilon, at the latest at the worst-case size
+      given by the vertex diameter bound
+
+    Single-source passes / samples are spread over the process pool (CSR in shared memory).
+    Returns (scores, info) where info describes the mode and the error bound.
+    """
+    n = graph.node_count
+    m = graph.relationship_count
+    if n < 3 or m == 0:
+        return np.zeros(n), {"mode": "exact", "error_bound": 0.0}
+    pair_scale = n * (n - 1) / (2.0 if undirected else 1.0)
+    task_count = worker_count() * TASKS_PER_WORKER
+
+    if epsilon:
+        vertex_diameter = await asyncio.to_thread(vertex_diameter_bound, graph, undirected)
+        # Half of delta covers the Riondato-Kornaropoulos bound at the full sample size,
+        # the other half the stopping checks of every round
+        limit = rk_sample_size(epsilon, delta / 2, vertex_diameter)
+        if max_samples:
+            limit = min(limit, max_samples)
+        schedule = progressive_schedule(limit)
+        counts = np.zeros(n)
+        samples = 0
+        achieved = math.inf
+        stopped_by = "sample_limit"
+        parallel = use_pool(limit * m // max(n, 1))
+        with share(parallel, offsets=graph.offsets, targets=graph.targets) as shared:
+            for size in schedule:
+                batches = [len(batch) for batch in chunks(np.arange(size - samples), task_count)]
+                parts = await map_reduce(rk_chunk, [
+                    (shared, count, sampling_seed + samples + i) for i, count in enumerate(batches)
+                ], parallel, report=False)
+                counts += np.sum(parts, axis=0)
+                samples = size
+                report_progress(samples, limit, "samples")
+                achieved = bernstein_epsilon(counts, samples, delta / 2 / len(schedule))
+                if achieved <= epsilon:
+                    stopped_by = "converged"
+                    break
+        if samples == limit:
+            achieved = min(achieved, rk_epsilon(samples, delta / 2, vertex_diameter))
+        return counts / samples * pair_scale, {
+            "mode": "rk_sampling",
+            "samples": samples,
+            "sample_limit": limit,
+            "rounds": schedule.index(samples) + 1,
+            "stopped_by": stopped_by,
+            "vertex_diameter_bound": vertex_diameter,
+            "epsilon": achieved,
+            "delta": delta,
+            # Absolute bound on the (unnormalized) scores
+            "error_bound": achieved * pair_scale
+        }
+
+    sources = np.arange(n)
+    scale = 1.0
+    if sampling_size and 0 < sampling_size < n:
+        sources = np.sort(np.random.default_rng(sampling_seed).choice(n, size=sampling_size, replace=False))
+        scale = n / sampling_size
+    parallel = use_pool(len(sources) * m)
+    with share(parallel, offsets=graph.offsets, targets=graph.targets) as shared:
+        parts = await map_reduce(brandes_chunk, [
+            (shared, chunk) for chunk in chunks(sources, task_count)
+        ], parallel)
+    scores = np.sum(parts, axis=0) * scale / (2.0 if undirected else 1.0)
+    if scale == 1.0:
+        return scores, {"mode": "exact", "error_bound": 0.0}
+    return scores, {"mode": "source_sampling", "sources": len(sources), "error_bound": None}
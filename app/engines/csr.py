@@ -0,0 +1,138 @@
+from typing import Optional
+
+import numpy as np
+
+
+def index_dtype(n: int):
+    """Smallest index type able to address n nodes"""
+    return np.int32 if n < np.iinfo(np.int32).max else np.int64
+
+
+def top_indices(scores: np.ndarray, top_k: Optional[int] = None, positive_only: bool = True) -> np.ndarray:
+    """Indices of the highest scores, best first (top_k uses a partial sort)"""
+    candidates = np.flatnonzero(scores > 0) if positive_only else np.arange(len(scores))
+    if top_k and top_k < len(candidates):
+        part = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+        candidates = candidates[part]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class CSRGraph:
+    """
+    Compressed sparse row adjacency
+
+    - node_ids: Neo4j ids (int64, sorted); position i is the compact index of the node
+    - offsets: int64 array of size n + 1, neighbours of i are targets[offsets[i]:offsets[i + 1]]
+    - targets: compact indices (int32 unless the graph is huge), sorted within each row
+    - weights: float32 array aligned with targets (None for unweighted graphs)
+    """
+
+    def __init__(self, node_ids: np.ndarray, offsets: np.ndarray, targets: np.ndarray,
+                 weights: Optional[np.ndarray] = None, orientation: str = "NATURAL"):
+        self.node_ids = node_ids
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.orientation = orientation
+        self._views = {orientation: self}
+
+    @classmethod
+    def from_edges(cls, node_ids: np.ndarray, sources: np.ndarray, targets: np.ndarray,
+                   weights: Optional[np.ndarray] = None, orientation: str = "NATURAL",
+                   ids_are_indices: bool = False) -> "CSRGraph":
+        """
+        Build a CSR graph from an edge list
+
+        sources/targets are Neo4j ids (or compact indices when ids_are_indices);
+        edges with an endpoint outside node_ids are dropped.
+        """
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        if not ids_are_indices:
+            order = np.argsort(node_ids, kind="stable")
+            node_ids = node_ids[order]
+        n = len(node_ids)
+        dtype = index_dtype(n)
+
+        if ids_are_indices:
+            src = np.asarray(sources, dtype=np.int64)
+            dst = np.asarray(targets, dtype=np.int64)
+        else:
+            src = cls._lookup(node_ids, np.asarray(sources, dtype=np.int64))
+            dst = cls._lookup(node_ids, np.asarray(targets, dtype=np.int64))
+            keep = (src >= 0) & (dst >= 0)
+            if not keep.all():
+                src, dst = src[keep], dst[keep]
+                if weights is not None:
+                    weights = np.asarray(weights)[keep]
+
+        # Sort by (source, target): rows are contiguous and sorted (fast intersections)
+        order = np.lexsort((dst, src))
+        src, dst = src[order], dst[order]
+        if weights is not None:
+            weights = np.ascontiguousarray(np.asarray(weights, dtype=np.float32)[order])
+
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+        return cls(node_ids, offsets, np.ascontiguousarray(dst.astype(dtype)), weights, orientation)
+
+    @staticmethod
+    def _lookup(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        if len(sorted_ids) == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+        pos = np.searchsorted(sorted_ids, ids)
+        pos = np.minimum(pos, len(sorted_ids) - 1)
+        return np.where(sorted_ids[pos] == ids, pos, -1).astype(np.int64)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def relationship_count(self) -> int:
+        return len(self.targets)
+
+    @property
+    def nbytes(self) -> int:
+        size = self.node_ids.nbytes + self.offsets.nbytes + self.targets.nbytes
+        return size + (self.weights.nbytes if self.weights is not None else 0)
+
+    def index_of(self, neo4j_ids) -> np.ndarray:
+        """Compact indices of Neo4j ids (-1 for unknown ids)"""
+        return self._lookup(self.node_ids, np.atleast_1d(np.asarray(neo4j_ids, dtype=np.int64)))
+
+    def degrees(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def neighbors(self, i: int) -> np.ndarray:
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def edge_sources(self) -> np.ndarray:
+        """Source index of every edge (aligned with targets)"""
+        return np.repeat(np.arange(self.node_count, dtype=self.targets.dtype), self.degrees())
+
+    def view(self, orientation: str = "NATURAL") -> "CSRGraph":
+        """
+        Same graph with another orientation (cached)
+
+        NATURAL is the loaded direction, REVERSE the transpose, UNDIRECTED both directions.
+        """
+        orientation = orientation.upper()
+        if orientation not in self._views:
+            base = self._views.get("NATURAL", self)
+            src, dst = base.edge_sources(), base.targets
+            if orientation == "REVERSE":
+                graph = CSRGraph.from_edges(base.node_ids, dst, src, base.weights, "REVERSE", ids_are_indices=True)
+            elif orientation == "UNDIRECTED":
+                weights = np.concatenate([base.weights, base.weights]) if base.weights is not None else None
+                graph = CSRGraph.from_edges(
+                    base.node_ids, np.concatenate([src, dst]), np.concatenate([dst, src]),
+                    weights, "UNDIRECTED", ids_are_indices=True
+                )
+            else:
+                raise ValueError(f"Unknown orientation: {orientation}")
+            graph._views = self._views
+            self._views[orientation] = graph
+        return self._views[orientation]
+
+    def views_nbytes(self) -> int:
+        return sum(view.nbytes for view in self._views.values())
@@ -0,0 +1,106 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+from app.engines.csr import CSRGraph
+from app.engines.pagerank import pagerank
+
+FEATURES = ("in_degree", "out_degree", "weighted_degree", "clustering", "egonet_edges", "pagerank")
+# Wedges (pairs of neighbours) checked per vectorized batch when counting triangles
+WEDGE_BATCH = 5_000_000
+
+
+def simple_edges(graph: CSRGraph) -> Tuple[np.ndarray, np.ndarray]:
+    """Edges of the underlying simple undirected graph, once each as (u, v) with u < v"""
+    n = graph.node_count
+    src = graph.edge_sources().astype(np.int64)
+    dst = graph.targets.astype(np.int64)
+    low, high = np.minimum(src, dst), np.maximum(src, dst)
+    keys = np.sort(low[low != high] * n + high[low != high])
+    keys = keys[np.r_[True, keys[1:] != keys[:-1]]] if len(keys) else keys
+    return keys // n, keys % n
+
+
+def triangles(n: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """
+    Triangles through every node of a simple undirected graph (edges u < v)
+
+    Edges are oriented from the lower to the higher (degree, index) rank, so every
+    triangle is found once from its lowest node and wedges stay O(m^1.5); the
+    closing edge of each wedge is looked up in the sorted edge keys.
+    """
+    degree = np.bincount(u, minlength=n) + np.bincount(v, minlength=n)
+    rank = np.empty(n, dtype=np.int64)
+    rank[np.lexsort((np.arange(n), degree))] = np.arange(n)
+    forward = rank[u] < rank[v]
+    a, b = np.where(forward, u, v), np.where(forward, v, u)
+    keys = np.sort(a * n + b)
+    a, b = keys // n, keys % n
+
+    row_end = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(a, minlength=n), out=row_end[1:])
+    # Wedges (e, f) with f after e in the same row
+    pairs = row_end[a + 1] - np.arange(len(a)) - 1
+    first_pair = np.concatenate([[0], np.cumsum(pairs)])
+    counts = np.zeros(n, dtype=np.int64)
+    start = 0
+    while start < len(a):
+        stop = int(np.searchsorted(first_pair, first_pair[start] + WEDGE_BATCH, side="right")) - 1
+        stop = min(max(stop, start + 1), len(a))
+        edges = np.arange(start, stop)
+        first = np.repeat(edges, pairs[start:stop])
+        within = np.arange(len(first)) - np.repeat(first_pair[start:stop] - first_pair[start], pairs[start:stop])
+        second = first + 1 + within
+        x, y = b[first], b[second]
+        closing = np.where(rank[x] < rank[y], x * n + y, y * n + x)
+        # Sorted queries keep the binary searches cache friendly
+        order = np.argsort(closing)
+        position = np.minimum(np.searchsorted(keys, closing[order]), len(keys) - 1)
+        found = np.empty(len(order), dtype=bool)
+        found[order] = keys[position] == closing[order]
+        for nodes in (a[first][found], x[found], y[found]):
+            counts += np.bincount(nodes, minlength=n)
+        start = stop
+    return counts
+
+
+def node_features(graph: CSRGraph, weighted: bool = False, damping_factor: float = 0.85,
+                  max_iterations: int = 20) -> Dict[str, np.ndarray]:
+    """
+    Feature vector of every node, in vectorized passes over the CSR graph
+
+    - in_degree / out_degree: along the loaded direction
+    - weighted_degree: sum of the weights of incident relationships (degree when unweighted)
+    - clustering: local clustering coefficient of the simple undirected graph
+    - egonet_edges: relationships inside the egonet (neighbours + triangles, as in OddBall)
+    - pagerank
+    """
+    n = graph.node_count
+    out_degree = graph.degrees().astype(np.float64)
+    in_degree = np.bincount(graph.targets, minlength=n).astype(np.float64)
+    if weighted and graph.weights is not None:
+        src = graph.edge_sources()
+        weights = graph.weights.astype(np.float64)
+        weighted_degree = (np.bincount(src, weights=weights, minlength=n)
+                           + np.bincount(graph.targets, weights=weights, minlength=n))
+    else:
+        weighted_degree = in_degree + out_degree
+
+    u, v = simple_edges(graph)
+    neighbours = (np.bincount(u, minlength=n) + np.bincount(v, minlength=n)).astype(np.float64)
+    closed = triangles(n, u, v).astype(np.float64)
+    wedges = neighbours * (neighbours - 1) / 2
+    clustering = np.divide(closed, wedges, out=np.zeros(n), where=wedges > 0)
+
+    scores, _ = pagerank(graph, damping_factor=damping_factor, max_iterations=max_iterations,
+                         weighted=weighted)
+    return {
+        "in_degree": in_degree,
+        "out_degree": out_degree,
+        "weighted_degree": weighted_degree,
+        "clustering": clustering,
+        "egonet_edges": neighbours + closed,
+        "pagerank": scores,
+        # OddBall compares egonet edges with the egonet size (number of neighbours)
+        "egonet_nodes": neighbours
+    }
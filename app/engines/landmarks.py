@@ -0,0 +1,270 @@
+import asyncio
+import heapq
+import math
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.engines.csr import CSRGraph
+from app.engines.parallel import attach, chunks, map_reduce, share, use_pool, worker_count
+from app.engines.paths import _walk
+
+# Landmarks used by one query (the best bounds for its source / target pair)
+ACTIVE_LANDMARKS = 4
+
+
+def hop_distances(offsets: np.ndarray, targets: np.ndarray, source: int) -> np.ndarray:
+    """Level-synchronous BFS: hops from source to every node (inf when unreachable)"""
+    n = len(offsets) - 1
+    dist = np.full(n, np.inf)
+    dist[source] = 0
+    frontier = np.array([source], dtype=np.int64)
+    depth = 0
+    while len(frontier):
+        depth += 1
+        starts = offsets[frontier]
+        counts = offsets[frontier + 1] - starts
+        shift = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        reached = targets[shift + np.arange(int(counts.sum()))]
+        reached = np.unique(reached[np.isinf(dist[reached])])
+        dist[reached] = depth
+        frontier = reached.astype(np.int64)
+    return dist
+
+
+def dijkstra_distances(offsets: np.ndarray, targets: np.ndarray, weights: np.ndarray, source: int) -> np.ndarray:
+    """Distances from source to every node (inf when unreachable), non-negative weights"""
+    dist = np.full(len(offsets) - 1, np.inf)
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        lo, hi = offsets[u], offsets[u + 1]
+        for v, w in zip(targets[lo:hi].tolist(), weights[lo:hi].tolist()):
+            candidate = d + w
+            if candidate < dist[v]:
+                dist[v] = candidate
+                heapq.heappush(heap, (candidate, v))
+    return dist
+
+
+def distance_rows(shared: dict, sources: np.ndarray) -> np.ndarray:
+    """Distance vectors of a chunk of landmarks, as float32 rows (runs in a pool worker)"""
+    arrays = attach(shared)
+    offsets, targets, weights = arrays["offsets"], arrays["targets"], arrays.get("weights")
+    rows = np.empty((len(sources), len(offsets) - 1), dtype=np.float32)
+    for i, source in enumerate(sources):
+        if weights is None:
+            rows[i] = hop_distances(offsets, targets, int(source))
+        else:
+            rows[i] = dijkstra_distances(offsets, targets, weights, int(source))
+    return rows
+
+
+def select_landmarks(graph: CSRGraph, k: int, seed: int = 42) -> np.ndarray:
+    """
+    Farthest-point landmarks: each new landmark is the node farthest (in hops) from
+    the landmarks already chosen; unreachable nodes come first, so every component
+    gets a landmark
+    """
+    n = graph.node_count
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    candidates = np.flatnonzero(graph.degrees() > 0)
+    landmarks = [int(rng.choice(candidates if len(candidates) else np.arange(n)))]
+    nearest = np.full(n, np.inf)
+    while len(landmarks) < min(k, n):
+        nearest = np.minimum(nearest, hop_distances(graph.offsets, graph.targets, landmarks[-1]))
+        nearest[landmarks] = -1
+        farthest = int(np.argmax(nearest))
+        if nearest[farthest] <= 0:
+            break
+        landmarks.append(farthest)
+    return np.array(landmarks, dtype=np.int64)
+
+
+class LandmarkIndex:
+    """
+    ALT index: distances between k landmarks and every node, memory-mapped from .npy files
+
+    - from_landmarks[v, i]: distance from landmark i to v
+    - to_landmarks[v, i]: distance from v to landmark i (the same array when undirected)
+
+    Rows are per node so the k distances of a node are contiguous.
+    """
+
+    def __init__(self, name: str, landmarks: np.ndarray, from_landmarks: np.ndarray, to_landmarks: np.ndarray,
+                 orientation: str, weighted: bool, files: List[str], build_seconds: float):
+        self.name = name
+        self.landmarks = landmarks
+        self.from_landmarks = from_landmarks
+        self.to_landmarks = to_landmarks
+        self.orientation = orientation
+        self.weighted = weighted
+        self.files = files
+        self.build_seconds = build_seconds
+        self.built_at = time.time()
+        # Loaded-at time of the snapshot the index was built from (staleness check)
+        self.snapshot_loaded_at: Optional[float] = None
+        # Build parameters, for rebuilds
+        self.relationship_type: Optional[str] = None
+        self.options: Dict = {}
+        # Plain ndarray views of the maps (indexing a np.memmap is much slower)
+        self._from = np.asarray(from_landmarks)
+        self._to = np.asarray(to_landmarks)
+
+    @property
+    def nbytes(self) -> int:
+        size = self.from_landmarks.nbytes
+        return size if self.to_landmarks is self.from_landmarks else size + self.to_landmarks.nbytes
+
+    def active_landmarks(self, source: int, target: int, count: int) -> np.ndarray:
+        """The landmarks giving the best lower bounds for this pair (searches only use those)"""
+        with np.errstate(invalid="ignore"):
+            forward = self._from[target] - self._from[source].astype(np.float64)
+            backward = self._to[source] - self._to[target].astype(np.float64)
+        best = np.fmax(np.nan_to_num(forward, nan=-np.inf), np.nan_to_num(backward, nan=-np.inf))
+        return np.argsort(-best, kind="stable")[:count]
+
+    def to_dict(self, node_ids: Optional[np.ndarray] = None) -> Dict:
+        return {
+            "name": self.name,
+            "landmarks": len(self.landmarks),
+            "landmark_ids": (node_ids[self.landmarks] if node_ids is not None else self.landmarks).tolist(),
+            "orientation": self.orientation,
+            "weighted": self.weighted,
+            "size_in_bytes": self.nbytes,
+            "files": self.files,
+            "built_at": self.built_at,
+            "build_seconds": self.build_seconds
+        }
+
+
+def _store(directory: str, name: str, suffix: str, rows: List[np.ndarray], n: int) -> Tuple[np.ndarray, str]:
+    """
+    Write (k, n) distance rows as an (n, k) float32 .npy file and map it back read-only
+
+    Every build gets its own file: the index being replaced keeps its mapping valid
+    until it is swapped out.
+    """
+    build = f"{time.time_ns():x}"
+    path = os.path.join(directory, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}.{suffix}.{build}.npy")
+    k = sum(len(chunk) for chunk in rows)
+    stored = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n, k))
+    column = 0
+    for chunk in rows:
+        stored[:, column:column + len(chunk)] = chunk.T
+        column += len(chunk)
+    stored.flush()
+    del stored
+    return np.load(path, mmap_mode="r"), path
+
+
+async def build_landmarks(name: str, forward: CSRGraph, backward: CSRGraph, k: int, weighted: bool,
+                          directory: str, seed: int = 42) -> LandmarkIndex:
+    """
+    Select k landmarks and compute their distance vectors (both directions when the
+    graph is directed), landmarks spread over the process pool; selection and file
+    writes run in a thread
+    """
+    started = time.perf_counter()
+    landmarks = await asyncio.to_thread(select_landmarks, forward, k, seed)
+    n = forward.node_count
+    os.makedirs(directory, exist_ok=True)
+    parallel = use_pool(len(landmarks) * max(forward.relationship_count, 1))
+    tasks = chunks(landmarks, worker_count() if parallel else 1)
+
+    async def distances(graph: CSRGraph) -> List[np.ndarray]:
+        arrays = {"offsets": graph.offsets, "targets": graph.targets}
+        if weighted and graph.weights is not None:
+            arrays["weights"] = graph.weights
+        with share(parallel, **arrays) as shared:
+            return await map_reduce(distance_rows, [(shared, chunk) for chunk in tasks], parallel)
+
+    from_landmarks, from_path = await asyncio.to_thread(_store, directory, name, "from", await distances(forward), n)
+    files = [from_path]
+    if backward is forward:
+        to_landmarks = from_landmarks
+    else:
+        # d(v, L) is a search from L along the reversed relationships
+        to_landmarks, to_path = await asyncio.to_thread(_store, directory, name, "to", await distances(backward), n)
+        files.append(to_path)
+    return LandmarkIndex(
+        name, landmarks, from_landmarks, to_landmarks, forward.orientation, weighted,
+        files, round(time.perf_counter() - started, 3)
+    )
+
+
+def alt_search(graph: CSRGraph, index: LandmarkIndex, source: int, target: int, weighted: bool = True,
+               active_count: int = ACTIVE_LANDMARKS) -> Tuple[float, Optional[List[int]], List[float]]:
+    """
+    A* with landmark lower bounds (ALT); returns (total cost, path, cumulative costs)
+    or (inf, None, []) when the target is unreachable
+
+    Only the active_count landmarks with the best bound between source and target are
+    used; a node's bound is computed once, when it is first reached.
+    """
+    if source == target:
+        return 0.0, [source], [0.0]
+    with np.errstate(invalid="ignore"):
+        return _alt_search(graph, index, source, target, weighted, active_count)
+
+
+def _alt_search(graph: CSRGraph, index: LandmarkIndex, source: int, target: int, weighted: bool,
+                active_count: int) -> Tuple[float, Optional[List[int]], List[float]]:
+    active = index.active_landmarks(source, target, active_count).tolist()
+    from_target = index.from_landmarks[target].tolist()
+    to_target = index.to_landmarks[target].tolist()
+    from_rows, to_rows = index._from, index._to
+
+    def lower_bound(v: int) -> float:
+        # Plain float arithmetic: per node this beats any vectorized call
+        from_v, to_v = from_rows[v].tolist(), to_rows[v].tolist()
+        bound = 0.0
+        for i in active:
+            if from_target[i] != math.inf or from_v[i] != math.inf:
+                bound = max(bound, from_target[i] - from_v[i])
+            if to_v[i] != math.inf or to_target[i] != math.inf:
+                bound = max(bound, to_v[i] - to_target[i])
+        return bound
+
+    start_bound = lower_bound(source)
+    if math.isinf(start_bound):
+        return math.inf, None, []
+    dist: Dict[int, float] = {source: 0.0}
+    parents: Dict[int, int] = {source: -1}
+    bounds: Dict[int, float] = {source: start_bound}
+    heap = [(start_bound, 0.0, source)]
+    settled = set()
+    use_weights = weighted and graph.weights is not None
+    while heap:
+        _, d, u = heapq.heappop(heap)
+        if u == target:
+            path = _walk(parents, target)[::-1]
+            return d, path, [dist[node] for node in path]
+        if u in settled:
+            continue
+        settled.add(u)
+        lo, hi = graph.offsets[u], graph.offsets[u + 1]
+        neighbours = graph.targets[lo:hi].tolist()
+        weights = graph.weights[lo:hi].tolist() if use_weights else [1.0] * len(neighbours)
+        for v, w in zip(neighbours, weights):
+            if w < 0:
+                raise ValueError("Dijkstra requires non-negative relationship weights")
+            candidate = d + w
+            if candidate < dist.get(v, math.inf):
+                bound = bounds.get(v)
+                if bound is None:
+                    bound = bounds[v] = lower_bound(v)
+                if bound == math.inf:
+                    continue
+                dist[v] = candidate
+                parents[v] = u
+                heapq.heappush(heap, (candidate + bound, candidate, v))
+    return math.inf, None, []
@@ -0,0 +1,197 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.engines.csr import CSRGraph
+from app.engines.parallel import report_progress
+
+# Fraction of the nodes allowed to move in one synchronous sweep (breaks swap oscillations)
+MOVE_FRACTION = 0.5
+MAX_STALLS = 3
+
+
+def compact(labels: np.ndarray) -> Tuple[np.ndarray, int]:
+    """Relabel to 0..k-1 (in order of first appearance by value)"""
+    unique, inverse = np.unique(labels, return_inverse=True)
+    return inverse.astype(np.int64), len(unique)
+
+
+def modularity(src: np.ndarray, dst: np.ndarray, weights: np.ndarray, labels: np.ndarray,
+               degrees: np.ndarray, total: float, resolution: float = 1.0) -> float:
+    """Modularity of a partition of a symmetric weighted adjacency (total = sum of all entries)"""
+    if total == 0:
+        return 0.0
+    internal = weights[labels[src] == labels[dst]].sum()
+    sigma = np.bincount(labels, weights=degrees)
+    return float(internal / total - resolution * (sigma ** 2).sum() / total ** 2)
+
+
+def _best_moves(src, dst, weights, n, labels, degrees, total, resolution, candidates=None):
+    """
+    Best community of every node given its neighbours' communities (vectorized)
+
+    Returns (nodes, best community, best score, score of staying), scores being
+    modularity gains scaled by total / 2.
+    """
+    sigma = np.bincount(labels, weights=degrees, minlength=n)
+    if candidates is not None:
+        src, dst, weights = src[candidates], dst[candidates], weights[candidates]
+    keys, inverse = np.unique(src * n + labels[dst], return_inverse=True)
+    links = np.bincount(inverse, weights=weights)
+    node, community = keys // n, keys % n
+    own = community == labels[node]
+    score = links - resolution * (sigma[community] - own * degrees[node]) * degrees[node] / total
+
+    stay = -resolution * (sigma[labels] - degrees) * degrees / total
+    stay[node[own]] = score[own]
+
+    # Highest score per node, smallest community id on ties (deterministic)
+    order = np.lexsort((community, -score, node))
+    node, community, score = node[order], community[order], score[order]
+    first = np.r_[True, node[1:] != node[:-1]]
+    return node[first], community[first], score[first], stay
+
+
+def local_moving(src, dst, weights, n, labels, degrees, total, resolution, rng,
+                 max_iterations: int, tolerance: float) -> Tuple[np.ndarray, int]:
+    """
+    Synchronous local-moving phase: every sweep moves a random half of the improving
+    nodes to their best neighbouring community, kept only if modularity increases
+    """
+    no_loops = src != dst
+    s, d, w = src[no_loops], dst[no_loops], weights[no_loops]
+    quality = modularity(src, dst, weights, labels, degrees, total, resolution)
+    stalls = 0
+    sweeps = 0
+    for sweeps in range(1, max_iterations + 1):
+        if len(s) == 0:
+            break
+        node, best, score, stay = _best_moves(s, d, w, n, labels, degrees, total, resolution)
+        improving = (score > stay[node] + 1e-12) & (best != labels[node])
+        if not improving.any():
+            break
+        move = improving & (rng.random(len(node)) < MOVE_FRACTION)
+        if not move.any():
+            continue
+        updated = labels.copy()
+        updated[node[move]] = best[move]
+        new_quality = modularity(src, dst, weights, updated, degrees, total, resolution)
+        if new_quality > quality:
+            gain = new_quality - quality
+            labels, quality = updated, new_quality
+            stalls = 0
+            if gain < tolerance:
+                break
+        else:
+            stalls += 1
+            if stalls >= MAX_STALLS:
+                break
+    return labels, sweeps
+
+
+def refine(src, dst, weights, n, labels, degrees, total, resolution, rng, max_iterations: int) -> np.ndarray:
+    """
+    Leiden refinement: inside every community, singletons merge into neighbouring
+    sub-communities. A moving node only joins the sub-community of a node that does
+    not move in the same sweep, so sub-communities stay connected.
+    """
+    inside = (labels[src] == labels[dst]) & (src != dst)
+    s, d, w = src[inside], dst[inside], weights[inside]
+    refined = np.arange(n, dtype=np.int64)
+    for _ in range(max_iterations):
+        if len(s) == 0:
+            break
+        singleton = (np.bincount(refined, minlength=n) == 1)[refined]
+        moving = singleton & (rng.random(n) < MOVE_FRACTION)
+        candidates = moving[s] & ~moving[d]
+        if not candidates.any():
+            continue
+        node, best, score, stay = _best_moves(s, d, w, n, refined, degrees, total, resolution, candidates)
+        merge = (score > stay[node] + 1e-12) & (best != refined[node])
+        if not merge.any():
+            if not singleton.any():
+                break
+            continue
+        refined = refined.copy()
+        refined[node[merge]] = best[merge]
+    return refined
+
+
+def aggregate(src, dst, weights, partition: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Graph of the communities (internal weight becomes a self-loop)"""
+    keys, inverse = np.unique(partition[src] * k + partition[dst], return_inverse=True)
+    return keys // k, keys % k, np.bincount(inverse, weights=weights)
+
+
+def louvain(graph: CSRGraph, leiden: bool = False, max_levels: int = 10, max_iterations: int = 10,
+            tolerance: float = 0.0001, resolution: float = 1.0, weighted: bool = False,
+            seed_labels: Optional[np.ndarray] = None, random_seed: int = 42) -> Tuple[np.ndarray, List[np.ndarray], Dict]:
+    """
+    Multi-level Louvain (or Leiden) on the undirected view of a CSR graph
+
+    - seed_labels: initial community of every node (-1: own community), for warm starts
+    - leiden: refine each level's communities into connected sub-communities before aggregating
+
+    Returns (final labels, labels of every level, info with modularity per level)
+    """
+    undirected = graph.view("UNDIRECTED")
+    n = graph.node_count
+    src = undirected.edge_sources().astype(np.int64)
+    dst = undirected.targets.astype(np.int64)
+    if weighted and undirected.weights is not None:
+        weights = undirected.weights.astype(np.float64)
+    else:
+        weights = np.ones(len(dst))
+    total = float(weights.sum())
+    rng = np.random.default_rng(random_seed)
+
+    if seed_labels is not None:
+        seeded = np.where(seed_labels >= 0, seed_labels, seed_labels.max(initial=0) + 1 + np.arange(n))
+        labels, _ = compact(seeded)
+    else:
+        labels = np.arange(n, dtype=np.int64)
+
+    membership = np.arange(n, dtype=np.int64)  # Original node -> node of the current level
+    levels: List[np.ndarray] = []
+    modularities: List[float] = []
+    iterations: List[int] = []
+    size = n
+    for _ in range(max_levels):
+        degrees = np.bincount(src, weights=weights, minlength=size)
+        labels, sweeps = local_moving(
+            src, dst, weights, size, labels, degrees, total, resolution, rng, max_iterations, tolerance
+        )
+        labels, communities = compact(labels)
+        quality = modularity(src, dst, weights, labels, degrees, total, resolution)
+        level = labels[membership]
+        if levels and np.array_equal(level, levels[-1]):
+            break  # Nothing changed at this level
+        levels.append(level)
+        modularities.append(quality)
+        iterations.append(sweeps)
+        report_progress(len(levels), max_levels, "levels")
+
+        if leiden:
+            partition, parts = compact(refine(
+                src, dst, weights, size, labels, degrees, total, resolution, rng, max_iterations
+            ))
+            # Aggregated nodes start in the community of their members
+            next_labels = np.zeros(parts, dtype=np.int64)
+            next_labels[partition] = labels
+        else:
+            partition, parts = labels, communities
+            next_labels = np.arange(parts, dtype=np.int64)
+        if parts == size:
+            break
+        src, dst, weights = aggregate(src, dst, weights, partition, parts)
+        membership = partition[membership]
+        labels, size = next_labels, parts
+
+    final = levels[-1] if levels else np.arange(n, dtype=np.int64)
+    return final, levels, {
+        "levels": len(levels),
+        "modularities": modularities,
+        "modularity": modularities[-1] if modularities else 0.0,
+        "iterations": iterations,
+        "communities": int(final.max(initial=-1) + 1)
+    }
@@ -0,0 +1,68 @@
+from typing import Tuple
+
+import numpy as np
+
+from app.engines.csr import CSRGraph
+
+# Mersenne prime of the universal hash functions (a * x + b) mod p
+HASH_PRIME = (1 << 31) - 1
+
+
+def minhash_signatures(graph: CSRGraph, num_hashes: int, seed: int = 42) -> np.ndarray:
+    """
+    MinHash signature of every neighbour set, shape (n, num_hashes)
+
+    Two nodes agree on one hash with probability equal to the Jaccard similarity of
+    their neighbour lists. Nodes without neighbours get HASH_PRIME everywhere.
+    """
+    n = graph.node_count
+    rng = np.random.default_rng(seed)
+    coefficients = rng.integers(1, HASH_PRIME, size=(num_hashes, 2), dtype=np.int64)
+    signatures = np.full((n, num_hashes), HASH_PRIME, dtype=np.uint32)
+    rows = np.flatnonzero(np.diff(graph.offsets) > 0)
+    targets = graph.targets.astype(np.int64)
+    for i, (a, b) in enumerate(coefficients.tolist()):
+        hashed = (a * targets + b) % HASH_PRIME
+        signatures[rows, i] = np.minimum.reduceat(hashed, graph.offsets[rows])
+    return signatures
+
+
+def lsh_candidates(signatures: np.ndarray, bands: int, rows: int, max_bucket: int = 100,
+                   seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Candidate pairs (u < v, each once) of banded LSH: nodes whose signatures agree on
+    all the rows of at least one band
+
+    Buckets larger than max_bucket (hubs of near-identical neighbour sets) are split
+    in random slices of max_bucket nodes, so the pairs stay O(n * max_bucket) per band.
+    """
+    n = len(signatures)
+    active = np.flatnonzero(signatures[:, 0] != HASH_PRIME) if n else np.zeros(0, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    pair_keys = []
+    for band in range(bands):
+        block = signatures[active, band * rows:(band + 1) * rows].astype(np.uint64)
+        keys = np.zeros(len(active), dtype=np.uint64)
+        for column in block.T:
+            keys = keys * np.uint64(1_000_003) + column
+        order = np.lexsort((rng.random(len(active)), keys))
+        keys, nodes = keys[order], active[order]
+        group_start = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.zeros(0, dtype=np.int64)
+        group = np.repeat(np.arange(len(group_start)), np.diff(np.r_[group_start, len(keys)]))
+        within = np.arange(len(keys)) - group_start[group]
+        # Slices of max_bucket nodes: (bucket, slice) becomes the unit pairs are made in
+        slice_start = group_start[group] + (within // max_bucket) * max_bucket
+        slice_end = np.minimum(slice_start + max_bucket, np.r_[group_start[1:], len(keys)][group])
+        after = slice_end - np.arange(len(keys)) - 1
+        first = np.repeat(np.arange(len(keys)), after)
+        if len(first) == 0:
+            continue
+        offsets = np.cumsum(after) - after
+        second = first + 1 + np.arange(len(first)) - np.repeat(offsets, after)
+        u, v = nodes[first], nodes[second]
+        pair_keys.append(np.minimum(u, v).astype(np.int64) * n + np.maximum(u, v))
+    if not pair_keys:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    keys = np.sort(np.concatenate(pair_keys))
+    keys = keys[np.r_[True, keys[1:] != keys[:-1]]]
+    return keys // n, keys % n
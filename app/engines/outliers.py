@@ -0,0 +1,168 @@
+import math
+from typing import List, Tuple
+
+import numpy as np
+
+from app.engines.parallel import attach, chunks, map_reduce, share, use_pool, worker_count
+
+EULER_GAMMA = 0.5772156649
+# Rows scored together by every isolation tree
+SCORE_BLOCK = 16384
+
+
+def robust_mahalanobis(features: np.ndarray, support_fraction: float = 0.75, c_steps: int = 10) -> np.ndarray:
+    """
+    Mahalanobis distance of every row to a robust location / covariance
+
+    The estimate starts from the median and MAD, then runs concentration steps
+    (as FastMCD): refit mean and covariance on the support_fraction closest rows
+    until the support stops changing, so the outliers do not mask themselves.
+    """
+    n, d = features.shape
+    if n == 0:
+        return np.zeros(0)
+    center = np.median(features, axis=0)
+    scale = 1.4826 * np.median(np.abs(features - center), axis=0)
+    scale[scale == 0] = 1.0
+    distances = (((features - center) / scale) ** 2).sum(axis=1)
+    h = max(d + 1, int(n * support_fraction))
+    support = None
+    for _ in range(c_steps):
+        closest = np.argpartition(distances, min(h, n) - 1)[:h]
+        closest.sort()
+        if support is not None and np.array_equal(closest, support):
+            break
+        support = closest
+        center = features[support].mean(axis=0)
+        covariance = np.atleast_2d(np.cov(features[support], rowvar=False))
+        precision = np.linalg.pinv(covariance)
+        centered = features - center
+        distances = ((centered @ precision) * centered).sum(axis=1)
+    return np.sqrt(np.maximum(distances, 0))
+
+
+def average_path(size) -> np.ndarray:
+    """Average path length of an unsuccessful BST search among size points (c(n) of iForest)"""
+    size = np.asarray(size, dtype=np.float64)
+    safe = np.maximum(size, 2)
+    c = 2 * (np.log(safe - 1) + EULER_GAMMA) - 2 * (safe - 1) / safe
+    return np.where(size > 2, c, np.where(size == 2, 1.0, 0.0))
+
+
+def _grow_tree(features: np.ndarray, rng: np.random.Generator, height_limit: int) -> Tuple[np.ndarray, ...]:
+    """One isolation tree as flat arrays: (feature, threshold, left, right, depth, size); left = -1 for leaves"""
+    feature: List[int] = []
+    threshold: List[float] = []
+    left: List[int] = []
+    right: List[int] = []
+    depth: List[int] = []
+    size: List[int] = []
+
+    def add(rows: np.ndarray, level: int) -> int:
+        feature.append(-1)
+        threshold.append(0.0)
+        left.append(-1)
+        right.append(-1)
+        depth.append(level)
+        size.append(len(rows))
+        return len(size) - 1
+
+    stack = [(add(np.arange(len(features)), 0), np.arange(len(features)))]
+    while stack:
+        node, rows = stack.pop()
+        if depth[node] >= height_limit or len(rows) <= 1:
+            continue
+        sample = features[rows]
+        low, high = sample.min(axis=0), sample.max(axis=0)
+        splittable = np.flatnonzero(high > low)
+        if len(splittable) == 0:
+            continue
+        f = int(rng.choice(splittable))
+        t = float(rng.uniform(low[f], high[f]))
+        goes_left = sample[:, f] < t
+        feature[node], threshold[node] = f, t
+        left[node] = add(rows[goes_left], depth[node] + 1)
+        right[node] = add(rows[~goes_left], depth[node] + 1)
+        stack.append((left[node], rows[goes_left]))
+        stack.append((right[node], rows[~goes_left]))
+    return (np.array(feature), np.array(threshold), np.array(left), np.array(right),
+            np.array(depth, dtype=np.float64), np.array(size))
+
+
+def _prepare_tree(tree: Tuple[np.ndarray, ...]) -> Tuple[np.ndarray, ...]:
+    """Leaves point to themselves, so every row can take the same number of steps"""
+    feature, threshold, left, right, depth, size = tree
+    leaf = left < 0
+    ids = np.arange(len(left), dtype=np.int32)
+    return (np.where(leaf, 0, feature).astype(np.int32), np.where(leaf, np.inf, threshold),
+            np.where(leaf, ids, left).astype(np.int32), np.where(leaf, ids, right).astype(np.int32),
+            int(depth.max()), depth + average_path(size))
+
+
+def path_lengths(shared: dict, rows: np.ndarray, forest: List[Tuple[np.ndarray, ...]]) -> np.ndarray:
+    """Sum over the trees of the path length of the given rows (all rows descend a tree level together)"""
+    features = attach(shared)["features"][rows[0]:rows[-1] + 1]
+    width = features.shape[1]
+    forest = [_prepare_tree(tree) for tree in forest]
+    total = np.zeros(len(features))
+    # Blocks of rows small enough for the per-level arrays to stay in cache
+    for start in range(0, len(features), SCORE_BLOCK):
+        flat = features[start:start + SCORE_BLOCK].ravel()
+        base = np.arange(0, len(flat), width, dtype=np.int64)
+        block = total[start:start + SCORE_BLOCK]
+        for feature, threshold, left, right, height, path in forest:
+            node = np.zeros(len(base), dtype=np.int32)
+            for _ in range(height):
+                goes_left = flat[base + feature[node]] < threshold[node]
+                node = np.where(goes_left, left[node], right[node])
+            block += path[node]
+    return total
+
+
+async def isolation_forest(features: np.ndarray, trees: int = 100, sample_size: int = 256,
+                           seed: int = 42) -> np.ndarray:
+    """
+    Isolation forest anomaly scores in [0, 1] (Liu, Ting, Zhou): 2^(-E[h(x)] / c(sample_size))
+
+    Trees are grown on small random subsamples; every node then descends all the trees
+    level by level, node chunks are spread over the process pool for large inputs.
+    """
+    n = len(features)
+    if n == 0:
+        return np.zeros(0)
+    sample_size = min(sample_size, n)
+    height_limit = max(1, int(math.ceil(math.log2(max(sample_size, 2)))))
+    rng = np.random.default_rng(seed)
+    forest = []
+    for _ in range(trees):
+        sample = features[rng.choice(n, sample_size, replace=False)]
+        forest.append(_grow_tree(sample, rng, height_limit))
+
+    parallel = use_pool(n * trees * height_limit)
+    row_chunks = chunks(np.arange(n), worker_count() * 4 if parallel else 1)
+    with share(parallel, features=np.ascontiguousarray(features)) as shared:
+        totals = await map_reduce(path_lengths, [(shared, rows, forest) for rows in row_chunks], parallel)
+    mean_path = np.concatenate(totals) / trees
+    return np.power(2.0, -mean_path / average_path(sample_size))
+
+
+def oddball(egonet_nodes: np.ndarray, egonet_edges: np.ndarray) -> Tuple[np.ndarray, dict]:
+    """
+    OddBall egonet score (Akoglu, McGlohon, Faloutsos)
+
+    Fits the power law E = C * N^alpha between egonet edges E and neighbours N
+    (least squares in log-log), then scores max(E, fit) / min(E, fit) * log(|E - fit| + 1):
+    near-cliques and near-stars both stand out. Nodes without neighbours score 0.
+    """
+    fitted = egonet_nodes > 0
+    scores = np.zeros(len(egonet_nodes))
+    if fitted.sum() < 2:
+        return scores, {"alpha": None, "constant": None}
+    x = np.log(egonet_nodes[fitted])
+    y = np.log(egonet_edges[fitted])
+    alpha, log_c = np.polyfit(x, y, 1) if np.ptp(x) > 0 else (1.0, float(np.mean(y - x)))
+    expected = np.exp(log_c) * egonet_nodes[fitted] ** alpha
+    actual = egonet_edges[fitted]
+    ratio = np.maximum(actual, expected) / np.minimum(actual, expected)
+    scores[fitted] = ratio * np.log(np.abs(actual - expected) + 1)
+    return scores, {"alpha": float(alpha), "constant": float(np.exp(log_c))}
@@ -0,0 +1,170 @@
+import asyncio
+import contextvars
+import multiprocessing
+import os
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+# Array name -> (shared memory block name, shape, dtype)
+SharedSpec = Dict[str, Tuple[str, Tuple[int, ...], str]]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+
+# Worker side: blocks attached by the current process, by block name
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+
+# Set by the job runner: receives (done, total, unit) as the engines make progress
+progress_sink: contextvars.ContextVar[Optional[Callable[[int, int, str], None]]] = contextvars.ContextVar(
+    "progress_sink", default=None
+)
+
+
+def report_progress(done: int, total: int, unit: str) -> None:
+    sink = progress_sink.get()
+    if sink is not None:
+        sink(done, total, unit)
+
+
+class SharedArrays:
+    """
+    NumPy arrays copied once into shared memory so pool workers can map them
+    without pickling (e.g: the offsets/targets of a CSR graph)
+    """
+
+    def __init__(self, **arrays: np.ndarray):
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self.spec: SharedSpec = {}
+        try:
+            for key, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self._blocks.append(block)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+                self.spec[key] = (block.name, array.shape, array.dtype.str)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        for block in self._blocks:
+            block.close()
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks = []
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+@contextmanager
+def share(parallel: bool, **arrays: np.ndarray):
+    """Yield what tasks receive: a SharedArrays spec when parallel, else the arrays themselves"""
+    if not parallel:
+        yield arrays
+        return
+    with SharedArrays(**arrays) as shared:
+        yield shared.spec
+
+
+def attach(spec) -> Dict[str, np.ndarray]:
+    """
+    Map the arrays of a SharedArrays spec (worker side, attachments are reused)
+
+    Plain arrays (tasks run in-process) are returned as is.
+    """
+    if all(isinstance(value, np.ndarray) for value in spec.values()):
+        return spec
+    wanted = {name for name, _, _ in spec.values()}
+    for name in list(_attached):
+        if name not in wanted:
+            try:
+                _attached.pop(name).close()
+            except BufferError:
+                pass  # Still referenced, released with the process
+    arrays = {}
+    for key, (name, shape, dtype) in spec.items():
+        if name not in _attached:
+            _attached[name] = shared_memory.SharedMemory(name=name)
+        arrays[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_attached[name].buf)
+    return arrays
+
+
+def worker_count() -> int:
+    return settings.engine_workers or os.cpu_count() or 1
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    if _pool is None:
+        _pool_workers = worker_count()
+        # spawn: workers must not inherit the event loop / driver threads
+        _pool = ProcessPoolExecutor(max_workers=_pool_workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def use_pool(work: int) -> bool:
+    """Whether a computation of this size (e.g: sources x edges) is worth the process pool"""
+    return worker_count() > 1 and work >= settings.engine_parallel_min_work
+
+
+def chunks(items: np.ndarray, count: int) -> List[np.ndarray]:
+    return [chunk for chunk in np.array_split(items, max(1, min(count, len(items)))) if len(chunk)]
+
+
+async def map_reduce(fn: Callable, tasks: Sequence[tuple], parallel: bool, report: bool = True) -> list:
+    """
+    Run fn(*task) for every task, in the process pool when parallel
+    (else sequentially in a thread, for small inputs the pool overhead dominates)
+
+    Finished tasks are reported to the progress sink of the running job (unless report
+    is false, for callers reporting their own units)
+    """
+    total = len(tasks)
+    if not parallel:
+        def run() -> list:
+            results = []
+            for task in tasks:
+                results.append(fn(*task))
+                if report:
+                    report_progress(len(results), total, "tasks")
+            return results
+
+        return await asyncio.to_thread(run)
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    futures = [loop.run_in_executor(pool, fn, *task) for task in tasks]
+    sink = progress_sink.get() if report else None
+    if sink is not None:
+        finished = [0]
+
+        def on_done(_) -> None:
+            finished[0] += 1
+            sink(finished[0], total, "tasks")
+
+        for future in futures:
+            future.add_done_callback(on_done)
+    try:
+        return await asyncio.gather(*futures)
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
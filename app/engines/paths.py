@@ -0,0 +1,284 @@
+import heapq
+import math
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.engines.csr import CSRGraph
+from app.engines.parallel import attach
+
+
+def _gather(graph: CSRGraph, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(neighbour, frontier node it was reached from) for every edge leaving the frontier"""
+    starts = graph.offsets[frontier]
+    counts = graph.offsets[frontier + 1] - starts
+    total = int(counts.sum())
+    shift = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return graph.targets[shift + np.arange(total)], np.repeat(frontier, counts)
+
+
+def _walk(parents: Dict[int, int], node: int) -> List[int]:
+    """Nodes from node back to the root of a parent map"""
+    path = []
+    while node != -1:
+        path.append(node)
+        node = parents[node]
+    return path
+
+
+def bidirectional_bfs(forward: CSRGraph, backward: CSRGraph, source: int, target: int,
+                      max_hops: Optional[int] = None) -> Optional[List[int]]:
+    """
+    Fewest-hops path between two compact indices, or None
+
+    Searches from both ends (backward follows the reversed edges, the same graph when
+    undirected) and always expands the side whose frontier has the fewest edges, so the
+    work stays around the two balls of half the distance. Visited sets are dicts: a query
+    never touches the O(n) arrays of the graph.
+    """
+    if source == target:
+        return [source]
+    graphs = (forward, backward)
+    parents: Tuple[Dict[int, int], Dict[int, int]] = ({source: -1}, {target: -1})
+    depths: Tuple[Dict[int, int], Dict[int, int]] = ({source: 0}, {target: 0})
+    frontiers = [np.array([source], dtype=np.int64), np.array([target], dtype=np.int64)]
+    levels = [0, 0]
+    while len(frontiers[0]) and len(frontiers[1]):
+        if max_hops is not None and levels[0] + levels[1] >= max_hops:
+            return None
+        work = [int((g.offsets[f + 1] - g.offsets[f]).sum()) for g, f in zip(graphs, frontiers)]
+        side = 0 if work[0] <= work[1] else 1
+        seen, depth, other_depth = parents[side], depths[side], depths[1 - side]
+        neighbours, origins = _gather(graphs[side], frontiers[side])
+        levels[side] += 1
+        reached = []
+        best, meet = math.inf, None
+        for v, u in zip(neighbours.tolist(), origins.tolist()):
+            if v in seen:
+                continue
+            seen[v] = u
+            depth[v] = levels[side]
+            reached.append(v)
+            if v in other_depth and other_depth[v] < best:
+                best, meet = other_depth[v], v
+        if meet is not None:
+            head, tail = _walk(parents[side], meet), _walk(parents[1 - side], meet)[1:]
+            path = head[::-1] + tail
+            return path if side == 0 else path[::-1]
+        frontiers[side] = np.array(reached, dtype=np.int64)
+    return None
+
+
+def bidirectional_dijkstra(forward: CSRGraph, backward: CSRGraph, source: int, target: int,
+                           weighted: bool = True, blocked_nodes: Optional[Set[int]] = None,
+                           blocked_edges: Optional[Set[Tuple[int, int]]] = None
+                           ) -> Tuple[float, Optional[List[int]], List[float]]:
+    """
+    Cheapest path between two compact indices with non-negative weights
+
+    Alternates the side with the smaller heap and stops once the two heap tops add up to
+    at least the best meeting cost found. Returns (total cost, path, cumulative costs
+    along the path), or (inf, None, []) when the target is unreachable.
+
+    blocked_nodes / blocked_edges ((u, v) in the forward direction) are skipped (Yen's spur searches).
+    """
+    if source == target:
+        return 0.0, [source], [0.0]
+    graphs = (forward, backward)
+    dist: Tuple[Dict[int, float], Dict[int, float]] = ({source: 0.0}, {target: 0.0})
+    parents: Tuple[Dict[int, int], Dict[int, int]] = ({source: -1}, {target: -1})
+    heaps: List[List[Tuple[float, int]]] = [[(0.0, source)], [(0.0, target)]]
+    settled = (set(), set())
+    best, meet = math.inf, None
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+        d, u = heapq.heappop(heaps[side])
+        if u in settled[side]:
+            continue
+        settled[side].add(u)
+        graph = graphs[side]
+        lo, hi = graph.offsets[u], graph.offsets[u + 1]
+        neighbours = graph.targets[lo:hi].tolist()
+        if weighted and graph.weights is not None:
+            weights = graph.weights[lo:hi].tolist()
+        else:
+            weights = [1.0] * len(neighbours)
+        known, other = dist[side], dist[1 - side]
+        for v, w in zip(neighbours, weights):
+            if w < 0:
+                raise ValueError("Dijkstra requires non-negative relationship weights")
+            if blocked_nodes and v in blocked_nodes:
+                continue
+            if blocked_edges and ((u, v) if side == 0 else (v, u)) in blocked_edges:
+                continue
+            candidate = d + w
+            if candidate < known.get(v, math.inf):
+                known[v] = candidate
+                parents[side][v] = u
+                heapq.heappush(heaps[side], (candidate, v))
+            if v in other and known[v] + other[v] < best:
+                best, meet = known[v] + other[v], v
+
+    if meet is None:
+        return math.inf, None, []
+    head, tail = _walk(parents[0], meet)[::-1], _walk(parents[1], meet)[1:]
+    costs = [dist[0][node] for node in head] + [best - dist[1][node] for node in tail]
+    return best, head + tail, costs
+
+
+def yen_k_shortest(forward: CSRGraph, backward: CSRGraph, source: int, target: int, k: int,
+                   weighted: bool = True, max_hops: Optional[int] = None,
+                   time_budget: Optional[float] = None) -> Tuple[List[Tuple[float, List[int], List[float]]], Dict]:
+    """
+    Yen's k shortest loopless paths, cheapest first
+
+    Spur searches are bidirectional Dijkstras with the root path nodes and the
+    already used spur edges blocked; with Lawler's rule a path only spawns spurs
+    from its deviation node onwards, so no candidate is generated twice.
+
+    Stops at k paths, when no candidate is left, or when time_budget (seconds) is
+    spent; returns (paths as (cost, nodes, cumulative costs), info).
+    """
+    started = time.monotonic()
+    deadline = started + time_budget if time_budget else None
+    info = {"complete": True, "reason": "k_reached", "spur_searches": 0}
+
+    cost, path, costs = bidirectional_dijkstra(forward, backward, source, target, weighted)
+    if path is None:
+        info["reason"] = "unreachable"
+        return [], info
+    accepted: List[Tuple[float, List[int], List[float]]] = []
+    # Paths spurs were generated from (accepted, or too long but still explored when weighted)
+    expanded: List[List[int]] = []
+    candidates: List[Tuple[float, int, List[int], List[float], int]] = []
+    seen = {tuple(path)}
+    serial = 0  # Heap tie-breaker
+    heapq.heappush(candidates, (cost, serial, path, costs, 0))
+
+    while len(accepted) < k:
+        if not candidates:
+            info["reason"] = "exhausted"
+            break
+        cost, _, path, costs, deviation = heapq.heappop(candidates)
+        if max_hops is None or len(path) - 1 <= max_hops:
+            accepted.append((cost, path, costs))
+            if len(accepted) == k:
+                break
+        elif not weighted:
+            info["reason"] = "max_hops"  # Hop counts only grow from here
+            break
+        expanded.append(path)
+
+        for i in range(deviation, len(path) - 1):
+            if deadline is not None and time.monotonic() > deadline:
+                info["complete"] = False
+                info["reason"] = "time_budget"
+                break
+            root = path[:i + 1]
+            spur = path[i]
+            blocked_edges = {(p[i], p[i + 1]) for p in expanded if len(p) > i + 1 and p[:i + 1] == root}
+            blocked_nodes = set(root[:-1])
+            info["spur_searches"] += 1
+            spur_cost, spur_path, spur_costs = bidirectional_dijkstra(
+                forward, backward, spur, target, weighted, blocked_nodes, blocked_edges
+            )
+            if spur_path is None:
+                continue
+            candidate = root[:-1] + spur_path
+            key = tuple(candidate)
+            if key in seen:
+                continue
+            seen.add(key)
+            serial += 1
+            base = costs[i]
+            heapq.heappush(candidates, (
+                base + spur_cost, serial, candidate,
+                costs[:i] + [base + c for c in spur_costs], i
+            ))
+        if info["reason"] == "time_budget":
+            break
+
+    if len(accepted) < k and info["reason"] == "k_reached":
+        info["reason"] = "exhausted"
+    info["elapsed_seconds"] = round(time.monotonic() - started, 4)
+    return accepted, info
+
+
+def settle(offsets: np.ndarray, targets: np.ndarray, weights: Optional[np.ndarray], source: int,
+           max_distance: Optional[float] = None) -> Iterator[Tuple[int, float, int]]:
+    """
+    Nodes reachable from source in distance order, as (node, distance, parent) with
+    parent -1 for the source
+
+    BFS when weights is None, else Dijkstra (non-negative weights). Nodes farther than
+    max_distance are never reached, and the caller can stop iterating at any point:
+    work only covers the nodes settled so far.
+    """
+    if weights is None:
+        parents = {source: -1}
+        queue = deque([(source, 0)])
+        while queue:
+            u, depth = queue.popleft()
+            yield u, float(depth), parents[u]
+            if max_distance is not None and depth + 1 > max_distance:
+                continue
+            for v in targets[offsets[u]:offsets[u + 1]].tolist():
+                if v not in parents:
+                    parents[v] = u
+                    queue.append((v, depth + 1))
+        return
+    dist: Dict[int, float] = {source: 0.0}
+    parents = {source: -1}
+    heap = [(0.0, source)]
+    settled = set()
+    while heap:
+        d, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        settled.add(u)
+        yield u, d, parents[u]
+        lo, hi = offsets[u], offsets[u + 1]
+        for v, w in zip(targets[lo:hi].tolist(), weights[lo:hi].tolist()):
+            if w < 0:
+                raise ValueError("Dijkstra requires non-negative relationship weights")
+            candidate = d + w
+            if max_distance is not None and candidate > max_distance:
+                continue
+            if candidate < dist.get(v, math.inf):
+                dist[v] = candidate
+                parents[v] = u
+                heapq.heappush(heap, (candidate, v))
+
+
+def matrix_rows(shared: dict, sources: np.ndarray, targets: np.ndarray,
+                with_paths: bool) -> Tuple[np.ndarray, Optional[List[Dict[int, List[int]]]]]:
+    """
+    Distances from a chunk of sources to every target (inf when unreachable), and the
+    paths per source as {target: nodes} when asked (runs in a pool worker)
+
+    Each source runs one search, stopped as soon as all the targets are settled.
+    """
+    arrays = attach(shared)
+    offsets, edges, weights = arrays["offsets"], arrays["targets"], arrays.get("weights")
+    columns: Dict[int, List[int]] = {}
+    for j, target in enumerate(targets.tolist()):
+        columns.setdefault(target, []).append(j)
+    rows = np.full((len(sources), len(targets)), np.inf)
+    paths = [] if with_paths else None
+    for i, source in enumerate(sources.tolist()):
+        parents: Dict[int, int] = {}
+        remaining = len(columns)
+        for node, distance, parent in settle(offsets, edges, weights, source):
+            parents[node] = parent
+            if node in columns:
+                rows[i, columns[node]] = distance
+                remaining -= 1
+                if remaining == 0:
+                    break
+        if with_paths:
+            paths.append({target: _walk(parents, target)[::-1] for target in columns if target in parents})
+    return rows, paths
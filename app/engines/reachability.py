@@ -0,0 +1,224 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.engines.csr import CSRGraph
+from app.engines.union_find import UnionFind
+
+
+def strongly_connected(offsets: np.ndarray, targets: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Strongly connected component of every node (iterative Tarjan)
+
+    Components are numbered in reverse topological order: a relationship between
+    two components always goes from a higher to a lower number.
+    """
+    n = len(offsets) - 1
+    starts, ends = offsets.tolist(), targets.tolist()
+    order = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    component = [-1] * n
+    stack: List[int] = []
+    counter = count = 0
+    for root in range(n):
+        if order[root] != -1:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [[root, starts[root]]]
+        while work:
+            frame = work[-1]
+            u, position = frame
+            if position < starts[u + 1]:
+                frame[1] = position + 1
+                v = ends[position]
+                if order[v] == -1:
+                    order[v] = low[v] = counter
+                    counter += 1
+                    stack.append(v)
+                    on_stack[v] = True
+                    work.append([v, starts[v]])
+                elif on_stack[v] and order[v] < low[u]:
+                    low[u] = order[v]
+                continue
+            work.pop()
+            if work and low[u] < low[work[-1][0]]:
+                low[work[-1][0]] = low[u]
+            if low[u] == order[u]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component[w] = count
+                    if w == u:
+                        break
+                count += 1
+    return np.array(component, dtype=np.int64), count
+
+
+def condense(graph: CSRGraph, component: np.ndarray, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR (offsets, targets) of the DAG of components, each relationship once"""
+    src, dst = component[graph.edge_sources()], component[graph.targets]
+    keys = np.sort(src[src != dst] * count + dst[src != dst])
+    keys = keys[np.r_[True, keys[1:] != keys[:-1]]] if len(keys) else keys
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // count, minlength=count), out=offsets[1:])
+    return offsets, keys % count
+
+
+def grail_labels(offsets: np.ndarray, targets: np.ndarray, traversals: int = 5,
+                 seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    GRAIL interval labels of a DAG (Yildirim, Chaoji, Zaki): (low, post), shape (n, traversals)
+
+    Each traversal is a DFS with randomized root and child order; post is the post-order
+    rank and low the smallest rank below the node. If u reaches v, v's interval
+    [low, post] is inside u's in every traversal, so one non-contained interval proves
+    that v is unreachable.
+    """
+    n = len(offsets) - 1
+    rng = np.random.default_rng(seed)
+    sources = np.repeat(np.arange(n), np.diff(offsets))
+    roots = np.flatnonzero(np.bincount(targets, minlength=n) == 0)
+    low = np.empty((n, traversals), dtype=np.int64)
+    post = np.empty((n, traversals), dtype=np.int64)
+    for t in range(traversals):
+        priority = rng.permutation(n)
+        children = targets[np.lexsort((priority[targets], sources))].tolist()
+        starts = offsets.tolist()
+        rank = 0
+        lows = [n + 1] * n
+        posts = [0] * n
+        visited = [False] * n
+        for root in roots[np.argsort(priority[roots])].tolist():
+            visited[root] = True
+            work = [[root, starts[root]]]
+            while work:
+                frame = work[-1]
+                u, position = frame
+                if position < starts[u + 1]:
+                    frame[1] = position + 1
+                    v = children[position]
+                    if not visited[v]:
+                        visited[v] = True
+                        work.append([v, starts[v]])
+                    elif lows[v] < lows[u]:
+                        # Acyclic: a visited child is finished
+                        lows[u] = lows[v]
+                    continue
+                work.pop()
+                rank += 1
+                posts[u] = rank
+                if rank < lows[u]:
+                    lows[u] = rank
+                if work and lows[u] < lows[work[-1][0]]:
+                    lows[work[-1][0]] = lows[u]
+        low[:, t] = lows
+        post[:, t] = posts
+    return low, post
+
+
+class ReachabilityIndex:
+    """
+    Connectivity labels of a snapshot
+
+    - components: weakly connected component of every node (undirected reachability in O(1))
+    - scc: strongly connected component, numbered in reverse topological order
+    - dag_offsets / dag_targets: condensation of the relationships between components
+    - low / post: GRAIL intervals of the components
+
+    A directed query is answered by the labels alone when they rule reachability out (or
+    both nodes share a component); otherwise a DFS of the DAG follows only the
+    components whose intervals still contain the target.
+    """
+
+    def __init__(self, name: str, node_ids: np.ndarray, components: np.ndarray, scc: np.ndarray,
+                 dag_offsets: np.ndarray, dag_targets: np.ndarray, low: np.ndarray, post: np.ndarray,
+                 build_seconds: float):
+        self.name = name
+        self.node_ids = node_ids
+        self.components = components
+        self.scc = scc
+        self.dag_offsets = dag_offsets
+        self.dag_targets = dag_targets
+        self.low = low
+        self.post = post
+        self.build_seconds = build_seconds
+        self.built_at = time.time()
+        # Loaded-at time of the snapshot the index was built from (staleness check)
+        self.snapshot_loaded_at: Optional[float] = None
+        # Build parameters, for rebuilds
+        self.relationship_type: Optional[str] = None
+        self.options: Dict = {}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.components, self.scc, self.dag_offsets, self.dag_targets,
+                                      self.low, self.post))
+
+    def connected(self, u: int, v: int) -> bool:
+        """Whether a path exists between two compact indices, ignoring directions"""
+        return bool(self.components[u] == self.components[v])
+
+    def _contains(self, candidates: np.ndarray, target: int) -> np.ndarray:
+        """Components whose labels do not rule out reaching target"""
+        return ((candidates >= target)
+                & (self.low[candidates] <= self.low[target]).all(axis=1)
+                & (self.post[candidates] >= self.post[target]).all(axis=1))
+
+    def reaches(self, u: int, v: int) -> Tuple[bool, str]:
+        """
+        Whether a directed path goes from u to v (compact indices), and what decided it:
+        components, labels or search
+        """
+        if not self.connected(u, v):
+            return False, "components"
+        source, target = int(self.scc[u]), int(self.scc[v])
+        if source == target:
+            return True, "labels"
+        if not self._contains(np.array([source]), target)[0]:
+            return False, "labels"
+        visited = {source}
+        stack = [source]
+        while stack:
+            c = stack.pop()
+            children = self.dag_targets[self.dag_offsets[c]:self.dag_offsets[c + 1]]
+            children = children[self._contains(children, target)]
+            for child in children.tolist():
+                if child == target:
+                    return True, "search"
+                if child not in visited:
+                    visited.add(child)
+                    stack.append(child)
+        return False, "search"
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "nodes": len(self.node_ids),
+            "weak_components": int((self.components == np.arange(len(self.components))).sum()),
+            "strong_components": len(self.dag_offsets) - 1,
+            "dag_relationships": len(self.dag_targets),
+            "traversals": self.low.shape[1],
+            "size_in_bytes": self.nbytes,
+            "built_at": self.built_at,
+            "build_seconds": self.build_seconds
+        }
+
+
+def build_reachability(name: str, graph: CSRGraph, traversals: int = 5, seed: int = 42) -> ReachabilityIndex:
+    """Reachability index of a graph in its loaded direction"""
+    started = time.perf_counter()
+    sets = UnionFind(graph.node_count)
+    sets.union_many(graph.edge_sources().astype(np.int64), graph.targets.astype(np.int64))
+    components = sets.compress().copy()
+    scc, count = strongly_connected(graph.offsets, graph.targets)
+    dag_offsets, dag_targets = condense(graph, scc, count)
+    low, post = grail_labels(dag_offsets, dag_targets, traversals, seed)
+    return ReachabilityIndex(
+        name, graph.node_ids, components, scc, dag_offsets, dag_targets, low, post,
+        round(time.perf_counter() - started, 3)
+    )
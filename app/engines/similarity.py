@@ -0,0 +1,239 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.engines.csr import CSRGraph, top_indices
+from app.engines.lsh import lsh_candidates, minhash_signatures
+from app.engines.parallel import attach, map_reduce, share, use_pool
+from app.engines.paths import _gather
+
+METRICS = ("JACCARD", "COSINE", "OVERLAP", "ADAMIC_ADAR", "RESOURCE_ALLOCATION", "COMMON_NEIGHBORS")
+# Bytes per gathered neighbour when scoring pairs (keys, their sorted copy, positions)
+BYTES_PER_ENTRY = 48
+
+
+def _distinct_rows(offsets: np.ndarray, targets: np.ndarray, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    starts = offsets[nodes]
+    counts = offsets[nodes + 1] - starts
+    shift = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    neighbours = targets[shift + np.arange(int(counts.sum()))]
+    position = np.repeat(np.arange(len(nodes)), counts)
+    if len(neighbours) == 0:
+        return neighbours, position
+    keep = np.r_[True, (neighbours[1:] != neighbours[:-1]) | (position[1:] != position[:-1])]
+    return neighbours[keep], position[keep]
+
+
+def distinct_neighbours(graph: CSRGraph, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (neighbour, position in nodes) for every neighbour of nodes, parallel relationships
+    counted once (rows are sorted, so duplicates are adjacent)
+    """
+    return _distinct_rows(graph.offsets, graph.targets, nodes)
+
+
+def _combine(metric: str, common: np.ndarray, weighted: Optional[np.ndarray],
+             size_u, size_v) -> np.ndarray:
+    """Scores from the shared neighbour counts (weighted sums for ADAMIC_ADAR / RESOURCE_ALLOCATION)"""
+    if metric in ("ADAMIC_ADAR", "RESOURCE_ALLOCATION"):
+        return weighted
+    if metric == "COMMON_NEIGHBORS":
+        return common
+    if metric == "JACCARD":
+        return common / np.maximum(size_u + size_v - common, 1)
+    if metric == "COSINE":
+        return common / np.sqrt(np.maximum(size_u * size_v, 1))
+    return common / np.maximum(np.minimum(size_u, size_v), 1)
+
+
+def neighbour_weights(graph: CSRGraph, metric: str) -> Optional[np.ndarray]:
+    """Weight of every node as a shared neighbour: 1 / log(in-degree) or 1 / in-degree"""
+    if metric not in ("ADAMIC_ADAR", "RESOURCE_ALLOCATION"):
+        return None
+    degree = np.bincount(graph.targets, minlength=graph.node_count).astype(np.float64)
+    return 1 / np.log(np.maximum(degree, 2)) if metric == "ADAMIC_ADAR" else 1 / np.maximum(degree, 1)
+
+
+def single_source_similarity(graph: CSRGraph, reverse: CSRGraph, source: int, metric: str = "JACCARD",
+                             top_k: int = 10, cutoff: float = 0.0, degree_cutoff: int = 1,
+                             exclude_neighbours: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Nodes most similar to source and their scores, best first
+
+    Only the 2-hop neighbourhood is visited: the candidates are the nodes sharing a
+    neighbour with source (reverse holds the transposed relationships, the same graph
+    when undirected). The (candidate, shared neighbour) pairs are sorted once, which
+    intersects the sorted neighbour lists of all the candidates in a single pass.
+
+    - JACCARD / COSINE / OVERLAP: set similarity of the neighbour lists
+    - COMMON_NEIGHBORS: number of shared neighbours
+    - ADAMIC_ADAR / RESOURCE_ALLOCATION: shared neighbours weighted by 1 / log(degree) / 1 / degree
+    """
+    metric = metric.upper()
+    if metric not in METRICS:
+        raise ValueError(f"Unknown similarity metric: {metric}. Use one of {', '.join(METRICS)}")
+    empty = np.zeros(0, dtype=np.int64), np.zeros(0)
+    own, _ = distinct_neighbours(graph, np.array([source]))
+    if len(own) < max(degree_cutoff, 1):
+        return empty
+
+    candidates, via = _gather(reverse, own.astype(np.int64))
+    keep = candidates != source
+    n = graph.node_count
+    keys = np.sort(candidates[keep].astype(np.int64) * n + via[keep])
+    keys = keys[np.r_[True, keys[1:] != keys[:-1]]] if len(keys) else keys
+    if len(keys) == 0:
+        return empty
+    nodes, shared = keys // n, keys % n
+    starts = np.flatnonzero(np.r_[True, nodes[1:] != nodes[:-1]])
+    nodes = nodes[starts]
+    common = np.diff(np.r_[starts, len(shared)]).astype(np.float64)
+
+    weighted = sizes = None
+    if metric in ("ADAMIC_ADAR", "RESOURCE_ALLOCATION"):
+        # Degree of a shared neighbour: relationships pointing to it (>= 2, source and candidate)
+        degree = (reverse.offsets[shared + 1] - reverse.offsets[shared]).astype(np.float64)
+        weights = 1 / np.log(np.maximum(degree, 2)) if metric == "ADAMIC_ADAR" else 1 / np.maximum(degree, 1)
+        weighted = np.add.reduceat(weights, starts)
+    elif metric != "COMMON_NEIGHBORS":
+        _, position = distinct_neighbours(graph, nodes)
+        sizes = np.bincount(position, minlength=len(nodes)).astype(np.float64)
+    scores = _combine(metric, common, weighted, float(len(own)), sizes)
+
+    eligible = scores >= cutoff
+    if degree_cutoff > 1:
+        eligible &= graph.offsets[nodes + 1] - graph.offsets[nodes] >= degree_cutoff
+    if exclude_neighbours:
+        eligible &= ~np.isin(nodes, own)
+    nodes, scores = nodes[eligible], scores[eligible]
+    best = top_indices(scores, top_k)
+    return nodes[best], scores[best]
+
+
+def pair_scores(shared: dict, u: np.ndarray, v: np.ndarray, metric: str) -> np.ndarray:
+    """
+    Exact scores of the pairs (u[i], v[i]): the A.At entries restricted to these pairs,
+    as one sort-merge of both neighbour lists per pair (runs in a pool worker)
+    """
+    arrays = attach(shared)
+    offsets, targets, sizes = arrays["offsets"], arrays["targets"], arrays["sizes"]
+    n = len(offsets) - 1
+    neighbours_u, position_u = _distinct_rows(offsets, targets, u)
+    neighbours_v, position_v = _distinct_rows(offsets, targets, v)
+    keys = np.sort(np.concatenate([position_u * n + neighbours_u, position_v * n + neighbours_v]))
+    matched = keys[1:][keys[1:] == keys[:-1]]
+    common = np.bincount(matched // n, minlength=len(u)).astype(np.float64)
+    weights = arrays.get("weights")
+    weighted = np.bincount(matched // n, weights=weights[matched % n], minlength=len(u)) if weights is not None else None
+    return _combine(metric, common, weighted, sizes[u].astype(np.float64), sizes[v].astype(np.float64))
+
+
+def _per_node_top_k(u: np.ndarray, v: np.ndarray, scores: np.ndarray,
+                    top_k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Both directions of every pair, keeping the top_k scores of each node (by node, best first)"""
+    node, other, score = np.concatenate([u, v]), np.concatenate([v, u]), np.concatenate([scores, scores])
+    order = np.lexsort((other, -score, node))
+    node, other, score = node[order], other[order], score[order]
+    starts = np.flatnonzero(np.r_[True, node[1:] != node[:-1]]) if len(node) else np.zeros(0, dtype=np.int64)
+    rank = np.arange(len(node)) - np.repeat(starts, np.diff(np.r_[starts, len(node)]))
+    keep = rank < top_k
+    return node[keep], other[keep], score[keep]
+
+
+def _candidates(graph: CSRGraph, bands: int, rows: int, max_bucket: int, degree_cutoff: int,
+                seed: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Distinct neighbour count of every node and the LSH candidate pairs (u, v) above degree_cutoff"""
+    _, position = distinct_neighbours(graph, np.arange(graph.node_count))
+    sizes = np.bincount(position, minlength=graph.node_count)
+    signatures = minhash_signatures(graph, bands * rows, seed)
+    u, v = lsh_candidates(signatures, bands, rows, max_bucket, seed)
+    del signatures
+    if degree_cutoff > 1:
+        eligible = (sizes[u] >= degree_cutoff) & (sizes[v] >= degree_cutoff)
+        u, v = u[eligible], v[eligible]
+    return sizes, u, v
+
+
+def _chunk_bounds(graph: CSRGraph, u: np.ndarray, v: np.ndarray, memory_bytes: int) -> Tuple[List[int], int]:
+    """Pair ranges gathering at most memory_bytes of neighbours each, and the total gathered"""
+    degree = np.diff(graph.offsets)
+    entries = np.cumsum(degree[u] + degree[v])
+    budget = max(memory_bytes // BYTES_PER_ENTRY, 1)
+    bounds = [0]
+    while bounds[-1] < len(u):
+        base = entries[bounds[-1] - 1] if bounds[-1] else 0
+        bounds.append(max(int(np.searchsorted(entries, base + budget, side="right")), bounds[-1] + 1))
+    return bounds, int(entries[-1]) if len(entries) else 0
+
+
+async def batch_similarity(graph: CSRGraph, metric: str = "JACCARD", top_k: int = 10, cutoff: float = 0.0,
+                           degree_cutoff: int = 1, bands: int = 16, rows: int = 2, max_bucket: int = 100,
+                           memory_bytes: int = 256 * 1024 * 1024,
+                           seed: int = 42) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict]:
+    """
+    Top-k most similar nodes of every node: (node, other, score) sorted by node then score
+
+    Candidate pairs come from MinHash LSH over the neighbour sets (bands x rows hashes,
+    a pair with Jaccard s is a candidate with probability 1 - (1 - s^rows)^bands), then
+    only those are scored exactly, in chunks of at most memory_bytes of gathered
+    neighbours, spread over the process pool.
+    """
+    metric = metric.upper()
+    if metric not in METRICS:
+        raise ValueError(f"Unknown similarity metric: {metric}. Use one of {', '.join(METRICS)}")
+    report: Dict = {"metric": metric, "bands": bands, "rows_per_band": rows}
+    started = time.perf_counter()
+    sizes, u, v = await asyncio.to_thread(_candidates, graph, bands, rows, max_bucket, degree_cutoff, seed)
+    report["candidate_pairs"] = len(u)
+    report["candidate_seconds"] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    bounds, entries = await asyncio.to_thread(_chunk_bounds, graph, u, v, memory_bytes)
+    arrays = {"offsets": graph.offsets, "targets": graph.targets, "sizes": sizes}
+    weights = await asyncio.to_thread(neighbour_weights, graph, metric)
+    if weights is not None:
+        arrays["weights"] = weights
+    parallel = use_pool(entries)
+    with share(parallel, **arrays) as shared:
+        results = await map_reduce(
+            pair_scores, [(shared, u[a:b], v[a:b], metric) for a, b in zip(bounds, bounds[1:])], parallel
+        )
+    scores = np.concatenate(results) if results else np.zeros(0)
+    elapsed = time.perf_counter() - started
+    report["chunks"] = len(bounds) - 1
+    report["scoring_seconds"] = round(elapsed, 3)
+    report["pairs_per_second"] = round(len(u) / elapsed) if elapsed > 0 else None
+
+    eligible = (scores > 0) & (scores >= cutoff)
+    node, other, score = await asyncio.to_thread(_per_node_top_k, u[eligible], v[eligible], scores[eligible], top_k)
+    report["rows"] = len(node)
+    return node, other, score, report
+
+
+def sample_recall(graph: CSRGraph, reverse: CSRGraph, node: np.ndarray, other: np.ndarray, score: np.ndarray,
+                  metric: str, top_k: int, cutoff: float = 0.0, degree_cutoff: int = 1,
+                  sample: int = 100, seed: int = 42) -> Optional[float]:
+    """
+    Recall of batch results against the exact single-source top-k on a sample of nodes
+
+    A batch result counts as found when its (exact) score reaches the k-th exact score,
+    so ties at the boundary are not counted as misses.
+    """
+    candidates = np.flatnonzero(np.diff(graph.offsets) > 0)
+    if len(candidates) == 0 or sample <= 0:
+        return None
+    rng = np.random.default_rng(seed)
+    chosen = rng.choice(candidates, min(sample, len(candidates)), replace=False)
+    starts = np.searchsorted(node, chosen, side="left")
+    ends = np.searchsorted(node, chosen, side="right")
+    found = expected = 0
+    for source, lo, hi in zip(chosen.tolist(), starts.tolist(), ends.tolist()):
+        _, exact = single_source_similarity(graph, reverse, source, metric, top_k, cutoff, degree_cutoff)
+        exact = exact[exact > 0]
+        if len(exact) == 0:
+            continue
+        expected += len(exact)
+        found += min(int((score[lo:hi] >= exact[-1] - 1e-12).sum()), len(exact))
+    return round(found / expected, 4) if expected else None
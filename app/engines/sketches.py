@@ -0,0 +1,137 @@
+import math
+from typing import List
+
+import numpy as np
+
+
+class Welford:
+    """Streaming count / mean / variance (batches are merged with Chan's formula)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update_many(self, values: np.ndarray) -> None:
+        if len(values) == 0:
+            return
+        count = len(values)
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def remove_many(self, values: np.ndarray) -> None:
+        """Take values back out of the mean / variance (min and max keep every value seen)"""
+        count = len(values)
+        if count == 0:
+            return
+        if count >= self.count:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.count - count
+        remaining = (self.count * self.mean - count * mean) / total
+        delta = mean - remaining
+        self.m2 = max(0.0, self.m2 - m2 - delta ** 2 * total * count / self.count)
+        self.mean = remaining
+        self.count = total
+
+    @property
+    def variance(self) -> float:
+        """Sample variance (as Cypher stdev)"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang, Liberty): mergeable, O(k log(n / k)) memory
+
+    Level h holds items of weight 2^h; a full level is sorted and every other item
+    (random offset) is promoted to the next level.
+    """
+
+    def __init__(self, k: int = 200, seed: int = 42):
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def update_many(self, values: np.ndarray) -> None:
+        self.levels[0] = np.concatenate([self.levels[0], np.asarray(values, dtype=np.float64)])
+        self.n += len(values)
+        self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.n += other.n
+        self._compress()
+
+    def _compress(self) -> None:
+        while True:
+            full = [h for h, items in enumerate(self.levels) if len(items) >= self._capacity(h)]
+            if not full:
+                return
+            h = full[0]
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[h])
+            leftover = items[-1:] if len(items) % 2 else items[:0]
+            items = items[:len(items) - len(leftover)]
+            promoted = items[self._rng.integers(2)::2]
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            self.levels[h] = leftover
+
+    @property
+    def retained(self) -> int:
+        return sum(len(items) for items in self.levels)
+
+    def quantile(self, q: float) -> float:
+        values = np.concatenate(self.levels)
+        if len(values) == 0:
+            return math.nan
+        weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1])
+        return float(values[order][min(position, len(values) - 1)])
+
+    def rank(self, values) -> np.ndarray:
+        """Estimated fraction of the items <= each value"""
+        items = np.concatenate(self.levels)
+        if len(items) == 0:
+            return np.zeros(np.shape(values))
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(items[order], values, side="right")
+        below = np.where(position > 0, cumulative[np.maximum(position - 1, 0)], 0.0)
+        return below / cumulative[-1]
+
+    def rank_error(self) -> float:
+        """
+        Normalized rank error of the quantiles (99% confidence, DataSketches estimate
+        2.296 / k^0.9723); 0 while nothing has been compacted
+        """
+        if len(self.levels) == 1:
+            return 0.0
+        return 2.296 / self.k ** 0.9723
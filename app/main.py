@@ -1,13 +1,35 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.routers import centrality, community, anomaly, path, prediction, graph
+from app.database import neo4j_connection
+from app.engines.parallel import shutdown_pool
+from app.services.projection_catalog import projection_catalog
+from app.routers import centrality, community, anomaly, path, prediction, graph, jobs
+from app.services.job_service import job_manager
+from app.services.monitor_service import monitor_manager
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the Neo4j connection pool on startup, release it on shutdown
+    await neo4j_connection.connect()
+    await projection_catalog.start()
+    job_manager.start()
+    yield
+    await monitor_manager.stop_all()
+    await job_manager.stop()
+    await projection_catalog.stop()
+    shutdown_pool()
+    await neo4j_connection.close()
+
 
 app = FastAPI(
     title=settings.app_name,
     description="Graph analysis service with neo4j",
     version="0.1.0",
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -38,7 +60,8 @@ async def root():
             "anomaly": "/api/anomaly/*",
             "path": "/api/path/*",
             "prediction": "/api/prediction/*",
-            "graph": "/api/graph/*"
+            "graph": "/api/graph/*",
+            "jobs": "/api/jobs/*"
         }
     }
 
@@ -49,6 +72,7 @@ app.include_router(anomaly.router, prefix="/api/anomaly", tags=["Anomaly"])
 app.include_router(path.router, prefix="/api/path", tags=["Pathfinding"])
 app.include_router(prediction.router, prefix="/api/prediction", tags=["Prediction"])
 app.include_router(graph.router, prefix="/api/graph", tags=["Graph Operations"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["Jobs"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -5,6 +5,10 @@ class CentralityRequest(BaseModel):
     relationship_type: str = "RELATED"
     algorithm: Literal["betweenness", "closeness", "degree", "pagerank"] = "betweenness"
     options: Optional[dict] = Field(default_factory=dict)
+    limit: Optional[int] = Field(default=None, ge=1, le=10000, description="Page size (top-K when alone)")
+    offset: int = Field(default=0, ge=0)
+    cursor: Optional[str] = Field(default=None, description="Opaque cursor returned as metadata.next_cursor")
+    engine: Literal["gds", "native"] = Field(default="gds", description="native: in-process engine on a CSR snapshot")
 
     class Config:
         json_schema_extra = {
@@ -22,8 +26,9 @@ class CentralityRequest(BaseModel):
 
 class CommunityRequest(BaseModel):
     relationship_type: str = "RELATED"
-    algorithm: Literal["louvain", "greedy", "wcc"] = "louvain"
+    algorithm: Literal["louvain", "leiden", "greedy", "wcc"] = "louvain"
     options: Optional[dict] = Field(default_factory=dict)
+    engine: Literal["gds", "native"] = Field(default="gds", description="native: in-process engine on a CSR snapshot")
 
     class Config:
         json_schema_extra = {
@@ -39,10 +44,27 @@ class CommunityRequest(BaseModel):
         }
 
 
+class ComponentEdgesRequest(BaseModel):
+    relationship_type: str = "RELATED"
+    edges: List[List[int]] = Field(..., description="New relationships as [source_id, target_id] pairs")
+    options: Optional[dict] = Field(default_factory=dict)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "relationship_type": "RELATED",
+                "edges": [[12, 42], [42, 7]]
+            }
+        }
+
+
 class AnomalyRequest(BaseModel):
     node_label: str = "Node"
     relationship_type: Optional[str] = "RELATED"
     options: Optional[dict] = Field(default_factory=dict)
+    limit: Optional[int] = Field(default=None, ge=1, le=10000, description="Page size (top-K when alone)")
+    offset: int = Field(default=0, ge=0)
+    cursor: Optional[str] = Field(default=None, description="Opaque cursor returned as metadata.next_cursor")
 
     class Config:
         json_schema_extra = {
@@ -50,7 +72,7 @@ class AnomalyRequest(BaseModel):
                 "node_label": "Person",
                 "relationship_type": "KNOWS",
                 "options": {
-                    "method": "percentile",  # iqr, zscore, percentile
+                    "method": "percentile",  # iqr, zscore, percentile, mahalanobis, isolation_forest, oddball
                     "threshold": 0.95,
                     "orientation": "BOTH"
                 }
@@ -58,17 +80,54 @@ class AnomalyRequest(BaseModel):
         }
 
 
+class MonitorRequest(BaseModel):
+    name: Optional[str] = Field(default=None, description="Generated when omitted")
+    node_label: str = "Node"
+    relationship_type: Optional[str] = "RELATED"
+    feed: Literal["timestamp", "log"] = Field(
+        default="timestamp",
+        description="timestamp: poll relationships by timestamp_property, log: changes posted to the monitor"
+    )
+    timestamp_property: str = "created_at"
+    interval_seconds: Optional[float] = Field(default=None, gt=0)
+    options: Optional[dict] = Field(default_factory=dict)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "name": "transfers",
+                "node_label": "Account",
+                "relationship_type": "TRANSFER",
+                "feed": "timestamp",
+                "timestamp_property": "created_at",
+                "interval_seconds": 10,
+                "options": {
+                    "method": "zscore",  # zscore, percentile
+                    "threshold": 3
+                }
+            }
+        }
+
+
+class MonitorChangesRequest(BaseModel):
+    edges: List[List[int]] = Field(..., description="New relationships as [source_id, target_id] pairs")
+
+
 class PathRequest(BaseModel):
     start_node_id: int
     end_node_id: int
     relationship_type: str = "RELATED"
     max_hops: int = 10
+    k: int = Field(default=100, ge=1, le=10000, description="Maximum number of paths returned by /all")
+    options: Optional[dict] = Field(default_factory=dict)
+    engine: Literal["gds", "native"] = Field(default="gds", description="native: in-process engine on a CSR snapshot")
 
 
 class LinkPredictionRequest(BaseModel):
     node_id: int
     relationship_type: str = "RELATED"
     options: Optional[dict] = Field(default_factory=dict)
+    engine: Literal["gds", "native"] = Field(default="gds", description="native: in-process engine on a CSR snapshot")
 
     class Config:
         json_schema_extra = {
@@ -84,6 +143,29 @@ class LinkPredictionRequest(BaseModel):
         }
 
 
+class BatchLinkPredictionRequest(BaseModel):
+    relationship_type: str = "RELATED"
+    top_k: int = Field(default=10, ge=1, le=1000, description="Suggestions kept per node")
+    output_file: Optional[str] = Field(default=None, description="Write the pairs (NDJSON) to this file of the export directory")
+    options: Optional[dict] = Field(default_factory=dict)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "relationship_type": "KNOWS",
+                "top_k": 10,
+                "output_file": "people_you_may_know.ndjson",
+                "options": {
+                    "similarityMetric": "JACCARD",
+                    "orientation": "UNDIRECTED",
+                    "bands": 16,
+                    "rowsPerBand": 2,
+                    "recallSample": 100
+                }
+            }
+        }
+
+
 class NodePredictionRequest(BaseModel):
     node_label: str = "Node"
     property_name: str = Field(..., description="Property name to predict")
@@ -115,6 +197,7 @@ class DijkstraPathRequest(BaseModel):
     end_node_id: int
     relationship_type: str = "RELATED"
     options: Optional[dict] = Field(default_factory=dict)
+    engine: Literal["gds", "native"] = Field(default="gds", description="native: in-process engine on a CSR snapshot")
 
     class Config:
         json_schema_extra = {
@@ -130,10 +213,69 @@ class DijkstraPathRequest(BaseModel):
         }
 
 
+class LandmarkIndexRequest(BaseModel):
+    relationship_type: str = "RELATED"
+    landmarks: Optional[int] = Field(default=None, ge=1, le=256, description="Number of landmarks (default: 16)")
+    options: Optional[dict] = Field(default_factory=dict)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "relationship_type": "ROUTE",
+                "landmarks": 16,
+                "options": {
+                    "relationshipWeightProperty": "distance",
+                    "orientation": "UNDIRECTED"
+                }
+            }
+        }
+
+
+class DistanceMatrixRequest(BaseModel):
+    source_node_ids: List[int]
+    target_node_ids: List[int]
+    relationship_type: str = "RELATED"
+    layout: Literal["dense", "sparse"] = Field(default="dense", description="sparse: one row per reachable pair")
+    include_paths: bool = False
+    options: Optional[dict] = Field(default_factory=dict)
+    engine: Literal["gds", "native"] = Field(default="gds", description="native: in-process engine on a CSR snapshot")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "source_node_ids": [123, 124],
+                "target_node_ids": [456, 457, 458],
+                "relationship_type": "ROUTE",
+                "layout": "dense",
+                "include_paths": False,
+                "options": {
+                    "relationshipWeightProperty": "distance"
+                },
+                "engine": "native"
+            }
+        }
+
+
 class AllShortestPathsRequest(BaseModel):
     start_node_id: int
     relationship_type: str = "RELATED"
     options: Optional[dict] = Field(default_factory=dict)
+    engine: Literal["gds", "native"] = Field(default="gds", description="native: in-process engine on a CSR snapshot")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "start_node_id": 123,
+                "relationship_type": "ROUTE",
+                "options": {
+                    "relationshipWeightProperty": "distance",
+                    "max_distance": 10000,
+                    "max_targets": 50,
+                    "include_paths": False
+                },
+                "engine": "native"
+            }
+        }
 
 
 class NodeSearchRequest(BaseModel):
@@ -169,4 +311,46 @@ class ConnectionCheckRequest(BaseModel):
     start_node_id: int
     end_node_id: int
     relationship_type: Optional[str] = None
-    max_hops: int = Field(default=5, le=10)
\ No newline at end of file
+    max_hops: Optional[int] = Field(default=5, ge=1, le=10, description="null: no hop limit (native engine only)")
+    directed: bool = Field(default=False, description="Only follow relationships from start to end")
+    options: Optional[dict] = Field(default_factory=dict)
+    engine: Literal["gds", "native"] = Field(default="gds", description="native: reachability index of a snapshot")
+
+
+class ReachabilityIndexRequest(BaseModel):
+    relationship_type: Optional[str] = None
+    options: Optional[dict] = Field(default_factory=dict)
+
+
+class SnapshotRequest(BaseModel):
+    name: Optional[str] = Field(default=None, description="Defaults to label:relationship_type:weight_property")
+    node_label: Optional[str] = None
+    relationship_type: Optional[str] = "RELATED"
+    weight_property: Optional[str] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "node_label": "Person",
+                "relationship_type": "KNOWS",
+                "weight_property": "weight"
+            }
+        }
+
+
+class JobRequest(BaseModel):
+    kind: Literal["centrality", "community", "anomaly", "path", "prediction"]
+    algorithm: str = Field(..., description="Endpoint name, e.g: pagerank, louvain, detect, shortest-dijkstra, links")
+    request: dict = Field(default_factory=dict, description="Body of the corresponding endpoint")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "kind": "centrality",
+                "algorithm": "betweenness",
+                "request": {
+                    "relationship_type": "KNOWS",
+                    "options": {"samplingSize": 1000}
+                }
+            }
+        }
@@ -1,3 +1,3 @@
-from . import centrality, community, anomaly, path, prediction, graph
+from . import centrality, community, anomaly, path, prediction, graph, jobs
 
-__all__ = ["centrality", "community", "anomaly", "path", "prediction", "graph"]
\ No newline at end of file
+__all__ = ["centrality", "community", "anomaly", "path", "prediction", "graph", "jobs"]
\ No newline at end of file
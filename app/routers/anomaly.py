@@ -1,13 +1,21 @@
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import AnomalyRequest, AnalysisResponse
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from app.models.schemas import AnomalyRequest, AnalysisResponse, MonitorChangesRequest, MonitorRequest
 from app.services.anomaly_service import AnomalyService
+from app.services.monitor_service import ChangeLog, monitor_manager
+from app.services.result_cache import result_cache
+from app.services.pagination import CursorError
+from app.streaming import OutputFormat, stream_rows
 
 router = APIRouter()
 service = AnomalyService()
 
 
 @router.post("/detect", response_model=AnalysisResponse)
-async def detect_anomalies(request: AnomalyRequest):
+async def detect_anomalies(
+        request: AnomalyRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
     """
     Detect anomalous nodes based on their degree
 
@@ -15,20 +23,126 @@ async def detect_anomalies(request: AnomalyRequest):
     - percentile: Nodes above a percentile (default: 95%)
     - zscore: Nodes with Z-score > threshold (default: 3)
     - iqr: Nodes outside the Interquartile Range (IQR * 1.5 )
+    - mahalanobis / isolation_forest / oddball: multivariate scores over degree, weighted
+      degree, clustering coefficient, egonet and PageRank features (CSR snapshot)
+
+    Degree statistics are computed in a streaming pass (Welford mean/variance, KLL quantile
+    sketch) and only the outliers are returned by Neo4j; metadata reports the thresholds
+    and the quantile rank error.
+
+    Pagination: limit/offset, then metadata.next_cursor for the following pages
+    (served from the cached result set; past the prefetched pages, the algorithm
+    runs once more for the whole result)
     """
     try:
-        result = service.detect_outliers(
-            request.node_label,
-            request.relationship_type,
-            request.options
+        if output_format != "json":
+            return await stream_rows(service.detect_outliers_stream(
+                request.node_label,
+                request.relationship_type,
+                request.options,
+                top_k=request.limit
+            ), output_format)
+        metadata = {
+            "method": request.options.get("method", "percentile"),
+            "node_label": request.node_label
+        }
+        if request.limit or request.offset or request.cursor:
+            result, page = await service.detect_outliers_page(
+                request.node_label,
+                request.relationship_type,
+                request.options,
+                request.limit,
+                request.offset,
+                request.cursor
+            )
+            return AnalysisResponse(success=True, data=result, metadata={**metadata, **page})
+        result, cached = await result_cache.get_or_compute(
+            "anomaly.detect_outliers_report",
+            request.model_dump(),
+            lambda: service.detect_outliers_report(
+                request.node_label,
+                request.relationship_type,
+                request.options
+            )
         )
         return AnalysisResponse(
             success=True,
-            data=result,
-            metadata={
-                "method": request.options.get("method", "percentile"),
-                "node_label": request.node_label
-            }
+            data=result["data"],
+            metadata={**metadata, **result["metadata"], "cached": cached}
         )
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/monitors", response_model=AnalysisResponse, status_code=201)
+async def start_monitor(request: MonitorRequest):
+    """
+    Start an online degree anomaly monitor
+
+    A baseline pass loads the degree statistics once, then every interval only the
+    nodes touched since the previous tick (change feed) are scored and folded in.
+
+    Feeds:
+    - timestamp: relationships whose timestamp_property is past the last tick
+    - log: relationships posted to POST /api/anomaly/monitors/{name}/changes
+
+    Options: method (zscore or percentile), threshold, baseline (default: true)
+    """
+    try:
+        monitor = monitor_manager.start(
+            request.node_label,
+            request.relationship_type,
+            feed=request.feed,
+            timestamp_property=request.timestamp_property,
+            interval_seconds=request.interval_seconds,
+            options=request.options,
+            name=request.name
+        )
+        return AnalysisResponse(success=True, data=monitor.to_dict())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/monitors", response_model=AnalysisResponse)
+async def list_monitors():
+    """List the monitors with their statistics and last tick"""
+    monitors = [monitor.to_dict() for monitor in monitor_manager.list_monitors()]
+    return AnalysisResponse(success=True, data=monitors, metadata={"count": len(monitors)})
+
+
+@router.delete("/monitors/{name}", response_model=AnalysisResponse)
+async def stop_monitor(name: str):
+    """Stop a monitor (its alerts are discarded)"""
+    monitor = await monitor_manager.stop(name)
+    if monitor is None:
+        raise HTTPException(status_code=404, detail=f"Monitor {name} not found")
+    return AnalysisResponse(success=True, data=monitor.to_dict())
+
+
+@router.get("/monitors/{name}/alerts", response_model=AnalysisResponse)
+async def get_monitor_alerts(
+        name: str,
+        since: Optional[float] = Query(default=None, description="Only alerts detected after this epoch time"),
+        limit: Optional[int] = Query(default=100, ge=1, le=10000)
+):
+    """Recent alerts of a monitor, most recent first"""
+    monitor = monitor_manager.get(name)
+    if monitor is None:
+        raise HTTPException(status_code=404, detail=f"Monitor {name} not found")
+    alerts = monitor.recent_alerts(since, limit)
+    return AnalysisResponse(success=True, data=alerts, metadata={"count": len(alerts), "monitor": name})
+
+
+@router.post("/monitors/{name}/changes", response_model=AnalysisResponse)
+async def record_monitor_changes(name: str, request: MonitorChangesRequest):
+    """Record new relationships in the change log of a monitor started with feed=log"""
+    monitor = monitor_manager.get(name)
+    if monitor is None:
+        raise HTTPException(status_code=404, detail=f"Monitor {name} not found")
+    if not isinstance(monitor.feed, ChangeLog):
+        raise HTTPException(status_code=400, detail=f"Monitor {name} does not use the log feed")
+    sequence = monitor.feed.record_edges(request.edges)
+    return AnalysisResponse(success=True, data={"sequence": sequence, "edges": len(request.edges)})
@@ -1,54 +1,227 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from app.models.schemas import CentralityRequest, AnalysisResponse
 from app.services.centrality_service import CentralityService
+from app.services.result_cache import result_cache
+from app.streaming import OutputFormat, stream_rows
 
 router = APIRouter()
 service = CentralityService()
 
 @router.post("/betweenness", response_model=AnalysisResponse)
-async def get_betweenness_centrality(request: CentralityRequest):
-    """Calculate the betweenness centrality"""
+async def get_betweenness_centrality(
+        request: CentralityRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
+    """
+    Calculate the betweenness centrality
+
+    engine "native": parallel Brandes on a CSR snapshot; options.epsilon / options.delta
+    switch to adaptive sampling and metadata reports the error bound
+    """
     try:
-        result = service.calculate_betweenness(
-            request.relationship_type,
-            request.options
+        if output_format != "json":
+            return await stream_rows(service.calculate_betweenness_stream(
+                request.relationship_type,
+                request.options,
+                top_k=request.limit,
+                engine=request.engine
+            ), output_format)
+        if request.limit or request.offset or request.cursor:
+            result, page = await service.calculate_page(
+                "betweenness",
+                request.relationship_type,
+                request.options,
+                request.limit,
+                request.offset,
+                request.cursor,
+                engine=request.engine
+            )
+            return AnalysisResponse(success=True, data=result, metadata=page)
+        if request.engine == "native":
+            result, cached = await result_cache.get_or_compute(
+                "centrality.calculate_betweenness_native",
+                request.model_dump(),
+                lambda: service.calculate_betweenness_native(
+                    request.relationship_type,
+                    request.options
+                )
+            )
+            return AnalysisResponse(
+                success=True,
+                data=result["data"],
+                metadata={**result["metadata"], "cached": cached}
+            )
+        result, cached = await result_cache.get_or_compute(
+            "centrality.calculate_betweenness",
+            request.model_dump(),
+            lambda: service.calculate_betweenness(
+                request.relationship_type,
+                request.options
+            )
         )
-        return AnalysisResponse(success=True, data=result)
+        return AnalysisResponse(success=True, data=result, metadata={"cached": cached})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/closeness", response_model=AnalysisResponse)
-async def get_closeness_centrality(request: CentralityRequest):
-    """Calculate the closeness centrality"""
+async def get_closeness_centrality(
+        request: CentralityRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
+    """
+    Calculate the closeness centrality
+
+    Options:
+    - variant: "closeness" (default) or "harmonic"
+    - pivots (engine "native"): approximate scores from random pivots
+
+    engine "native": multi-source BFS (64 sources per bitset word) on a CSR snapshot
+    """
     try:
-        result = service.calculate_closeness(
-            request.relationship_type,
-            request.options
+        if output_format != "json":
+            return await stream_rows(service.calculate_closeness_stream(
+                request.relationship_type,
+                request.options,
+                top_k=request.limit,
+                engine=request.engine
+            ), output_format)
+        if request.limit or request.offset or request.cursor:
+            result, page = await service.calculate_page(
+                "closeness",
+                request.relationship_type,
+                request.options,
+                request.limit,
+                request.offset,
+                request.cursor,
+                engine=request.engine
+            )
+            return AnalysisResponse(success=True, data=result, metadata=page)
+        if request.engine == "native":
+            result, cached = await result_cache.get_or_compute(
+                "centrality.calculate_closeness_native",
+                request.model_dump(),
+                lambda: service.calculate_closeness_native(
+                    request.relationship_type,
+                    request.options
+                )
+            )
+            return AnalysisResponse(
+                success=True,
+                data=result["data"],
+                metadata={**result["metadata"], "cached": cached}
+            )
+        result, cached = await result_cache.get_or_compute(
+            "centrality.calculate_closeness",
+            request.model_dump(),
+            lambda: service.calculate_closeness(
+                request.relationship_type,
+                request.options,
+                engine=request.engine
+            )
         )
-        return AnalysisResponse(success=True, data=result)
+        return AnalysisResponse(success=True, data=result, metadata={"cached": cached})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/degree", response_model=AnalysisResponse)
-async def get_degree_centrality(request: CentralityRequest):
+async def get_degree_centrality(
+        request: CentralityRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
     """Calculate the degree centrality"""
     try:
-        result = service.calculate_degree(
-            request.relationship_type,
-            request.options
+        if output_format != "json":
+            return await stream_rows(service.calculate_degree_stream(
+                request.relationship_type,
+                request.options,
+                top_k=request.limit
+            ), output_format)
+        if request.limit or request.offset or request.cursor:
+            result, page = await service.calculate_page(
+                "degree",
+                request.relationship_type,
+                request.options,
+                request.limit,
+                request.offset,
+                request.cursor
+            )
+            return AnalysisResponse(success=True, data=result, metadata=page)
+        result, cached = await result_cache.get_or_compute(
+            "centrality.calculate_degree",
+            request.model_dump(),
+            lambda: service.calculate_degree(
+                request.relationship_type,
+                request.options
+            )
         )
-        return AnalysisResponse(success=True, data=result)
+        return AnalysisResponse(success=True, data=result, metadata={"cached": cached})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/pagerank", response_model=AnalysisResponse)
-async def get_pagerank(request: CentralityRequest):
-    """Calculate the PageRank"""
+async def get_pagerank(
+        request: CentralityRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
+    """
+    Calculate the PageRank
+
+    engine:
+    - "gds": GDS pageRank on a catalog projection
+    - "native": in-process power iteration on a CSR snapshot (works without GDS);
+      accepts options.sourceNodes for personalized PageRank. Its scores sum to 1
+      (GDS scores are not normalized); metadata reports the iterations and the normalization
+    """
     try:
-        result = service.calculate_pagerank(
-            request.relationship_type,
-            request.options
+        if output_format != "json":
+            return await stream_rows(service.calculate_pagerank_stream(
+                request.relationship_type,
+                request.options,
+                top_k=request.limit,
+                engine=request.engine
+            ), output_format)
+        if request.limit or request.offset or request.cursor:
+            result, page = await service.calculate_page(
+                "pagerank",
+                request.relationship_type,
+                request.options,
+                request.limit,
+                request.offset,
+                request.cursor,
+                engine=request.engine
+            )
+            return AnalysisResponse(success=True, data=result, metadata=page)
+        if request.engine == "native":
+            result, cached = await result_cache.get_or_compute(
+                "centrality.calculate_pagerank_native",
+                request.model_dump(),
+                lambda: service.calculate_pagerank_native(
+                    request.relationship_type,
+                    request.options
+                )
+            )
+            return AnalysisResponse(
+                success=True,
+                data=result["data"],
+                metadata={**result["metadata"], "cached": cached}
+            )
+        result, cached = await result_cache.get_or_compute(
+            "centrality.calculate_pagerank",
+            request.model_dump(),
+            lambda: service.calculate_pagerank(
+                request.relationship_type,
+                request.options,
+                engine=request.engine
+            )
         )
-        return AnalysisResponse(success=True, data=result)
+        return AnalysisResponse(success=True, data=result, metadata={"cached": cached})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,42 +1,221 @@
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import CommunityRequest, AnalysisResponse
+from fastapi import APIRouter, HTTPException, Query
+from app.models.schemas import CommunityRequest, ComponentEdgesRequest, AnalysisResponse
 from app.services.community_service import CommunityService
+from app.services.result_cache import result_cache
+from app.streaming import OutputFormat, stream_rows
 
 router = APIRouter()
 service = CommunityService()
 
 @router.post("/louvain", response_model=AnalysisResponse)
-async def detect_louvain_communities(request: CommunityRequest):
-    """Detect community with Louvain"""
+async def detect_louvain_communities(
+        request: CommunityRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
+    """
+    Detect community with Louvain
+
+    Options:
+    - includeIntermediateCommunities: one row per node with its community at every level
+    - seedProperty / seedPartition (engine "native"): warm start from a previous partition
+
+    engine "native": multi-level Louvain on a CSR snapshot, metadata reports
+    the number of levels and the modularity of every level
+    """
     try:
-        result = service.detect_louvain(
-            request.relationship_type,
-            request.options
+        if output_format != "json":
+            return await stream_rows(service.detect_louvain_stream(
+                request.relationship_type,
+                request.options,
+                engine=request.engine
+            ), output_format)
+        if request.engine == "native":
+            result, cached = await result_cache.get_or_compute(
+                "community.detect_louvain_native",
+                request.model_dump(),
+                lambda: service.detect_communities_native(
+                    request.relationship_type,
+                    request.options
+                )
+            )
+            return AnalysisResponse(
+                success=True,
+                data=result["data"],
+                metadata={**result["metadata"], "cached": cached}
+            )
+        result, cached = await result_cache.get_or_compute(
+            "community.detect_louvain",
+            request.model_dump(),
+            lambda: service.detect_louvain(
+                request.relationship_type,
+                request.options
+            )
         )
-        return AnalysisResponse(success=True, data=result)
+        return AnalysisResponse(success=True, data=result, metadata={"cached": cached})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/leiden", response_model=AnalysisResponse)
+async def detect_leiden_communities(
+        request: CommunityRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
+    """
+    Detect community with Leiden (Louvain with a refinement step: communities stay connected)
+
+    Same options as /louvain
+    """
+    try:
+        if output_format != "json":
+            return await stream_rows(service.detect_leiden_stream(
+                request.relationship_type,
+                request.options,
+                engine=request.engine
+            ), output_format)
+        if request.engine == "native":
+            result, cached = await result_cache.get_or_compute(
+                "community.detect_leiden_native",
+                request.model_dump(),
+                lambda: service.detect_communities_native(
+                    request.relationship_type,
+                    request.options,
+                    leiden=True
+                )
+            )
+            return AnalysisResponse(
+                success=True,
+                data=result["data"],
+                metadata={**result["metadata"], "cached": cached}
+            )
+        result, cached = await result_cache.get_or_compute(
+            "community.detect_leiden",
+            request.model_dump(),
+            lambda: service.detect_leiden(
+                request.relationship_type,
+                request.options
+            )
+        )
+        return AnalysisResponse(success=True, data=result, metadata={"cached": cached})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/greedy", response_model=AnalysisResponse)
-async def detect_greedy_communities(request: CommunityRequest):
-    """Detect community with Louvain"""
+async def detect_greedy_communities(
+        request: CommunityRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
+    """
+    Detect community with Label Propagation
+
+    engine "native": deterministic label propagation on a CSR snapshot (seeded tie-break,
+    stops once labels stop changing); metadata reports the iterations and the
+    fraction of changed labels at every iteration
+    """
     try:
-        result = service.detect_greedy(
-            request.relationship_type,
-            request.options
+        if output_format != "json":
+            return await stream_rows(service.detect_greedy_stream(
+                request.relationship_type,
+                request.options,
+                engine=request.engine
+            ), output_format)
+        if request.engine == "native":
+            result, cached = await result_cache.get_or_compute(
+                "community.detect_label_propagation_native",
+                request.model_dump(),
+                lambda: service.detect_label_propagation_native(
+                    request.relationship_type,
+                    request.options
+                )
+            )
+            return AnalysisResponse(
+                success=True,
+                data=result["data"],
+                metadata={**result["metadata"], "cached": cached}
+            )
+        result, cached = await result_cache.get_or_compute(
+            "community.detect_greedy",
+            request.model_dump(),
+            lambda: service.detect_greedy(
+                request.relationship_type,
+                request.options
+            )
         )
-        return AnalysisResponse(success=True, data=result)
+        return AnalysisResponse(success=True, data=result, metadata={"cached": cached})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/wcc", response_model=AnalysisResponse)
-async def detect_wcc(request: CommunityRequest):
-    """Detect weakly connected components"""
+async def detect_wcc(
+        request: CommunityRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
+    """
+    Detect weakly connected components
+
+    Options:
+    - summary: component count, size histogram and largest components instead of member lists
+    - topComponents: number of components listed in summary mode (default 20)
+    - includeMembers: add the member lists of the listed components
+
+    engine "native": union-find on a CSR snapshot, kept up to date by POST /wcc/edges
+    """
+    try:
+        if output_format != "json":
+            return await stream_rows(service.detect_weakly_connected_components_stream(
+                request.relationship_type,
+                request.options,
+                engine=request.engine
+            ), output_format)
+        if request.options.get("summary"):
+            result, cached = await result_cache.get_or_compute(
+                "community.summarize_components",
+                request.model_dump(),
+                lambda: service.summarize_components(
+                    request.relationship_type,
+                    request.options,
+                    engine=request.engine
+                )
+            )
+            return AnalysisResponse(success=True, data=result, metadata={"cached": cached})
+        result, cached = await result_cache.get_or_compute(
+            "community.detect_weakly_connected_components",
+            request.model_dump(),
+            lambda: service.detect_weakly_connected_components(
+                request.relationship_type,
+                request.options,
+                engine=request.engine
+            )
+        )
+        return AnalysisResponse(success=True, data=result, metadata={"cached": cached})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/wcc/edges", response_model=AnalysisResponse)
+async def add_wcc_edges(request: ComponentEdgesRequest):
+    """
+    Absorb newly inserted relationships into the native component index
+
+    Each edge merges two components (union-find), without recomputing WCC.
+    Call it after writing the relationships to Neo4j.
+    """
     try:
-        result = service.detect_weakly_connected_components(
+        result = await service.add_component_edges(
             request.relationship_type,
+            request.edges,
             request.options
         )
+        # The relationships are in Neo4j by now: re-read the graph fingerprint
+        result_cache.invalidate_fingerprint()
         return AnalysisResponse(success=True, data=result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, HTTPException, Query
 from app.models.schemas import (
     AnalysisResponse, NodeSearchRequest, NeighborsRequest,
-    SubgraphRequest, ConnectionCheckRequest
+    SubgraphRequest, ConnectionCheckRequest, SnapshotRequest, ReachabilityIndexRequest
 )
 from app.services.neo4j_service import Neo4jService
+from app.services.projection_catalog import projection_catalog
+from app.services.result_cache import result_cache
+from app.services.snapshot_service import SnapshotConflict, snapshot_store
 
 router = APIRouter()
 service = Neo4jService()
@@ -21,7 +24,7 @@ async def get_graph_statistics():
     - List of relationship types
     """
     try:
-        result = service.get_graph_stats()
+        result = await service.get_graph_stats()
         return AnalysisResponse(success=True, data=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -38,7 +41,7 @@ async def get_detailed_statistics():
     - Degree statistics (average, min, max, standard deviation)
     """
     try:
-        result = service.get_detailed_stats()
+        result = await service.get_detailed_stats()
         return AnalysisResponse(success=True, data=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -55,7 +58,7 @@ async def get_node(node_id: int):
     - All properties
     """
     try:
-        result = service.get_node_by_id(node_id)
+        result = await service.get_node_by_id(node_id)
         if not result:
             raise HTTPException(status_code=404, detail=f"Node {node_id} not found")
         return AnalysisResponse(success=True, data=result)
@@ -80,7 +83,7 @@ async def get_node_with_relationships(
     - Counters
     """
     try:
-        result = service.get_node_with_relationships(node_id, limit)
+        result = await service.get_node_with_relationships(node_id, limit)
         if not result:
             raise HTTPException(status_code=404, detail=f"Node {node_id} not found")
         return AnalysisResponse(success=True, data=result)
@@ -101,7 +104,7 @@ async def search_nodes(request: NodeSearchRequest):
     - All cities named Paris: {"property_filters": {"name": "Paris"}}
     """
     try:
-        result = service.search_nodes(
+        result = await service.search_nodes(
             request.label,
             request.property_filters,
             request.limit
@@ -131,7 +134,7 @@ async def get_neighbors(request: NeighborsRequest):
     - Following: {"node_id": 123, "relationship_type": "FOLLOWS", "direction": "OUTGOING"}
     """
     try:
-        result = service.get_neighbors(
+        result = await service.get_neighbors(
             request.node_id,
             request.relationship_type,
             request.direction,
@@ -167,7 +170,7 @@ async def get_subgraph(request: SubgraphRequest):
     Limit: max 1000 nodes
     """
     try:
-        result = service.get_subgraph(request.node_ids)
+        result = await service.get_subgraph(request.node_ids)
         return AnalysisResponse(
             success=True,
             data=result,
@@ -191,25 +194,91 @@ async def check_connection(request: ConnectionCheckRequest):
     Options:
     - relationship_type: type of relationship to consider (optional)
     - max_hops: maximum search depth (default: 5)
+    - directed: only follow relationships from start to end
 
     Faster than find_shortest_path because it stops as soon as a connection is found
+
+    engine=native: answered in memory from the reachability index of a snapshot (built on
+    first use, see POST /api/graph/reachability): weak components rule out unconnected
+    pairs in O(1), GRAIL labels answer directed checks, and a bidirectional BFS bounded by
+    max_hops (null for no limit) confirms hop-limited ones. Options: snapshot, node_label
     """
     try:
-        result = service.check_connection_exists(
-            request.start_node_id,
-            request.end_node_id,
-            request.relationship_type,
-            request.max_hops
-        )
+        details = {}
+        if request.engine == "native":
+            details = await service.check_connection_native(
+                request.start_node_id,
+                request.end_node_id,
+                request.relationship_type,
+                request.max_hops,
+                request.directed,
+                request.options
+            )
+            result = details.pop("connected")
+        else:
+            result = await service.check_connection_exists(
+                request.start_node_id,
+                request.end_node_id,
+                request.relationship_type,
+                request.max_hops,
+                request.directed
+            )
         return AnalysisResponse(
             success=True,
             data={"connected": result},
             metadata={
                 "start_node_id": request.start_node_id,
                 "end_node_id": request.end_node_id,
-                "max_hops": request.max_hops
+                "max_hops": request.max_hops,
+                "directed": request.directed,
+                **details
             }
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/reachability", response_model=AnalysisResponse, status_code=201)
+async def build_reachability_index(request: ReachabilityIndexRequest):
+    """
+    Build the reachability index of a snapshot
+
+    Weak components, strong components condensed into a DAG and GRAIL interval labels,
+    used by /check-connection with engine=native.
+
+    Options: snapshot, node_label, traversals (default: 5), randomSeed
+    """
+    try:
+        index = await service.build_reachability_index(request.relationship_type, request.options)
+        return AnalysisResponse(success=True, data=await service.reachability_index_info(index))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/reachability", response_model=AnalysisResponse)
+async def list_reachability_indexes():
+    """Reachability indexes with their staleness (stale: snapshot reloaded since; snapshot_outdated: graph changed)"""
+    try:
+        indexes = await service.list_reachability_indexes()
+        return AnalysisResponse(success=True, data=indexes, metadata={"count": len(indexes)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/reachability/{name}/rebuild", response_model=AnalysisResponse)
+async def rebuild_reachability_index(name: str, refresh: bool = True):
+    """Reload the snapshot from Neo4j (unless refresh=false) and rebuild its reachability index"""
+    try:
+        index = await service.rebuild_reachability_index(name, refresh)
+        if index is None:
+            raise HTTPException(status_code=404, detail=f"Reachability index {name} not found")
+        return AnalysisResponse(success=True, data=await service.reachability_index_info(index))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -231,7 +300,153 @@ async def get_database_info():
     - Security auditing
     """
     try:
-        result = service.get_database_info()
+        result = await service.get_database_info()
         return AnalysisResponse(success=True, data=result)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/projections", response_model=AnalysisResponse)
+async def list_projections():
+    """
+    List the GDS projections held by the shared projection catalog
+
+    Returns for each projection:
+    - Projection key (node label, relationship type, orientation, weight properties)
+    - Reference count and idle time
+    - Node/relationship counts and memory size
+    """
+    try:
+        result = projection_catalog.list_projections()
+        return AnalysisResponse(
+            success=True,
+            data=result,
+            metadata={"count": len(result)}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/projections", response_model=AnalysisResponse)
+async def invalidate_projections(relationship_type: str = Query(default=None)):
+    """
+    Drop the idle projections of the catalog (e.g: after a bulk import)
+
+    Projections currently in use are kept and expire normally.
+    """
+    try:
+        dropped = await projection_catalog.invalidate(relationship_type)
+        return AnalysisResponse(success=True, data={"dropped": dropped})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/cache", response_model=AnalysisResponse)
+async def get_cache_stats():
+    """
+    Retrieve result cache statistics
+
+    Returns:
+    - Backend (memory/redis)
+    - Hits and misses since startup
+    - Entries and bytes used (memory backend)
+    """
+    try:
+        return AnalysisResponse(success=True, data=result_cache.stats())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/cache", response_model=AnalysisResponse)
+async def clear_cache():
+    """
+    Clear the result cache
+
+    Entries are already invalidated when the graph fingerprint changes;
+    this is useful after changes the fingerprint cannot see (e.g: property updates).
+    """
+    try:
+        await result_cache.clear()
+        return AnalysisResponse(success=True, data=result_cache.stats())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/snapshots", response_model=AnalysisResponse)
+async def create_snapshot(request: SnapshotRequest):
+    """
+    Load an in-memory CSR snapshot of the graph
+
+    The nodes of node_label (all nodes if omitted) and the relationships of
+    relationship_type between them are bulk-loaded into NumPy arrays:
+    - offsets / targets (int32 or int64 depending on the graph size)
+    - weights (float32, when weight_property is set)
+    - node ids (mapping from compact indices to Neo4j ids)
+
+    Returns the existing snapshot if one with the same name is already loaded
+    (409 if it was loaded from another label / relationship type / weight property).
+    """
+    try:
+        snapshot = await snapshot_store.create(
+            request.node_label,
+            request.relationship_type,
+            request.weight_property,
+            request.name
+        )
+        return AnalysisResponse(success=True, data=snapshot.to_dict())
+    except SnapshotConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/snapshots", response_model=AnalysisResponse)
+async def list_snapshots():
+    """
+    List the loaded snapshots
+
+    Returns for each snapshot:
+    - Name, node label, relationship type and weight property
+    - Node/relationship counts and memory size
+    - Load time and duration
+    """
+    try:
+        result = snapshot_store.list_snapshots()
+        return AnalysisResponse(
+            success=True,
+            data=result,
+            metadata={"count": len(result)}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/snapshots/{name}", response_model=AnalysisResponse)
+async def get_snapshot(name: str):
+    """Retrieve a snapshot by its name"""
+    snapshot = snapshot_store.get(name)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"Snapshot {name} not found")
+    return AnalysisResponse(success=True, data=snapshot.to_dict())
+
+
+@router.post("/snapshots/{name}/refresh", response_model=AnalysisResponse)
+async def refresh_snapshot(name: str):
+    """Reload a snapshot from Neo4j (e.g: after writes to the graph)"""
+    try:
+        snapshot = await snapshot_store.refresh(name)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail=f"Snapshot {name} not found")
+        return AnalysisResponse(success=True, data=snapshot.to_dict())
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/snapshots/{name}", response_model=AnalysisResponse)
+async def drop_snapshot(name: str):
+    """Drop a snapshot and release its memory"""
+    if not snapshot_store.drop(name):
+        raise HTTPException(status_code=404, detail=f"Snapshot {name} not found")
+    return AnalysisResponse(success=True, data={"dropped": name})
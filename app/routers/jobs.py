@@ -0,0 +1,106 @@
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import ValidationError
+from app.models.schemas import AnalysisResponse, JobRequest
+from app.services.job_service import job_manager, JobQueueFull, JOB_TYPES
+
+router = APIRouter()
+
+
+@router.post("", response_model=AnalysisResponse, status_code=202)
+async def submit_job(request: JobRequest):
+    """
+    Submit a long-running analysis and return its job id immediately
+
+    Any centrality, community, anomaly, path or prediction request can be submitted:
+    - kind + algorithm select the endpoint (e.g: centrality/betweenness, path/shortest-dijkstra)
+    - request is the body that endpoint would receive
+
+    Poll GET /api/jobs/{job_id}, then fetch GET /api/jobs/{job_id}/result
+    """
+    try:
+        job = job_manager.submit(request.kind, request.algorithm, request.request)
+        return AnalysisResponse(success=True, data=job.to_dict())
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("", response_model=AnalysisResponse)
+async def list_jobs():
+    """List the jobs still retained (queued, running or recently finished)"""
+    try:
+        jobs = [job.to_dict() for job in job_manager.list_jobs()]
+        return AnalysisResponse(
+            success=True,
+            data=jobs,
+            metadata={"count": len(jobs), "job_types": [f"{k}/{a}" for k, a in JOB_TYPES]}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{job_id}", response_model=AnalysisResponse)
+async def get_job(job_id: str):
+    """
+    Retrieve the status of a job
+
+    Returns:
+    - Status: queued, running, succeeded, failed, cancelled
+    - Stage and number of rows collected so far
+    - Progress reported by the native engines (tasks, samples, iterations or levels done
+      out of the total), null when the engine does not report any
+    - Timings (queued and run durations)
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return AnalysisResponse(success=True, data=job.to_dict())
+
+
+@router.get("/{job_id}/result", response_model=AnalysisResponse)
+async def get_job_result(
+        job_id: str,
+        limit: int = Query(default=100, ge=1, le=10000),
+        offset: int = Query(default=0, ge=0)
+):
+    """Retrieve one page of the result of a succeeded job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job.status}")
+    page = job.result[offset:offset + limit]
+    return AnalysisResponse(
+        success=True,
+        data=page,
+        metadata={
+            "job_id": job_id,
+            "total": len(job.result),
+            "limit": limit,
+            "offset": offset,
+            "has_more": offset + limit < len(job.result),
+            # Engine metadata of the whole result (error bound, modularity, ...)
+            "result_metadata": job.result_metadata
+        }
+    )
+
+
+@router.delete("/{job_id}", response_model=AnalysisResponse)
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued or running job
+
+    The running query is interrupted and the GDS projections created for this job are dropped.
+    """
+    try:
+        job = await job_manager.cancel(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        return AnalysisResponse(success=True, data=job.to_dict())
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
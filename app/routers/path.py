@@ -1,55 +1,137 @@
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import PathRequest, AnalysisResponse, DijkstraPathRequest, AllShortestPathsRequest
+import json
+from typing import Literal
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query
+from app.models.schemas import (
+    PathRequest, AnalysisResponse, DijkstraPathRequest, AllShortestPathsRequest, LandmarkIndexRequest,
+    DistanceMatrixRequest
+)
 from app.services.path_service import PathService
+from app.services.result_cache import result_cache
+from app.streaming import OutputFormat, array_response, stream_rows
 
 router = APIRouter()
 service = PathService()
 
 @router.post("/shortest", response_model=AnalysisResponse)
-async def get_shortest_path(request: PathRequest):
-    """Find the shortest path"""
+async def get_shortest_path(
+        request: PathRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
+    """
+    Find the shortest path
+
+    engine=native: bidirectional BFS on a CSR snapshot (options: orientation, snapshot)
+    """
     try:
-        result = service.find_shortest_path(
-            request.start_node_id,
-            request.end_node_id,
-            request.relationship_type,
-            request.max_hops
+        if output_format != "json":
+            return await stream_rows(service.find_shortest_path_stream(
+                request.start_node_id,
+                request.end_node_id,
+                request.relationship_type,
+                request.max_hops,
+                request.options,
+                engine=request.engine
+            ), output_format)
+        result, cached = await result_cache.get_or_compute(
+            "path.find_shortest_path",
+            request.model_dump(),
+            lambda: service.find_shortest_path(
+                request.start_node_id,
+                request.end_node_id,
+                request.relationship_type,
+                request.max_hops,
+                request.options,
+                engine=request.engine
+            )
         )
         return AnalysisResponse(
             success=True,
             data=result,
             metadata={
-                "algorithm": "cypher_shortest_path",
+                "cached": cached,
+                "algorithm": "bidirectional_bfs" if request.engine == "native" else "cypher_shortest_path",
                 "weighted": False
             }
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/all", response_model=AnalysisResponse)
-async def get_all_paths(request: PathRequest):
-    """Find all paths"""
+async def get_all_paths(
+        request: PathRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
+    """
+    Find all paths (at most k, up to max_hops)
+
+    engine=native: the k shortest loopless paths in cost order (Yen), on a CSR snapshot.
+    Options: relationshipWeightProperty (hops when absent), timeBudgetMs (returns the
+    paths found so far, metadata.complete = false), orientation, snapshot
+    """
     try:
-        result = service.find_all_paths(
-            request.start_node_id,
-            request.end_node_id,
-            request.relationship_type,
-            request.max_hops
+        if output_format != "json":
+            return await stream_rows(service.find_all_paths_stream(
+                request.start_node_id,
+                request.end_node_id,
+                request.relationship_type,
+                request.max_hops,
+                request.k,
+                request.options,
+                engine=request.engine
+            ), output_format)
+        metadata = {
+            "algorithm": "yen_k_shortest" if request.engine == "native" else "cypher_all_paths",
+            "max_results": request.k
+        }
+        if request.engine == "native":
+            result, cached = await result_cache.get_or_compute(
+                "path.find_k_shortest_paths_native",
+                request.model_dump(),
+                lambda: service.find_k_shortest_paths_native(
+                    request.start_node_id,
+                    request.end_node_id,
+                    request.relationship_type,
+                    request.max_hops,
+                    request.k,
+                    request.options
+                )
+            )
+            return AnalysisResponse(
+                success=True,
+                data=result["data"],
+                metadata={**metadata, **result["metadata"], "cached": cached}
+            )
+        result, cached = await result_cache.get_or_compute(
+            "path.find_all_paths",
+            request.model_dump(),
+            lambda: service.find_all_paths(
+                request.start_node_id,
+                request.end_node_id,
+                request.relationship_type,
+                request.max_hops,
+                request.k
+            )
         )
         return AnalysisResponse(
             success=True,
             data=result,
-            metadata={
-                "algorithm": "cypher_all_paths",
-                "max_results": 100
-            }
+            metadata={**metadata, "cached": cached}
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/shortest-dijkstra", response_model=AnalysisResponse)
-async def get_shortest_path_dijkstra(request: DijkstraPathRequest):
+async def get_shortest_path_dijkstra(
+        request: DijkstraPathRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
     """
     Find the shortest path using Dijkstra’s algorithm (GDS)
 
@@ -61,7 +143,11 @@ async def get_shortest_path_dijkstra(request: DijkstraPathRequest):
         Options:
         - relationshipWeightProperty: name of the property containing the weight
           (if absent, all relationships have a weight of 1)
-        - graph_name: name of the temporary graph (auto-generated if not provided)
+        - graph_name: name of an existing projected graph (default: shared projection catalog)
+
+        engine=native: bidirectional Dijkstra on a CSR snapshot, no projection per query
+        (options: orientation, snapshot), or A* with landmark bounds once the snapshot has
+        an ALT index (POST /api/path/landmarks)
 
         Example with weights:
         ```
@@ -80,27 +166,117 @@ async def get_shortest_path_dijkstra(request: DijkstraPathRequest):
         ```
     """
     try:
-        result = service.find_shortest_path_dijkstra(
-            request.start_node_id,
-            request.end_node_id,
-            request.relationship_type,
-            request.options
+        if output_format != "json":
+            return await stream_rows(service.find_shortest_path_dijkstra_stream(
+                request.start_node_id,
+                request.end_node_id,
+                request.relationship_type,
+                request.options,
+                engine=request.engine
+            ), output_format)
+        result, cached = await result_cache.get_or_compute(
+            "path.find_shortest_path_dijkstra",
+            request.model_dump(),
+            lambda: service.find_shortest_path_dijkstra(
+                request.start_node_id,
+                request.end_node_id,
+                request.relationship_type,
+                request.options,
+                engine=request.engine
+            )
         )
         return AnalysisResponse(
             success=True,
             data=result,
             metadata={
-                "algorithm": "dijkstra",
+                "cached": cached,
+                "algorithm": "bidirectional_dijkstra" if request.engine == "native" else "dijkstra",
                 "weighted": request.options.get("relationshipWeightProperty") is not None,
                 "weight_property": request.options.get("relationshipWeightProperty", "none")
             }
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/matrix", response_model=AnalysisResponse)
+async def get_distance_matrix(
+        request: DistanceMatrixRequest,
+        output_format: Literal["json", "ndjson", "csv", "npy"] = Query(default="json", alias="format")
+):
+    """
+    Shortest path distances between every source and every target, in one request
+
+    One projection (gds) or snapshot (native) is shared by the whole matrix and each
+    distinct source runs a single search; with engine=native the sources are spread over
+    the process pool and each search stops once all the targets are reached.
+
+    Options: relationshipWeightProperty (hops when absent), orientation, snapshot (native),
+    graph_name (gds)
+
+    Formats:
+    - json: dense (distances[i][j], null when unreachable) or sparse rows (layout)
+    - ndjson / csv: one row per reachable pair
+    - npy: float32 array (sources x targets, inf when unreachable), paths are not included
+    """
+    try:
+        if output_format == "npy":
+            matrix, _, metadata = await service.distance_matrix_array(
+                request.source_node_ids,
+                request.target_node_ids,
+                request.relationship_type,
+                request.options,
+                engine=request.engine
+            )
+            return array_response(
+                matrix.astype(np.float32), "distances.npy",
+                {"X-Matrix-Metadata": json.dumps(metadata, separators=(",", ":"))}
+            )
+        if output_format != "json":
+            return await stream_rows(service.distance_matrix_stream(
+                request.source_node_ids,
+                request.target_node_ids,
+                request.relationship_type,
+                request.options,
+                request.include_paths,
+                engine=request.engine
+            ), output_format)
+        result, cached = await result_cache.get_or_compute(
+            "path.distance_matrix",
+            request.model_dump(),
+            lambda: service.distance_matrix(
+                request.source_node_ids,
+                request.target_node_ids,
+                request.relationship_type,
+                request.options,
+                request.layout,
+                request.include_paths,
+                engine=request.engine
+            )
+        )
+        return AnalysisResponse(
+            success=True,
+            data=result["data"],
+            metadata={
+                **result["metadata"],
+                "cached": cached,
+                "layout": request.layout,
+                "weighted": request.options.get("relationshipWeightProperty") is not None
+            }
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/all-shortest-dijkstra", response_model=AnalysisResponse)
-async def get_all_shortest_paths_dijkstra(request: AllShortestPathsRequest):
+async def get_all_shortest_paths_dijkstra(
+        request: AllShortestPathsRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
     """
     Find all shortest paths from a source node (SSSP)
 
@@ -110,25 +286,96 @@ async def get_all_shortest_paths_dijkstra(request: AllShortestPathsRequest):
     - Finding the most accessible nodes
     - Distance-based centrality analysis
 
+    Rows come closest first, distances only unless include_paths is set.
+
     Options:
     - relationshipWeightProperty: weight property
     - max_distance: maximum distance (filters the results)
+    - max_targets: number of closest targets returned (the source itself comes first)
+    - include_paths: node ids of each path
+
+    engine=native: the search runs on a CSR snapshot (options: orientation, snapshot) and
+    stops at max_distance / max_targets, so bounded queries (isochrones) only cost the
+    ball they cover
     """
     try:
-        result = service.find_all_shortest_paths_dijkstra(
-            request.start_node_id,
-            request.relationship_type,
-            request.options
+        if output_format != "json":
+            return await stream_rows(service.find_all_shortest_paths_dijkstra_stream(
+                request.start_node_id,
+                request.relationship_type,
+                request.options,
+                engine=request.engine
+            ), output_format)
+        result, cached = await result_cache.get_or_compute(
+            "path.find_all_shortest_paths_dijkstra",
+            request.model_dump(),
+            lambda: service.find_all_shortest_paths_dijkstra(
+                request.start_node_id,
+                request.relationship_type,
+                request.options,
+                engine=request.engine
+            )
         )
         return AnalysisResponse(
             success=True,
             data=result,
             metadata={
+                "cached": cached,
                 "algorithm": "dijkstra_sssp",
                 "source_node": request.start_node_id,
-                "paths_found": len(result)
+                "paths_found": len(result),
+                "max_distance": request.options.get("max_distance"),
+                "max_targets": request.options.get("max_targets")
             }
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+
+@router.post("/landmarks", response_model=AnalysisResponse, status_code=201)
+async def build_landmark_index(request: LandmarkIndexRequest):
+    """
+    Build the ALT landmark index of a snapshot
+
+    Distances between k landmarks and every node are stored as memory-mapped arrays and
+    used as A* lower bounds by /shortest-dijkstra with engine=native.
+
+    Options: relationshipWeightProperty, orientation (default: UNDIRECTED), snapshot, randomSeed
+    """
+    try:
+        index = await service.build_landmark_index(request.relationship_type, request.landmarks, request.options)
+        return AnalysisResponse(success=True, data=service.landmark_index_info(index))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.get("/landmarks", response_model=AnalysisResponse)
+async def list_landmark_indexes():
+    """List the landmark indexes with their memory footprint and staleness"""
+    indexes = service.list_landmark_indexes()
+    return AnalysisResponse(
+        success=True,
+        data=indexes,
+        metadata={"count": len(indexes), "size_in_bytes": sum(index["size_in_bytes"] for index in indexes)}
+    )
+
+
+@router.post("/landmarks/{name}/rebuild", response_model=AnalysisResponse)
+async def rebuild_landmark_index(name: str):
+    """Rebuild a landmark index with its original parameters (e.g: after a snapshot refresh)"""
+    try:
+        index = await service.rebuild_landmark_index(name)
+        if index is None:
+            raise HTTPException(status_code=404, detail=f"Landmark index {name} not found")
+        return AnalysisResponse(success=True, data=service.landmark_index_info(index))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,13 +1,20 @@
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import LinkPredictionRequest, NodePredictionRequest, AnalysisResponse
+from fastapi import APIRouter, HTTPException, Query
+from app.models.schemas import (
+    LinkPredictionRequest, BatchLinkPredictionRequest, NodePredictionRequest, AnalysisResponse
+)
 from app.services.prediction_service import PredictionService
+from app.services.result_cache import result_cache
+from app.streaming import OutputFormat, stream_rows
 
 router = APIRouter()
 service = PredictionService()
 
 
 @router.post("/links", response_model=AnalysisResponse)
-async def predict_links(request: LinkPredictionRequest):
+async def predict_links(
+        request: LinkPredictionRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
     """
     Predict future links using Node Similarity (GDS)
 
@@ -15,27 +22,96 @@ async def predict_links(request: LinkPredictionRequest):
     - topK: Number of suggestions (default: 10)
     - similarityCutoff: Minimum similarity threshold (default: 0.0)
     - similarityMetric: JACCARD, COSINE, OVERLAP (default: JACCARD)
+
+    engine=native: only the 2-hop neighbourhood of the node is scored, on a CSR snapshot
+    (cost proportional to that neighbourhood, not to the graph). Extra metrics: ADAMIC_ADAR,
+    RESOURCE_ALLOCATION, COMMON_NEIGHBORS; excludeNeighbors drops the existing links;
+    orientation, snapshot
     """
     try:
-        result = service.predict_links(
-            request.node_id,
-            request.relationship_type,
-            request.options
+        if output_format != "json":
+            return await stream_rows(service.predict_links_stream(
+                request.node_id,
+                request.relationship_type,
+                request.options,
+                engine=request.engine
+            ), output_format)
+        result, cached = await result_cache.get_or_compute(
+            "prediction.predict_links",
+            request.model_dump(),
+            lambda: service.predict_links(
+                request.node_id,
+                request.relationship_type,
+                request.options,
+                engine=request.engine
+            )
         )
         return AnalysisResponse(
             success=True,
             data=result,
             metadata={
+                "cached": cached,
                 "node_id": request.node_id,
-                "metric": request.options.get("similarityMetric", "JACCARD")
+                "metric": request.options.get("similarityMetric", "JACCARD"),
+                "engine": request.engine
             }
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/links/batch", response_model=AnalysisResponse)
+async def predict_links_batch(
+        request: BatchLinkPredictionRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
+    """
+    Top-k link suggestions of every node in one pass, on a CSR snapshot
+
+    Candidate pairs come from MinHash LSH over the neighbour sets, then are scored
+    exactly in chunks bounded by memoryBudgetBytes on the process pool. Throughput and
+    the recall measured against the exact top-k of recallSample nodes are returned in
+    metadata. With output_file the pairs are written (NDJSON) to the export directory.
+    Not cached: the result is proportional to the graph.
+
+    Available options:
+    - similarityMetric: JACCARD, COSINE, OVERLAP, ADAMIC_ADAR, RESOURCE_ALLOCATION, COMMON_NEIGHBORS
+    - similarityCutoff, degreeCutoff, orientation (default: NATURAL), snapshot
+    - bands (default: 16), rowsPerBand (default: 2): more bands raise recall and candidates
+    - maxBucketSize (default: 100), memoryBudgetBytes, recallSample (default: 100), randomSeed
+    """
+    try:
+        if output_format != "json":
+            return await stream_rows(service.predict_links_batch_stream(
+                request.relationship_type,
+                request.top_k,
+                request.output_file,
+                request.options
+            ), output_format)
+        result = await service.predict_links_batch(
+            request.relationship_type,
+            request.top_k,
+            request.output_file,
+            request.options
+        )
+        return AnalysisResponse(
+            success=True,
+            data=result["data"],
+            metadata={"top_k": request.top_k, **result["metadata"]}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/node-properties", response_model=AnalysisResponse)
-async def predict_node_properties(request: NodePredictionRequest):
+async def predict_node_properties(
+        request: NodePredictionRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
     """
     Predict missing node properties
 
@@ -46,15 +122,26 @@ async def predict_node_properties(request: NodePredictionRequest):
     - embedding_dimension: Dimension of embeddings if using GDS (default: 128)
     """
     try:
-        result = service.predict_node_properties(
-            request.node_label,
-            request.property_name,
-            request.options
+        if output_format != "json":
+            return await stream_rows(service.predict_node_properties_stream(
+                request.node_label,
+                request.property_name,
+                request.options
+            ), output_format)
+        result, cached = await result_cache.get_or_compute(
+            "prediction.predict_node_properties",
+            request.model_dump(),
+            lambda: service.predict_node_properties(
+                request.node_label,
+                request.property_name,
+                request.options
+            )
         )
         return AnalysisResponse(
             success=True,
             data=result,
             metadata={
+                "cached": cached,
                 "node_label": request.node_label,
                 "property": request.property_name,
                 "knn_k": request.options.get("knn_k", 10),
@@ -66,7 +153,10 @@ async def predict_node_properties(request: NodePredictionRequest):
 
 
 @router.post("/node-properties-advanced", response_model=AnalysisResponse)
-async def predict_node_properties_advanced(request: NodePredictionRequest):
+async def predict_node_properties_advanced(
+        request: NodePredictionRequest,
+        output_format: OutputFormat = Query(default="json", alias="format")
+):
     """
     Predict missing properties using GDS FastRP + KNN (advanced method)
 
@@ -80,7 +170,7 @@ async def predict_node_properties_advanced(request: NodePredictionRequest):
     Available options:
     - knn_k: Number of neighbors (default: 10)
     - embedding_dimension: Embedding dimension (default: 128)
-    - graph_name: Name of the temporary graph (auto-generated if not provided)
+    - graph_name: Name of an existing projected graph (default: shared projection catalog)
 
     Slower but more accurate than the simple method
     """
@@ -91,16 +181,28 @@ async def predict_node_properties_advanced(request: NodePredictionRequest):
                 detail="relationship_type is required for advanced prediction"
             )
 
-        result = service.predict_node_properties_with_gds(
-            request.node_label,
-            request.property_name,
-            request.relationship_type,
-            request.options
+        if output_format != "json":
+            return await stream_rows(service.predict_node_properties_with_gds_stream(
+                request.node_label,
+                request.property_name,
+                request.relationship_type,
+                request.options
+            ), output_format)
+        result, cached = await result_cache.get_or_compute(
+            "prediction.predict_node_properties_with_gds",
+            request.model_dump(),
+            lambda: service.predict_node_properties_with_gds(
+                request.node_label,
+                request.property_name,
+                request.relationship_type,
+                request.options
+            )
         )
         return AnalysisResponse(
             success=True,
             data=result,
             metadata={
+                "cached": cached,
                 "node_label": request.node_label,
                 "property": request.property_name,
                 "knn_k": request.options.get("knn_k", 10),
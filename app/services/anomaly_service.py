@@ -1,7 +1,27 @@
-from app.services.base_service import BaseService
+import asyncio
+from array import array
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.engines.csr import top_indices
+from app.engines.features import FEATURES, node_features
+from app.engines.outliers import isolation_forest, oddball, robust_mahalanobis
+from app.engines.sketches import KLLSketch, Welford
+from app.services.base_service import BaseService, report_metadata
+from app.services.pagination import paginate, paginate_result
+from app.services.projection_catalog import projection_catalog
+from app.services.snapshot_service import snapshot_store
+
+# Degrees buffered before updating the statistics
+STATISTICS_BATCH = 10000
+# Methods scoring a feature matrix computed on a CSR snapshot
+MULTIVARIATE_METHODS = ("mahalanobis", "isolation_forest", "oddball")
+
 
 class AnomalyService(BaseService):
-    def detect_outliers_v0(self, node_label: str, options: dict = None):
+    async def detect_outliers_v0(self, node_label: str, options: dict = None):
         """Detect anomalies nodes"""
         opts = options or {}
         query = f"""
@@ -15,9 +35,9 @@ class AnomalyService(BaseService):
             RETURN id(n) as node_id, score
             ORDER BY score DESC
         """
-        return self.execute_query(query, {"options": opts})
+        return await self.execute_query(query, {"options": opts})
 
-    def detect_outliers_v1(self, node_label: str, relationship_type: str = None, options: dict = None):
+    async def detect_outliers_v1(self, node_label: str, relationship_type: str = None, options: dict = None):
         """
         Detect anomalous nodes based on degree (manual implementation)
         Options:
@@ -120,98 +140,248 @@ class AnomalyService(BaseService):
         else:
             raise ValueError(f"Unknown method: {method}. Use 'iqr', 'zscore', or 'percentile'")
 
-        return self.execute_query(query, params)
+        return await self.execute_query(query, params)
+
+    async def detect_outliers(self, node_label: str, relationship_type: str = None, options: dict = None):
+        """
+        Detect anomalous nodes based on degree
+        Options:
+        method: 'iqr' (Interquartile Range) or 'zscore' (Z-Score) or 'percentile',
+                or a multivariate method (see detect_outliers_multivariate)
+        threshold: for zscore (default: 3), for percentile (default: 0.95)
+        orientation: 'INCOMING', 'OUTGOING', 'BOTH' (default: 'BOTH')
+        """
+        return [row async for row in self.detect_outliers_stream(node_label, relationship_type, options)]
+
+    async def detect_outliers_report(self, node_label: str, relationship_type: str = None,
+                                     options: dict = None) -> Dict:
+        """Anomalous nodes plus the statistics they were selected with"""
+        if (options or {}).get("method") in MULTIVARIATE_METHODS:
+            return await self.detect_outliers_multivariate(node_label, relationship_type, options)
+        statistics = {}
+        rows = [
+            row async for row in self.detect_outliers_stream(
+                node_label, relationship_type, options, statistics=statistics
+            )
+        ]
+        return {"data": rows, "metadata": statistics}
 
-    def detect_outliers(self, node_label: str, relationship_type: str = None, options: dict = None):
+    async def detect_outliers_multivariate(self, node_label: str, relationship_type: str = None,
+                                           options: dict = None, top_k: Optional[int] = None) -> Dict:
+        """
+        Score every node of a CSR snapshot on several features at once
+
+        Features: in/out degree, weighted degree, local clustering coefficient,
+        egonet relationships and PageRank, computed in vectorized passes.
+
+        Options:
+        - method: 'mahalanobis' (robust covariance), 'isolation_forest' or 'oddball'
+          (egonet power law, uses the egonet features only)
+        - features: subset of the features used by mahalanobis / isolation_forest
+        - threshold: minimum anomaly score, else the top `contamination` fraction (default: 0.01)
+        - trees / sampleSize / randomSeed: isolation forest parameters
+        - relationshipWeightProperty: weighted degree and PageRank
+        - snapshot: name of an existing snapshot
+
+        Returns {"data": rows (most anomalous first, with their features), "metadata": method details}
+        """
+        opts = options or {}
+        method = opts.get("method")
+        names = opts.get("features") or list(FEATURES)
+        unknown = [name for name in names if name not in FEATURES]
+        if unknown:
+            raise ValueError(f"Unknown features: {unknown}. Use {list(FEATURES)}")
+        weight_prop = opts.get("relationshipWeightProperty")
+        graph = await snapshot_store.get_graph(
+            opts, relationship_type, node_label=node_label, weight_property=weight_prop
+        )
+        n = graph.node_count
+        features = await asyncio.to_thread(node_features, graph, weighted=bool(weight_prop))
+        metadata = {"node_count": n, "features": names}
+
+        if method == "oddball":
+            scores, fit = await asyncio.to_thread(oddball, features["egonet_nodes"], features["egonet_edges"])
+            metadata["power_law"] = fit
+        else:
+            # Heavy-tailed counts are compared on a log scale (PageRank relative to the uniform 1 / n)
+            matrix = np.column_stack([
+                features[name] if name == "clustering"
+                else np.log1p(features[name] * n if name == "pagerank" else features[name])
+                for name in names
+            ])
+            if method == "mahalanobis":
+                scores = await asyncio.to_thread(robust_mahalanobis, matrix)
+            else:
+                scores = await isolation_forest(
+                    matrix,
+                    trees=opts.get("trees", 100),
+                    sample_size=opts.get("sampleSize", 256),
+                    seed=opts.get("randomSeed", 42)
+                )
+
+        threshold = opts.get("threshold")
+        if threshold is None:
+            limit = max(1, int(np.ceil(n * opts.get("contamination", 0.01)))) if n else 0
+            top_k = min(top_k, limit) if top_k else limit
+            candidates = top_indices(scores, top_k, positive_only=False)
+        else:
+            candidates = top_indices(np.where(scores > threshold, scores, -np.inf), top_k, positive_only=False)
+            candidates = candidates[scores[candidates] > threshold]
+            metadata["threshold"] = threshold
+        metadata["score_mean"] = float(scores.mean()) if n else None
+        metadata["score_std"] = float(scores.std()) if n else None
+
+        rows = [
+            {
+                "node_id": int(graph.node_ids[i]),
+                "score": float(scores[i]),
+                "detection_method": method,
+                "features": {name: float(features[name][i]) for name in FEATURES}
+            }
+            for i in candidates
+        ]
+        return {"data": rows, "metadata": metadata}
+
+    async def degree_statistics(self, graph_name: str) -> Tuple[Welford, KLLSketch]:
+        """
+        First pass: stream every degree once into Welford mean/variance and a KLL sketch
+        (bounded memory, nothing is collected on either side)
+        """
+        moments = Welford()
+        sketch = KLLSketch(settings.anomaly_sketch_k)
+        buffer = array("d")
+        query = """
+        CALL gds.degree.stream($graph_name)
+        YIELD score
+        RETURN score
+        """
+        async for row in self.execute_query_stream(query, {"graph_name": graph_name}):
+            buffer.append(row["score"])
+            if len(buffer) >= STATISTICS_BATCH:
+                values = np.frombuffer(buffer, dtype=np.float64)
+                moments.update_many(values)
+                sketch.update_many(values)
+                buffer = array("d")
+        if buffer:
+            values = np.frombuffer(buffer, dtype=np.float64)
+            moments.update_many(values)
+            sketch.update_many(values)
+        return moments, sketch
+
+    async def detect_outliers_stream(self, node_label: str, relationship_type: str = None, options: dict = None,
+                                     top_k: Optional[int] = None, statistics: Optional[dict] = None):
+        """
+        Stream the anomalous nodes (most anomalous first)
+
+        Two passes over gds.degree.stream: the first computes the statistics
+        (streamed to the service), the second only returns the nodes past the
+        thresholds. statistics, when given, is filled with the thresholds, the
+        degree statistics and the quantile rank error.
+        """
         opts = options or {}
         method = opts.get("method", "percentile")
+        if method in MULTIVARIATE_METHODS:
+            result = await self.detect_outliers_multivariate(node_label, relationship_type, opts, top_k)
+            report_metadata(result["metadata"])
+            for row in result["data"]:
+                yield row
+            return
         threshold = opts.get("threshold", 0.95 if method == "percentile" else 3)
         orientation = opts.get("orientation", "BOTH")
-        graph_name = opts.get("graph_name", f"temp_anomaly_{id(self)}")
         rel_type = relationship_type if relationship_type else '*'
+        if method not in ("percentile", "zscore", "iqr"):
+            # Fail before borrowing (and possibly projecting) a graph
+            raise ValueError(f"Unknown method: {method}")
 
-        try:
-            self.execute_query("""
-                CALL gds.graph.project(
-                    $graph_name,
-                    $node_label,
-                    {rel: {type: $rel_type, orientation: $orientation}}
-                )
-            """, {
-                "graph_name": graph_name,
-                "node_label": node_label,
-                "orientation": orientation,
-                "rel_type": rel_type
-            })
+        async with projection_catalog.borrow(
+            rel_type,
+            node_label=node_label,
+            orientation=orientation,  # OUTGOING, INCOMING, BOTH (or the GDS names)
+            graph_name=opts.get("graph_name")
+        ) as graph_name:
+            moments, sketch = await self.degree_statistics(graph_name)
+            params = {"graph_name": graph_name, "threshold": threshold}
+            thresholds = {}
 
             if method == "percentile":
-                query = f"""
+                thresholds["percentile_threshold"] = sketch.quantile(threshold)
+                query = """
                 CALL gds.degree.stream($graph_name)
                 YIELD nodeId, score
-                WITH nodeId, score, percentileCont(score, $threshold) as percentile_threshold
-                WHERE score > percentile_threshold
-                RETURN nodeId as node_id, score, 
-                       (score - percentile_threshold) as deviation,
+                WITH nodeId, score
+                WHERE score > $percentile_threshold
+                RETURN nodeId as node_id, score,
+                       (score - $percentile_threshold) as deviation,
                        'percentile' as detection_method
                 ORDER BY score DESC
                 """
-                params = {"graph_name": graph_name, "threshold": threshold}
 
             elif method == "zscore":
-                query = f"""
+                thresholds["mean"] = moments.mean
+                thresholds["std"] = moments.std
+                query = """
                 CALL gds.degree.stream($graph_name)
                 YIELD nodeId, score
-                WITH collect({{nodeId: nodeId, score: score}}) as data,
-                     avg(score) as mean_score,
-                     stdev(score) as std_score
-                UNWIND data as item
-                WITH item.nodeId as nodeId, 
-                     item.score as score,
-                     mean_score,
-                     std_score,
-                     abs(item.score - mean_score) / CASE WHEN std_score = 0 THEN 1 ELSE std_score END as zscore
+                WITH nodeId, score,
+                     abs(score - $mean) / CASE WHEN $std = 0 THEN 1 ELSE $std END as zscore
                 WHERE zscore > $threshold
                 RETURN nodeId as node_id, score, zscore as deviation, 'zscore' as detection_method
                 ORDER BY zscore DESC
                 """
-                params = {"graph_name": graph_name, "threshold": threshold}
 
-            elif method == "iqr":
-                query = f"""
+            else:
+                q1, q3 = sketch.quantile(0.25), sketch.quantile(0.75)
+                thresholds["q1"] = q1
+                thresholds["q3"] = q3
+                thresholds["lower_bound"] = q1 - 1.5 * (q3 - q1)
+                thresholds["upper_bound"] = q3 + 1.5 * (q3 - q1)
+                query = """
                 CALL gds.degree.stream($graph_name)
                 YIELD nodeId, score
-                WITH collect({{nodeId: nodeId, score: score}}) as data,
-                     percentileCont(score, 0.25) as q1,
-                     percentileCont(score, 0.75) as q3
-                UNWIND data as item
-                WITH item.nodeId as nodeId,
-                     item.score as score,
-                     q1, q3,
-                     (q3 - q1) as iqr
-                WITH nodeId, score, q1, q3, iqr,
-                     q1 - (1.5 * iqr) as lower_bound,
-                     q3 + (1.5 * iqr) as upper_bound
-                WHERE score < lower_bound OR score > upper_bound
+                WITH nodeId, score
+                WHERE score < $lower_bound OR score > $upper_bound
                 RETURN nodeId as node_id, score,
-                       CASE 
-                         WHEN score < lower_bound THEN lower_bound - score
-                         ELSE score - upper_bound
+                       CASE
+                         WHEN score < $lower_bound THEN $lower_bound - score
+                         ELSE score - $upper_bound
                        END as deviation,
                        'iqr' as detection_method
                 ORDER BY deviation DESC
                 """
-                params = {"graph_name": graph_name}
-            else:
-                raise ValueError(f"Unknown method: {method}")
-
-            results = self.execute_query(query, params)
-            self.drop_graph(graph_name)
-            return results
-
-        except Exception as e:
-            try:
-                self.drop_graph(graph_name)
-            except Exception as err:
-                print(f"Error: {err}")
-                pass
-            raise e
\ No newline at end of file
+
+            params.update(thresholds)
+            report = {
+                "thresholds": thresholds,
+                "node_count": moments.count,
+                "degree_mean": moments.mean,
+                "degree_std": moments.std,
+                "degree_min": moments.min if moments.count else None,
+                "degree_max": moments.max if moments.count else None,
+                "quantile_rank_error": sketch.rank_error(),
+                "sketch_items": sketch.retained
+            }
+            if statistics is not None:
+                statistics.update(report)
+            report_metadata(report)
+
+            if top_k:
+                # Bounded top-K in Neo4j instead of sorting every outlier
+                query += "LIMIT $top_k"
+                params["top_k"] = top_k
+
+            async for row in self.execute_query_stream(query, params):
+                yield row
+
+    async def detect_outliers_page(self, node_label: str, relationship_type: str = None, options: dict = None,
+                                   limit: Optional[int] = None, offset: int = 0, cursor: Optional[str] = None):
+        """Return one page of anomalous nodes and its pagination metadata"""
+        if (options or {}).get("method") in MULTIVARIATE_METHODS:
+            # Scored whole on a snapshot: computed once per cursor, method details on every page
+            return await paginate_result(
+                lambda: self.detect_outliers_multivariate(node_label, relationship_type, options),
+                limit, offset, cursor
+            )
+        return await paginate(
+            lambda top_k: self.detect_outliers_stream(node_label, relationship_type, options, top_k=top_k),
+            limit, offset, cursor
+        )
\ No newline at end of file
@@ -1,38 +1,67 @@
+import contextvars
+
 from app.database import neo4j_connection
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional
+
+# Set by the job runner: collects the metadata (error bounds, modularity, ...) that the
+# native engines return next to their rows, which the row streams do not carry
+result_metadata: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("result_metadata", default=None)
+
+
+def report_metadata(metadata: Dict) -> None:
+    sink = result_metadata.get()
+    if sink is not None:
+        sink.update(metadata)
 
 
 class BaseService:
-    def __init__(self):
-        self.driver = neo4j_connection.get_driver()
+    @property
+    def driver(self):
+        # Resolved on each call so that module-level service singletons
+        # pick up the driver opened by the application lifespan
+        return neo4j_connection.get_driver()
 
-    def execute_query(self, query: str, parameters: dict = None) -> List[Dict]:
+    async def execute_query(self, query: str, parameters: dict = None) -> List[Dict]:
+        if parameters is None:
+            parameters = {}
+
+        async with self.driver.session() as session:
+            result = await session.run(query, parameters)
+            return [record.data() async for record in result]
+
+    async def execute_query_stream(self, query: str, parameters: dict = None) -> AsyncIterator[Dict]:
+        """
+        Yield the records one by one instead of building the whole list
+
+        The session stays open until the generator is exhausted or closed.
+        """
         if parameters is None:
             parameters = {}
 
-        with self.driver.session() as session:
-            result = session.run(query, parameters)
-            return [record.data() for record in result]
+        async with self.driver.session() as session:
+            result = await session.run(query, parameters)
+            async for record in result:
+                yield record.data()
 
-    def execute_procedure(self, procedure: str, parameters: dict = None) -> List[Dict]:
+    async def execute_procedure(self, procedure: str, parameters: dict = None) -> List[Dict]:
         if parameters is None:
             parameters = {}
 
         query = f"CALL {procedure}($params)"
-        with self.driver.session() as session:
-            result = session.run(query, params=parameters)
-            return [record.data() for record in result]
+        async with self.driver.session() as session:
+            result = await session.run(query, params=parameters)
+            return [record.data() async for record in result]
 
-    def drop_graph(self, graph_name: str) -> None:
+    async def drop_graph(self, graph_name: str) -> None:
         """
         Delete a projected graph GDS (without deprecation warning)
         """
         try:
-            self.execute_query(
+            await self.execute_query(
                 "CALL gds.graph.drop($graph_name) YIELD graphName",
                 {"graph_name": graph_name}
             )
         except Exception as e:
             # Ignore if graph doesn't exist
             print(f"Error: {e}")
-            pass
\ No newline at end of file
+            pass
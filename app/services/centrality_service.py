@@ -1,9 +1,63 @@
-from app.services.base_service import BaseService
+import asyncio
+from typing import Dict, Optional
+
+from app.engines.betweenness import betweenness
+from app.engines.closeness import closeness
+from app.engines.csr import top_indices
+from app.engines.pagerank import pagerank
+from app.services.base_service import BaseService, report_metadata
+from app.services.pagination import paginate, paginate_result
+from app.services.projection_catalog import projection_catalog, normalize_orientation
+from app.services.snapshot_service import snapshot_store
 
 class CentralityService(BaseService):
-    def calculate_betweenness(self, relationship_type: str, options: dict = None):
+    async def calculate_betweenness(self, relationship_type: str, options: dict = None, engine: str = "gds"):
         """Calculate the betweenness centrality."""
+        return [row async for row in self.calculate_betweenness_stream(relationship_type, options, engine=engine)]
+
+    async def calculate_betweenness_native(self, relationship_type: str, options: dict = None,
+                                           top_k: Optional[int] = None) -> Dict:
+        """
+        Betweenness computed in-process on a CSR snapshot
+
+        Options:
+        - samplingSize / samplingSeed: Brandes from a random subset of sources (as GDS)
+        - epsilon / delta: adaptive pair sampling with an error bound (Riondato-Kornaropoulos,
+          progressive rounds stopped by an empirical Bernstein bound)
+        - maxSamples: cap on the number of pair samples (the achieved epsilon is reported)
+        - snapshot: name of an existing snapshot
+
+        Returns {"data": rows, "metadata": mode and error bound}
+        """
+        opts = options or {}
+        orientation = normalize_orientation(opts.get("orientation", "NATURAL"))
+        graph = await snapshot_store.get_graph(opts, relationship_type, orientation=orientation)
+        sampling_size = opts.get("samplingSize", -1)
+        scores, info = await betweenness(
+            graph,
+            undirected=orientation == "UNDIRECTED",
+            sampling_size=sampling_size if sampling_size != -1 else None,
+            sampling_seed=opts.get("samplingSeed", 42),
+            epsilon=opts.get("epsilon"),
+            delta=opts.get("delta", 0.1),
+            max_samples=opts.get("maxSamples")
+        )
+        rows = [
+            {"node_id": int(graph.node_ids[i]), "score": float(scores[i])}
+            for i in top_indices(scores, top_k)
+        ]
+        return {"data": rows, "metadata": info}
+
+    async def calculate_betweenness_stream(self, relationship_type: str, options: dict = None,
+                                           top_k: Optional[int] = None, engine: str = "gds"):
+        """Stream the betweenness scores (highest first)"""
         opts = options or {}
+        if engine == "native":
+            result = await self.calculate_betweenness_native(relationship_type, opts, top_k)
+            report_metadata(result["metadata"])
+            for row in result["data"]:
+                yield row
+            return
         # config = {
         #     "nodeProjection": "*",
         #     "relationshipProjection": {
@@ -25,53 +79,35 @@ class CentralityService(BaseService):
         #    ORDER BY score DESC
         #    """
 
-        graph_name = opts.get("graph_name", f"temp_betweenness_{id(self)}")
+        config = {
+            "samplingSize": opts.get("samplingSize", -1),
+            "samplingSeed": opts.get("samplingSeed", 42)
+        }
+        config = {k: v for k, v in config.items() if v != -1}
 
-        try:
-            create_query = """
-                CALL gds.graph.project(
-                    $graph_name,
-                    '*',
-                    $relationship_type
-                )
-                YIELD graphName, nodeCount, relationshipCount
-                """
-            self.execute_query(create_query, {
+        query = """
+            CALL gds.betweenness.stream($graph_name, $config)
+            YIELD nodeId, score
+            WHERE score > 0
+            RETURN nodeId as node_id, score
+            ORDER BY score DESC
+            """
+        if top_k:
+            # Neo4j keeps a bounded heap of top_k rows (Top operator) instead of sorting them all
+            query += "LIMIT $top_k"
+        async with projection_catalog.borrow(
+            relationship_type,
+            orientation=opts.get("orientation", "NATURAL"),
+            graph_name=opts.get("graph_name")
+        ) as graph_name:
+            async for row in self.execute_query_stream(query, {
                 "graph_name": graph_name,
-                "relationship_type": relationship_type
-            })
-
-            config = {
-                "samplingSize": opts.get("samplingSize", -1),
-                "samplingSeed": opts.get("samplingSeed", 42)
-            }
-            config = {k: v for k, v in config.items() if v != -1}
+                "config": config,
+                "top_k": top_k
+            }):
+                yield row
 
-            query = """
-                CALL gds.betweenness.stream($graph_name, $config)
-                YIELD nodeId, score
-                WHERE score > 0
-                RETURN nodeId as node_id, score
-                ORDER BY score DESC
-                """
-            results = self.execute_query(query, {
-                "graph_name": graph_name,
-                "config": config
-            })
-
-            self.execute_query("CALL gds.graph.drop($graph_name)", {"graph_name": graph_name})
-            self.drop_graph(graph_name=graph_name)
-            return results
-        except Exception as e:
-            try:
-                self.drop_graph(graph_name=graph_name)
-            except Exception as err :
-                print(f"Error: {err}")
-                pass
-            raise e
-        # return self.execute_query(query, {"config": config})
-
-    def calculate_closeness_v1(self, relationship_type: str, options: dict = None):
+    async def calculate_closeness_v1(self, relationship_type: str, options: dict = None):
         """Calculate the closeness centrality"""
         opts = options or {}
         config = {
@@ -91,38 +127,83 @@ class CentralityService(BaseService):
                 RETURN nodeId as node_id, score
                 ORDER BY score DESC
                 """
-        return self.execute_query(query, {"config": config})
+        return await self.execute_query(query, {"config": config})
+
+    async def calculate_closeness(self, relationship_type: str, options: dict = None, engine: str = "gds"):
+        """Calculate the closeness centrality"""
+        return [row async for row in self.calculate_closeness_stream(relationship_type, options, engine=engine)]
+
+    async def calculate_closeness_native(self, relationship_type: str, options: dict = None,
+                                         top_k: Optional[int] = None) -> Dict:
+        """
+        Closeness / harmonic centrality computed in-process with bit-parallel multi-source BFS
+
+        Options:
+        - variant: "closeness" (default) or "harmonic"
+        - useWassermanFaust: as for GDS
+        - pivots: approximate mode from that many random pivots (samplingSeed for the draw)
+        - snapshot: name of an existing snapshot
+
+        Nodes reaching no other node are returned with a score of 0.
+        Returns {"data": rows, "metadata": mode}
+        """
+        opts = options or {}
+        graph = await snapshot_store.get_graph(
+            opts,
+            relationship_type,
+            orientation=normalize_orientation(opts.get("orientation", "NATURAL"))
+        )
+        scores, info = await closeness(
+            graph,
+            variant=opts.get("variant", "closeness"),
+            wasserman_faust=opts.get("useWassermanFaust", False),
+            pivots=opts.get("pivots"),
+            seed=opts.get("samplingSeed", 42)
+        )
+        rows = [
+            {"node_id": int(graph.node_ids[i]), "score": float(scores[i])}
+            for i in top_indices(scores, top_k, positive_only=False)
+        ]
+        return {"data": rows, "metadata": {**info, "variant": opts.get("variant", "closeness")}}
 
-    def calculate_closeness(self, relationship_type: str, options: dict = None):
+    async def calculate_closeness_stream(self, relationship_type: str, options: dict = None,
+                                         top_k: Optional[int] = None, engine: str = "gds"):
+        """Stream the closeness scores (highest first)"""
         opts = options or {}
-        graph_name = opts.get("graph_name", f"temp_closeness_{id(self)}")
+        if engine == "native":
+            result = await self.calculate_closeness_native(relationship_type, opts, top_k)
+            report_metadata(result["metadata"])
+            for row in result["data"]:
+                yield row
+            return
 
-        try:
-            self.execute_query("""
-                CALL gds.graph.project($graph_name, '*', $relationship_type)
-            """, {"graph_name": graph_name, "relationship_type": relationship_type})
+        procedure = "gds.closeness.stream"
+        config = {"useWassermanFaust": opts.get("useWassermanFaust", False)}
+        if opts.get("variant") == "harmonic":
+            procedure = "gds.closeness.harmonic.stream"
+            config = {}
+        query = f"""
+        CALL {procedure}($graph_name, $config)
+        YIELD nodeId, score
+        WHERE score > 0
+        RETURN nodeId as node_id, score
+        ORDER BY score DESC
+        """
+        if top_k:
+            query += "LIMIT $top_k"
+        async with projection_catalog.borrow(
+            relationship_type,
+            orientation=opts.get("orientation", "NATURAL"),
+            graph_name=opts.get("graph_name")
+        ) as graph_name:
+            async for row in self.execute_query_stream(query, {
+                "graph_name": graph_name,
+                "config": config,
+                "top_k": top_k
+            }):
+                yield row
 
-            config = {"useWassermanFaust": opts.get("useWassermanFaust", False)}
-            query = """
-            CALL gds.closeness.stream($graph_name, $config)
-            YIELD nodeId, score
-            WHERE score > 0
-            RETURN nodeId as node_id, score
-            ORDER BY score DESC
-            """
-            results = self.execute_query(query, {"graph_name": graph_name, "config": config})
-
-            self.drop_graph(graph_name=graph_name)
-            return results
-        except Exception as e:
-            try:
-                self.drop_graph(graph_name=graph_name)
-            except Exception as err:
-                print(f"Error: {err}")
-                pass
-            raise e
-
-    def calculate_degree_v1(self, relationship_type: str, options: dict = None):
+    async def calculate_degree_v1(self, relationship_type: str, options: dict = None):
         """Calculate the degree centrality."""
         opts = options or {}
 
@@ -146,50 +227,44 @@ class CentralityService(BaseService):
             RETURN nodeId as node_id, score
             ORDER BY score DESC
         """
-        return self.execute_query(query, {"config": config})
+        return await self.execute_query(query, {"config": config})
+
+    async def calculate_degree(self, relationship_type: str, options: dict = None):
+        """Calculate the degree centrality"""
+        return [row async for row in self.calculate_degree_stream(relationship_type, options)]
 
-    def calculate_degree(self, relationship_type: str, options: dict = None):
+    async def calculate_degree_stream(self, relationship_type: str, options: dict = None,
+                                      top_k: Optional[int] = None):
+        """Stream the degree scores (highest first)"""
         opts = options or {}
-        graph_name = opts.get("graph_name", f"temp_degree_{id(self)}")
-
-        try:
-            orientation = opts.get("orientation", "NATURAL")
-            self.execute_query("""
-                CALL gds.graph.project(
-                    $graph_name,
-                    '*',
-                    {rel: {type: $relationship_type, orientation: $orientation}}
-                )
-            """, {
-                "graph_name": graph_name,
-                "relationship_type": relationship_type,
-                "orientation": orientation
-            })
+        config = {}
+        weight_prop = opts.get("relationshipWeightProperty")
+        if weight_prop:
+            config["relationshipWeightProperty"] = weight_prop
 
-            config = {}
-            weight_prop = opts.get("relationshipWeightProperty")
-            if weight_prop:
-                config["relationshipWeightProperty"] = weight_prop
+        query = """
+        CALL gds.degree.stream($graph_name, $config)
+        YIELD nodeId, score
+        WHERE score > 0
+        RETURN nodeId as node_id, score
+        ORDER BY score DESC
+        """
+        if top_k:
+            query += "LIMIT $top_k"
+        async with projection_catalog.borrow(
+            relationship_type,
+            orientation=opts.get("orientation", "NATURAL"),  # NATURAL, REVERSE, UNDIRECTED
+            weight_properties=[weight_prop] if weight_prop else None,
+            graph_name=opts.get("graph_name")
+        ) as graph_name:
+            async for row in self.execute_query_stream(query, {
+                "graph_name": graph_name,
+                "config": config,
+                "top_k": top_k
+            }):
+                yield row
 
-            query = """
-            CALL gds.degree.stream($graph_name, $config)
-            YIELD nodeId, score
-            WHERE score > 0
-            RETURN nodeId as node_id, score
-            ORDER BY score DESC
-            """
-            results = self.execute_query(query, {"graph_name": graph_name, "config": config})
-            self.drop_graph(graph_name)
-            return results
-        except Exception as e:
-            try:
-                self.drop_graph(graph_name)
-            except Exception as err:
-                print(f"Error: {err}")
-                pass
-            raise e
-
-    def calculate_pagerank_v2(self, relationship_type: str, options: dict = None):
+    async def calculate_pagerank_v2(self, relationship_type: str, options: dict = None):
         """Calculate the PageRank"""
         opts = options or {"maxIterations": 20, "dampingFactor": 0.85}
         config = {
@@ -206,37 +281,120 @@ class CentralityService(BaseService):
             RETURN nodeId, score
             ORDER BY score DESC
             """
-        return self.execute_query(query, {"config": config})
+        return await self.execute_query(query, {"config": config})
 
-    def calculate_pagerank(self, relationship_type: str, options: dict = None):
+    async def calculate_pagerank(self, relationship_type: str, options: dict = None, engine: str = "gds"):
+        """Calculate the PageRank"""
+        return [row async for row in self.calculate_pagerank_stream(relationship_type, options, engine=engine)]
+
+    async def calculate_pagerank_stream(self, relationship_type: str, options: dict = None,
+                                        top_k: Optional[int] = None, engine: str = "gds"):
+        """Stream the PageRank scores (highest first)"""
         opts = options or {}
-        graph_name = opts.get("graph_name", f"temp_pagerank_{id(self)}")
-
-        try:
-            self.execute_query("""
-                CALL gds.graph.project($graph_name, '*', $relationship_type)
-            """, {"graph_name": graph_name, "relationship_type": relationship_type})
-
-            config = {
-                "maxIterations": opts.get("maxIterations", 20),
-                "dampingFactor": opts.get("dampingFactor", 0.85),
-                "tolerance": opts.get("tolerance", 0.0000001)
-            }
-            query = """
-            CALL gds.pageRank.stream($graph_name, $config)
-            YIELD nodeId, score
-            WHERE score > 0
-            RETURN nodeId as node_id, score
-            ORDER BY score DESC
-            """
-            results = self.execute_query(query, {"graph_name": graph_name, "config": config})
-
-            self.drop_graph(graph_name)
-            return results
-        except Exception as e:
-            try:
-                self.drop_graph(graph_name)
-            except Exception as err:
-                print(f"Error: {err}")
-                pass
-            raise e
\ No newline at end of file
+        if engine == "native":
+            result = await self.calculate_pagerank_native(relationship_type, opts, top_k)
+            report_metadata(result["metadata"])
+            for row in result["data"]:
+                yield row
+            return
+        config = {
+            "maxIterations": opts.get("maxIterations", 20),
+            "dampingFactor": opts.get("dampingFactor", 0.85),
+            "tolerance": opts.get("tolerance", 0.0000001)
+        }
+        query = """
+        CALL gds.pageRank.stream($graph_name, $config)
+        YIELD nodeId, score
+        WHERE score > 0
+        RETURN nodeId as node_id, score
+        ORDER BY score DESC
+        """
+        if top_k:
+            query += "LIMIT $top_k"
+        async with projection_catalog.borrow(
+            relationship_type,
+            orientation=opts.get("orientation", "NATURAL"),
+            graph_name=opts.get("graph_name")
+        ) as graph_name:
+            async for row in self.execute_query_stream(query, {
+                "graph_name": graph_name,
+                "config": config,
+                "top_k": top_k
+            }):
+                yield row
+
+    async def calculate_pagerank_native(self, relationship_type: str, options: dict = None,
+                                        top_k: Optional[int] = None) -> Dict:
+        """
+        PageRank computed in-process on a CSR snapshot (no GDS needed)
+
+        Options:
+        - maxIterations, dampingFactor, tolerance: as for GDS
+        - sourceNodes: node ids for personalized PageRank
+        - relationshipWeightProperty: weighted transitions
+        - snapshot: name of an existing snapshot (else loaded on first use)
+
+        Scores are a probability distribution (they sum to 1), unlike the unnormalized
+        GDS scores: compare rankings across engines, not values.
+
+        Returns {"data": rows, "metadata": iterations ran, normalization}
+        """
+        opts = options or {}
+        weight_prop = opts.get("relationshipWeightProperty")
+        graph = await snapshot_store.get_graph(
+            opts,
+            relationship_type,
+            weight_property=weight_prop,
+            orientation=normalize_orientation(opts.get("orientation", "NATURAL"))
+        )
+        sources = None
+        if opts.get("sourceNodes"):
+            sources = graph.index_of(opts["sourceNodes"])
+            sources = sources[sources >= 0]
+            if len(sources) == 0:
+                raise ValueError("None of the sourceNodes belong to the snapshot")
+
+        scores, iterations = await asyncio.to_thread(
+            pagerank,
+            graph,
+            damping_factor=opts.get("dampingFactor", 0.85),
+            max_iterations=opts.get("maxIterations", 20),
+            tolerance=opts.get("tolerance", 0.0000001),
+            weighted=bool(weight_prop),
+            source_indices=sources
+        )
+        rows = [
+            {"node_id": int(graph.node_ids[i]), "score": float(scores[i])}
+            for i in top_indices(scores, top_k)
+        ]
+        return {"data": rows, "metadata": {"iterations": iterations, "normalization": "sum_to_one"}}
+
+    async def calculate_page(self, algorithm: str, relationship_type: str, options: dict = None,
+                             limit: Optional[int] = None, offset: int = 0, cursor: Optional[str] = None,
+                             engine: str = "gds"):
+        """
+        Return one page of centrality scores and its pagination metadata
+
+        Native engines score every node in one run: the full result is kept once per
+        cursor (pages are slices of it) and its metadata (e.g: error bound) is on every page.
+        """
+        natives = {
+            "betweenness": self.calculate_betweenness_native,
+            "closeness": self.calculate_closeness_native,
+            "pagerank": self.calculate_pagerank_native
+        }
+        if engine == "native" and algorithm in natives:
+            return await paginate_result(
+                lambda: natives[algorithm](relationship_type, options), limit, offset, cursor
+            )
+        streams = {
+            "betweenness": self.calculate_betweenness_stream,
+            "closeness": self.calculate_closeness_stream,
+            "degree": self.calculate_degree_stream,
+            "pagerank": self.calculate_pagerank_stream
+        }
+        stream = streams[algorithm]
+        return await paginate(
+            lambda top_k: stream(relationship_type, options, top_k=top_k),
+            limit, offset, cursor
+        )
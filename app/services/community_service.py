@@ -1,7 +1,51 @@
-from app.services.base_service import BaseService
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.engines.csr import CSRGraph
+from app.engines.label_propagation import label_propagation
+from app.engines.louvain import louvain
+from app.engines.union_find import ComponentIndex
+from app.services.base_service import BaseService, report_metadata
+from app.services.projection_catalog import projection_catalog, normalize_orientation
+from app.services.snapshot_service import snapshot_store
+
+# Snapshot name -> (snapshot load time, component index), shared by every service instance
+component_indexes: Dict[str, Tuple[float, ComponentIndex]] = {}
+# An index lives as long as its snapshot
+snapshot_store.on_drop(lambda name: component_indexes.pop(name, None))
+
+
+def component_histogram(sizes: List[int]) -> List[Dict]:
+    """Number of components per size bucket (powers of two)"""
+    buckets: Dict[int, int] = {}
+    for size in sizes:
+        bucket = int(size).bit_length() - 1
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+    return [
+        {"min_size": 2 ** b, "max_size": 2 ** (b + 1) - 1, "components": buckets[b]}
+        for b in sorted(buckets)
+    ]
+
+def community_ids(node_ids: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    """Community id of every node: the smallest node id of its community (stable across runs)"""
+    _, first = np.unique(labels, return_index=True)
+    return node_ids[first][labels]
+
+
+def group_communities(node_ids: np.ndarray, labels: np.ndarray):
+    """Yield {community, nodes} rows from per-node labels"""
+    order = np.argsort(labels, kind="stable")
+    ordered = labels[order]
+    bounds = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1], True])
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        members = node_ids[order[start:end]]
+        yield {"community": int(members[0]), "nodes": members.tolist()}
+
 
 class CommunityService(BaseService):
-    def detect_louvain_v1(self, relationship_type: str, options: dict = None):
+    async def detect_louvain_v1(self, relationship_type: str, options: dict = None):
         """Detect communities with Louvain"""
         opts = options or {"iterations": 10}
         config = {
@@ -20,9 +64,9 @@ class CommunityService(BaseService):
             YIELD nodeId, communityId, intermediateCommunityIds
             RETURN communityId as community, collect(nodeId) as nodes
             """
-        return self.execute_query(query, {"config": config})
+        return await self.execute_query(query, {"config": config})
 
-    def detect_greedy_v1(self, relationship_type: str, options: dict = None):
+    async def detect_greedy_v1(self, relationship_type: str, options: dict = None):
         """Detect community with Label Propagation (same as Greedy within GDS)"""
         opts = options or {}
 
@@ -40,9 +84,9 @@ class CommunityService(BaseService):
         YIELD nodeId, communityId
         RETURN communityId as community, collect(nodeId) as nodes
         """
-        return self.execute_query(query, {"config": config})
+        return await self.execute_query(query, {"config": config})
 
-    def detect_weakly_connected_components_v1(self, relationship_type: str, options: dict = None):
+    async def detect_weakly_connected_components_v1(self, relationship_type: str, options: dict = None):
         """Detect weakly connected components"""
         opts = options or {}
 
@@ -58,100 +102,374 @@ class CommunityService(BaseService):
             YIELD nodeId, componentId
             RETURN componentId as component, collect(nodeId) as nodes
         """
-        return self.execute_query(query, {"config": config})
+        return await self.execute_query(query, {"config": config})
+
+    async def detect_louvain(self, relationship_type: str, options: dict = None, engine: str = "gds"):
+        """Detect communities with Louvain"""
+        return [row async for row in self.detect_louvain_stream(relationship_type, options, engine=engine)]
+
+    async def _seed_labels(self, graph: CSRGraph, opts: dict) -> Optional[np.ndarray]:
+        """
+        Initial community of every snapshot node (-1 when unknown), from:
+        - seedPartition: a previous result ([{community, nodes}] or [{node_id, community}] rows,
+          or {node_id: community})
+        - seedProperty: a node property holding the community
+        """
+        seeds = {}
+        partition = opts.get("seedPartition")
+        if isinstance(partition, dict):
+            seeds = {int(node_id): community for node_id, community in partition.items()}
+        elif isinstance(partition, list):
+            for row in partition:
+                if not isinstance(row, dict) or "community" not in row or not ("nodes" in row or "node_id" in row):
+                    raise ValueError(
+                        "seedPartition rows must be {community, nodes} or {node_id, community}, "
+                        f"got {row!r}"
+                    )
+                for node_id in row["nodes"] if "nodes" in row else [row["node_id"]]:
+                    seeds[int(node_id)] = row["community"]
+        elif opts.get("seedProperty"):
+            label = f":`{opts['node_label']}`" if opts.get("node_label") else ""
+            query = f"""
+            MATCH (n{label})
+            WHERE n[$property] IS NOT NULL
+            RETURN id(n) as id, n[$property] as community
+            """
+            async for row in self.execute_query_stream(query, {"property": opts["seedProperty"]}):
+                seeds[row["id"]] = row["community"]
+        if not seeds:
+            return None
+
+        codes: Dict = {}
+        communities = np.array([codes.setdefault(c, len(codes)) for c in seeds.values()], dtype=np.int64)
+        slots = graph.index_of(list(seeds))
+        labels = np.full(graph.node_count, -1, dtype=np.int64)
+        labels[slots[slots >= 0]] = communities[slots >= 0]
+        return labels
+
+    async def detect_communities_native(self, relationship_type: str, options: dict = None,
+                                        leiden: bool = False) -> Dict:
+        """
+        Louvain / Leiden computed in-process on a CSR snapshot
+
+        Options:
+        - maxLevels, maxIterations (local-moving sweeps per level), tolerance: as for GDS
+        - gamma: resolution, relationshipWeightProperty: weighted modularity
+        - seedPartition / seedProperty: warm start from a previous partition
+        - includeIntermediateCommunities: one row per node with its community at every level
+        - randomSeed, snapshot
+
+        Returns {"data": rows, "metadata": levels and modularity per level}
+        """
+        opts = options or {}
+        weight_prop = opts.get("relationshipWeightProperty")
+        graph = await snapshot_store.get_graph(
+            opts,
+            relationship_type,
+            node_label=opts.get("node_label"),
+            weight_property=weight_prop
+        )
+        seed_labels = await self._seed_labels(graph, opts)
+        labels, levels, info = await asyncio.to_thread(
+            louvain,
+            graph,
+            leiden=leiden,
+            max_levels=opts.get("maxLevels", 10),
+            max_iterations=opts.get("maxIterations", 10),
+            tolerance=opts.get("tolerance", 0.0001),
+            resolution=opts.get("gamma", 1.0),
+            weighted=bool(weight_prop),
+            seed_labels=seed_labels,
+            random_seed=opts.get("randomSeed", 42)
+        )
+        if opts.get("includeIntermediateCommunities"):
+            per_level = np.stack([community_ids(graph.node_ids, level) for level in levels], axis=1) \
+                if levels else np.zeros((graph.node_count, 0), dtype=np.int64)
+            final = community_ids(graph.node_ids, labels)
+            rows = [
+                {
+                    "node_id": int(graph.node_ids[i]),
+                    "community": int(final[i]),
+                    "intermediate_communities": per_level[i].tolist()
+                }
+                for i in range(graph.node_count)
+            ]
+        else:
+            rows = list(group_communities(graph.node_ids, labels))
+        return {
+            "data": rows,
+            "metadata": {**info, "algorithm": "leiden" if leiden else "louvain", "seeded": seed_labels is not None}
+        }
 
-    def detect_louvain(self, relationship_type: str, options: dict = None):
+    async def detect_louvain_stream(self, relationship_type: str, options: dict = None, engine: str = "gds"):
+        """Stream the Louvain communities, one row per community (per node with intermediate communities)"""
         opts = options or {}
-        graph_name = opts.get("graph_name", f"temp_louvain_{id(self)}")
-
-        try:
-            self.execute_query("""
-                CALL gds.graph.project($graph_name, '*', $relationship_type)
-            """, {"graph_name": graph_name, "relationship_type": relationship_type})
-
-            config = {
-                "maxIterations": opts.get("maxIterations", 10),
-                "tolerance": opts.get("tolerance", 0.0001),
-                "includeIntermediateCommunities": opts.get("includeIntermediateCommunities", False)
-            }
-            seed_prop = opts.get("seedProperty")
-            if seed_prop:
-                config["seedProperty"] = seed_prop
+        if engine == "native":
+            result = await self.detect_communities_native(relationship_type, opts)
+            report_metadata(result["metadata"])
+            for row in result["data"]:
+                yield row
+            return
 
+        config = {
+            "maxIterations": opts.get("maxIterations", 10),
+            "tolerance": opts.get("tolerance", 0.0001),
+            "includeIntermediateCommunities": opts.get("includeIntermediateCommunities", False)
+        }
+        seed_prop = opts.get("seedProperty")
+        if seed_prop:
+            config["seedProperty"] = seed_prop
+
+        query = """
+        CALL gds.louvain.stream($graph_name, $config)
+        YIELD nodeId, communityId
+        RETURN communityId as community, collect(nodeId) as nodes
+        """
+        if config["includeIntermediateCommunities"]:
             query = """
             CALL gds.louvain.stream($graph_name, $config)
-            YIELD nodeId, communityId
-            RETURN communityId as community, collect(nodeId) as nodes
+            YIELD nodeId, communityId, intermediateCommunityIds
+            RETURN nodeId as node_id, communityId as community, intermediateCommunityIds as intermediate_communities
             """
-            results = self.execute_query(query, {"graph_name": graph_name, "config": config})
-
-            self.drop_graph(graph_name)
-            return results
-        except Exception as e:
-            try:
-                self.drop_graph(graph_name)
-            except Exception as err:
-                print(f"Error: {err}")
-                pass
-            raise e
-
-    def detect_greedy(self, relationship_type: str, options: dict = None):
-        opts = options or {}
-        graph_name = opts.get("graph_name", f"temp_lpa_{id(self)}")
+        async with projection_catalog.borrow(
+            relationship_type,
+            orientation=opts.get("orientation", "NATURAL"),
+            graph_name=opts.get("graph_name")
+        ) as graph_name:
+            async for row in self.execute_query_stream(query, {"graph_name": graph_name, "config": config}):
+                yield row
+
+    async def detect_leiden(self, relationship_type: str, options: dict = None, engine: str = "gds"):
+        """Detect communities with Leiden"""
+        return [row async for row in self.detect_leiden_stream(relationship_type, options, engine=engine)]
 
-        try:
-            self.execute_query("""
-                CALL gds.graph.project($graph_name, '*', $relationship_type)
-            """, {"graph_name": graph_name, "relationship_type": relationship_type})
+    async def detect_leiden_stream(self, relationship_type: str, options: dict = None, engine: str = "gds"):
+        """Stream the Leiden communities, one row per community (per node with intermediate communities)"""
+        opts = options or {}
+        if engine == "native":
+            result = await self.detect_communities_native(relationship_type, opts, leiden=True)
+            report_metadata(result["metadata"])
+            for row in result["data"]:
+                yield row
+            return
 
-            config = {"maxIterations": opts.get("maxIterations", 10)}
-            seed_prop = opts.get("seedProperty")
-            if seed_prop:
-                config["seedProperty"] = seed_prop
+        config = {
+            "maxLevels": opts.get("maxLevels", 10),
+            "tolerance": opts.get("tolerance", 0.0001),
+            "includeIntermediateCommunities": opts.get("includeIntermediateCommunities", False)
+        }
+        seed_prop = opts.get("seedProperty")
+        if seed_prop:
+            config["seedProperty"] = seed_prop
 
+        query = """
+        CALL gds.leiden.stream($graph_name, $config)
+        YIELD nodeId, communityId
+        RETURN communityId as community, collect(nodeId) as nodes
+        """
+        if config["includeIntermediateCommunities"]:
             query = """
-            CALL gds.labelPropagation.stream($graph_name, $config)
-            YIELD nodeId, communityId
-            RETURN communityId as community, collect(nodeId) as nodes
+            CALL gds.leiden.stream($graph_name, $config)
+            YIELD nodeId, communityId, intermediateCommunityIds
+            RETURN nodeId as node_id, communityId as community, intermediateCommunityIds as intermediate_communities
             """
-            results = self.execute_query(query, {"graph_name": graph_name, "config": config})
-
-            self.drop_graph(graph_name)
-            return results
-        except Exception as e:
-            try:
-                self.drop_graph(graph_name)
-            except Exception as err:
-                print(f"Error: {err}")
-                pass
-            raise e
-
-    def detect_weakly_connected_components(self, relationship_type: str, options: dict = None):
+        # GDS Leiden only runs on undirected graphs
+        async with projection_catalog.borrow(
+            relationship_type,
+            orientation=opts.get("orientation", "UNDIRECTED"),
+            graph_name=opts.get("graph_name")
+        ) as graph_name:
+            async for row in self.execute_query_stream(query, {"graph_name": graph_name, "config": config}):
+                yield row
+
+    async def detect_greedy(self, relationship_type: str, options: dict = None, engine: str = "gds"):
+        """Detect community with Label Propagation (same as Greedy within GDS)"""
+        return [row async for row in self.detect_greedy_stream(relationship_type, options, engine=engine)]
+
+    async def detect_label_propagation_native(self, relationship_type: str, options: dict = None) -> Dict:
+        """
+        Label propagation computed in-process on a CSR snapshot (reproducible for a given randomSeed)
+
+        Options:
+        - maxIterations: as for GDS
+        - synchronous: update every node from the previous iteration (default: semi-synchronous)
+        - tolerance: stop once the fraction of changed labels is <= tolerance (default 0)
+        - seedProperty / seedPartition, relationshipWeightProperty, randomSeed, snapshot
+
+        Returns {"data": rows, "metadata": iterations and changed fraction per iteration}
+        """
+        opts = options or {}
+        weight_prop = opts.get("relationshipWeightProperty")
+        graph = await snapshot_store.get_graph(
+            opts,
+            relationship_type,
+            node_label=opts.get("node_label"),
+            weight_property=weight_prop,
+            orientation=normalize_orientation(opts.get("orientation", "NATURAL"))
+        )
+        seed_labels = await self._seed_labels(graph, opts)
+        labels, info = await asyncio.to_thread(
+            label_propagation,
+            graph,
+            max_iterations=opts.get("maxIterations", 10),
+            weighted=bool(weight_prop),
+            semi_synchronous=not opts.get("synchronous", False),
+            tolerance=opts.get("tolerance", 0.0),
+            random_seed=opts.get("randomSeed", 42),
+            seed_labels=seed_labels
+        )
+        return {
+            "data": list(group_communities(graph.node_ids, labels)),
+            "metadata": {**info, "seeded": seed_labels is not None}
+        }
+
+    async def detect_greedy_stream(self, relationship_type: str, options: dict = None, engine: str = "gds"):
+        """Stream the label propagation communities, one row per community"""
         opts = options or {}
-        graph_name = opts.get("graph_name", f"temp_wcc_{id(self)}")
+        if engine == "native":
+            result = await self.detect_label_propagation_native(relationship_type, opts)
+            report_metadata(result["metadata"])
+            for row in result["data"]:
+                yield row
+            return
 
-        try:
-            self.execute_query("""
-                CALL gds.graph.project($graph_name, '*', $relationship_type)
-            """, {"graph_name": graph_name, "relationship_type": relationship_type})
+        config = {"maxIterations": opts.get("maxIterations", 10)}
+        seed_prop = opts.get("seedProperty")
+        if seed_prop:
+            config["seedProperty"] = seed_prop
 
-            config = {
-                "threshold": opts.get("threshold", 0),
-                "consecutiveIds": opts.get("consecutiveIds", False)
-            }
-            query = """
+        query = """
+        CALL gds.labelPropagation.stream($graph_name, $config)
+        YIELD nodeId, communityId
+        RETURN communityId as community, collect(nodeId) as nodes
+        """
+        async with projection_catalog.borrow(
+            relationship_type,
+            orientation=opts.get("orientation", "NATURAL"),
+            graph_name=opts.get("graph_name")
+        ) as graph_name:
+            async for row in self.execute_query_stream(query, {"graph_name": graph_name, "config": config}):
+                yield row
+
+    async def detect_weakly_connected_components(self, relationship_type: str, options: dict = None,
+                                                 engine: str = "gds"):
+        """Detect weakly connected components"""
+        return [row async for row in self.detect_weakly_connected_components_stream(
+            relationship_type, options, engine=engine
+        )]
+
+    async def get_component_index(self, relationship_type: str, options: dict = None) -> ComponentIndex:
+        """Union-find index of the snapshot (built once, then maintained by add_component_edges)"""
+        opts = options or {}
+        name = opts.get("snapshot")
+        if name:
+            snapshot = snapshot_store.get(name)
+            if snapshot is None:
+                raise ValueError(f"Snapshot {name} not found")
+        else:
+            snapshot = await snapshot_store.create(opts.get("node_label"), relationship_type)
+
+        entry = component_indexes.get(snapshot.name)
+        if entry is None or entry[0] != snapshot.loaded_at:
+            # New or refreshed snapshot: the refreshed graph already holds the inserted edges
+            index = await asyncio.to_thread(ComponentIndex.from_graph, snapshot.graph)
+            entry = (snapshot.loaded_at, index)
+            component_indexes[snapshot.name] = entry
+        return entry[1]
+
+    async def add_component_edges(self, relationship_type: str, edges: List[List[int]],
+                                  options: dict = None) -> Dict:
+        """
+        Merge a batch of new relationships (pairs of node ids) into the component index
+
+        No recomputation: each edge is a union of the two components.
+        """
+        index = await self.get_component_index(relationship_type, options)
+        pairs = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        merges = await asyncio.to_thread(index.add_edges, pairs[:, 0], pairs[:, 1])
+        return {
+            "edges": len(pairs),
+            "merges": merges,
+            "component_count": index.sets.count,
+            "edges_added_since_load": index.edges_added
+        }
+
+    async def summarize_components(self, relationship_type: str, options: dict = None,
+                                   engine: str = "gds") -> Dict:
+        """
+        Component summary: counts, size histogram and the largest components
+
+        Options:
+        - topComponents: number of components listed (default 20)
+        - includeMembers: add the node ids of the listed components
+        """
+        opts = {**(options or {}), "summary": True}
+        top = opts.setdefault("topComponents", 20)
+        sizes, components = [], []
+        async for row in self.detect_weakly_connected_components_stream(relationship_type, opts, engine=engine):
+            sizes.append(row["size"])
+            if len(components) < top:
+                components.append(row)
+        return {
+            "component_count": len(sizes),
+            "node_count": sum(sizes),
+            "largest_component_size": max(sizes, default=0),
+            "histogram": component_histogram(sizes),
+            "components": components
+        }
+
+    async def _native_components_stream(self, relationship_type: str, opts: dict):
+        index = await self.get_component_index(relationship_type, opts)
+        component_ids, sizes, position = await asyncio.to_thread(index.components)
+        summary = opts.get("summary", False)
+        with_members = not summary or opts.get("includeMembers", False)
+        if with_members:
+            members = index.all_ids()[np.argsort(position, kind="stable")]
+            ends = np.cumsum(sizes)
+        top = opts.get("topComponents") if summary and with_members else None
+        for k in range(len(sizes)):
+            row = {"component": int(component_ids[k])}
+            if summary:
+                row["size"] = int(sizes[k])
+            if with_members and (top is None or k < top):
+                row["nodes"] = members[ends[k] - sizes[k]:ends[k]].tolist()
+            yield row
+
+    async def detect_weakly_connected_components_stream(self, relationship_type: str, options: dict = None,
+                                                        engine: str = "gds"):
+        """
+        Stream the weakly connected components, one row per component
+
+        Options:
+        - summary: rows are {component, size} (largest first) instead of member lists
+        - includeMembers: keep the member lists in summary mode
+        """
+        opts = options or {}
+        if engine == "native":
+            async for row in self._native_components_stream(relationship_type, opts):
+                yield row
+            return
+
+        config = {
+            "threshold": opts.get("threshold", 0),
+            "consecutiveIds": opts.get("consecutiveIds", False)
+        }
+        query = """
+        CALL gds.wcc.stream($graph_name, $config)
+        YIELD nodeId, componentId
+        RETURN componentId as component, collect(nodeId) as nodes
+        """
+        if opts.get("summary"):
+            query = f"""
             CALL gds.wcc.stream($graph_name, $config)
             YIELD nodeId, componentId
-            RETURN componentId as component, collect(nodeId) as nodes
+            RETURN componentId as component, count(*) as size{", collect(nodeId) as nodes" if opts.get("includeMembers") else ""}
+            ORDER BY size DESC
             """
-            results = self.execute_query(query, {"graph_name": graph_name, "config": config})
-
-            self.drop_graph(graph_name)
-            return results
-        except Exception as e:
-            try:
-                self.drop_graph(graph_name)
-            except Exception as err:
-                print(f"Error: {err}")
-                pass
-            raise e
\ No newline at end of file
+        async with projection_catalog.borrow(
+            relationship_type,
+            orientation=opts.get("orientation", "NATURAL"),
+            graph_name=opts.get("graph_name")
+        ) as graph_name:
+            async for row in self.execute_query_stream(query, {"graph_name": graph_name, "config": config}):
+                yield row
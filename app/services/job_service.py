@@ -0,0 +1,272 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple, Type
+
+from pydantic import BaseModel
+
+from app.config import settings
+from app.engines.parallel import progress_sink
+from app.models.schemas import (
+    CentralityRequest, CommunityRequest, AnomalyRequest, PathRequest, DijkstraPathRequest,
+    AllShortestPathsRequest, DistanceMatrixRequest, LinkPredictionRequest, NodePredictionRequest,
+    BatchLinkPredictionRequest
+)
+from app.services.anomaly_service import AnomalyService
+from app.services.base_service import result_metadata
+from app.services.centrality_service import CentralityService
+from app.services.community_service import CommunityService
+from app.services.path_service import PathService
+from app.services.prediction_service import PredictionService
+from app.services.projection_catalog import projection_catalog, projection_owner
+
+centrality = CentralityService()
+community = CommunityService()
+anomaly = AnomalyService()
+path = PathService()
+prediction = PredictionService()
+
+# (kind, algorithm) -> (request schema, function returning the row stream)
+JOB_TYPES: Dict[Tuple[str, str], Tuple[Type[BaseModel], Callable[..., AsyncIterator[Dict]]]] = {
+    ("centrality", "betweenness"): (
+        CentralityRequest, lambda r: centrality.calculate_betweenness_stream(r.relationship_type, r.options, engine=r.engine)),
+    ("centrality", "closeness"): (
+        CentralityRequest, lambda r: centrality.calculate_closeness_stream(r.relationship_type, r.options, engine=r.engine)),
+    ("centrality", "degree"): (
+        CentralityRequest, lambda r: centrality.calculate_degree_stream(r.relationship_type, r.options)),
+    ("centrality", "pagerank"): (
+        CentralityRequest, lambda r: centrality.calculate_pagerank_stream(r.relationship_type, r.options, engine=r.engine)),
+    ("community", "louvain"): (
+        CommunityRequest, lambda r: community.detect_louvain_stream(r.relationship_type, r.options, engine=r.engine)),
+    ("community", "leiden"): (
+        CommunityRequest, lambda r: community.detect_leiden_stream(r.relationship_type, r.options, engine=r.engine)),
+    ("community", "greedy"): (
+        CommunityRequest, lambda r: community.detect_greedy_stream(r.relationship_type, r.options, engine=r.engine)),
+    ("community", "wcc"): (
+        CommunityRequest,
+        lambda r: community.detect_weakly_connected_components_stream(
+            r.relationship_type, r.options, engine=r.engine)),
+    ("anomaly", "detect"): (
+        AnomalyRequest, lambda r: anomaly.detect_outliers_stream(r.node_label, r.relationship_type, r.options)),
+    ("path", "shortest"): (
+        PathRequest,
+        lambda r: path.find_shortest_path_stream(
+            r.start_node_id, r.end_node_id, r.relationship_type, r.max_hops, r.options, engine=r.engine)),
+    ("path", "all"): (
+        PathRequest,
+        lambda r: path.find_all_paths_stream(
+            r.start_node_id, r.end_node_id, r.relationship_type, r.max_hops, r.k, r.options, engine=r.engine)),
+    ("path", "shortest-dijkstra"): (
+        DijkstraPathRequest,
+        lambda r: path.find_shortest_path_dijkstra_stream(
+            r.start_node_id, r.end_node_id, r.relationship_type, r.options, engine=r.engine)),
+    ("path", "matrix"): (
+        DistanceMatrixRequest,
+        lambda r: path.distance_matrix_stream(
+            r.source_node_ids, r.target_node_ids, r.relationship_type, r.options, r.include_paths, engine=r.engine)),
+    ("path", "all-shortest-dijkstra"): (
+        AllShortestPathsRequest,
+        lambda r: path.find_all_shortest_paths_dijkstra_stream(
+            r.start_node_id, r.relationship_type, r.options, engine=r.engine)),
+    ("prediction", "links"): (
+        LinkPredictionRequest,
+        lambda r: prediction.predict_links_stream(r.node_id, r.relationship_type, r.options, engine=r.engine)),
+    ("prediction", "links-batch"): (
+        BatchLinkPredictionRequest,
+        lambda r: prediction.predict_links_batch_stream(r.relationship_type, r.top_k, r.output_file, r.options)),
+    ("prediction", "node-properties"): (
+        NodePredictionRequest,
+        lambda r: prediction.predict_node_properties_stream(r.node_label, r.property_name, r.options)),
+    ("prediction", "node-properties-advanced"): (
+        NodePredictionRequest,
+        lambda r: prediction.predict_node_properties_with_gds_stream(
+            r.node_label, r.property_name, r.relationship_type, r.options)),
+}
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue is at capacity"""
+
+
+class Job:
+    def __init__(self, kind: str, algorithm: str, request: BaseModel):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.algorithm = algorithm
+        self.request = request
+        self.status = "queued"  # queued, running, succeeded, failed, cancelled
+        self.stage = "queued"
+        self.rows_collected = 0
+        # Last progress reported by the engine: (done, total, unit)
+        self.engine_progress: Optional[Tuple[int, int, str]] = None
+        self.result: List[Dict] = []
+        # Metadata of the result reported by the engine (error bound, modularity, ...)
+        self.result_metadata: Dict = {}
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        # Catalog projections created on behalf of this job
+        self.projections: Set[str] = set()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def report_progress(self, done: int, total: int, unit: str) -> None:
+        self.engine_progress = (done, total, unit)
+
+    def progress(self) -> Optional[Dict]:
+        """Work done as reported by the engine (tasks, samples, iterations...), None when unknown"""
+        if self.engine_progress is None:
+            return None
+        done, total, unit = self.engine_progress
+        # Engines may stop before their total (convergence, early exit)
+        fraction = 1.0 if self.status == "succeeded" else round(done / total, 4) if total else None
+        return {"done": done, "total": total, "unit": unit, "fraction": fraction}
+
+    def to_dict(self) -> dict:
+        now = time.time()
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "algorithm": self.algorithm,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress(),
+            "rows_collected": self.rows_collected,
+            "error": self.error,
+            "timings": {
+                "submitted_at": self.submitted_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "queued_seconds": round((self.started_at or now) - self.submitted_at, 3),
+                "run_seconds": round((self.finished_at or now) - self.started_at, 3) if self.started_at else None
+            }
+        }
+
+
+class JobManager:
+    """
+    Runs long analyses in the background with a bounded pool of workers
+
+    Finished jobs (and their results) are kept for job_retention_seconds.
+    """
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def submit(self, kind: str, algorithm: str, request: dict) -> Job:
+        if (kind, algorithm) not in JOB_TYPES:
+            raise ValueError(f"Unknown job type: {kind}/{algorithm}")
+        schema, _ = JOB_TYPES[(kind, algorithm)]
+        job = Job(kind, algorithm, schema(**(request or {})))
+
+        self._expire()
+        try:
+            self._get_queue().put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"Too many pending jobs (max {settings.job_queue_size})")
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Job]:
+        self._expire()
+        return list(self._jobs.values())
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.get(job_id)
+        if job is None or job.done:
+            return job
+        if job.task is not None:
+            job.task.cancel()
+            try:
+                await job.task
+            except (asyncio.CancelledError, Exception):
+                pass
+        else:
+            # Still in the queue: the worker skips it
+            self._finish(job, "cancelled")
+        return job
+
+    def _get_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=settings.job_queue_size)
+        return self._queue
+
+    def _finish(self, job: Job, status: str, error: str = None) -> None:
+        job.status = status
+        job.stage = status
+        job.error = error
+        job.finished_at = time.time()
+
+    def _expire(self) -> None:
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.done and now - job.finished_at > settings.job_retention_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def _run(self, job: Job) -> None:
+        _, stream = JOB_TYPES[(job.kind, job.algorithm)]
+        projection_owner.set(job.projections)
+        progress_sink.set(job.report_progress)
+        result_metadata.set(job.result_metadata)
+        job.status = "running"
+        job.stage = "running"
+        job.started_at = time.time()
+        try:
+            async for row in stream(job.request):
+                job.stage = "collecting"
+                job.result.append(row)
+                job.rows_collected += 1
+            self._finish(job, "succeeded")
+        except asyncio.CancelledError:
+            self._finish(job, "cancelled")
+            # The projections this job created are not worth keeping
+            await projection_catalog.discard(job.projections)
+            raise
+        except Exception as e:
+            self._finish(job, "failed", str(e))
+
+    async def _worker(self) -> None:
+        queue = self._get_queue()
+        while True:
+            job = await queue.get()
+            try:
+                if job.done:  # Cancelled while queued
+                    continue
+                job.task = asyncio.create_task(self._run(job))
+                try:
+                    await job.task
+                except asyncio.CancelledError:
+                    if not job.task.cancelled():
+                        raise  # The worker itself is being stopped
+            finally:
+                queue.task_done()
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(settings.job_workers)]
+
+    async def stop(self) -> None:
+        for job in self._jobs.values():
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+job_manager = JobManager()
@@ -0,0 +1,322 @@
+import asyncio
+import time
+import uuid
+from array import array
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.engines.sketches import KLLSketch, Welford
+from app.services.base_service import BaseService
+from app.services.snapshot_service import _label_pattern
+
+
+class ChangeLog:
+    """
+    Local change feed: relationships recorded through the API (or by tests),
+    read back by sequence number. Only the last monitor_change_log_size node
+    touches are kept; a reader that falls further behind skips the oldest ones.
+    """
+
+    def __init__(self, max_entries: int = None):
+        self.sequence = 0
+        self._entries: Deque[Tuple[int, int]] = deque(maxlen=max_entries or settings.monitor_change_log_size)
+
+    def record_edges(self, edges: List[List[int]]) -> int:
+        for source, target in edges:
+            self.sequence += 1
+            self._entries.append((self.sequence, source))
+            self._entries.append((self.sequence, target))
+        return self.sequence
+
+    async def poll(self, cursor: int) -> Tuple[Dict[int, int], int]:
+        """Relationships added per node since cursor, and the new cursor"""
+        added: Dict[int, int] = {}
+        for sequence, node_id in reversed(self._entries):
+            if sequence <= cursor:
+                break
+            added[node_id] = added.get(node_id, 0) + 1
+        return added, self.sequence
+
+    async def start_cursor(self) -> int:
+        return self.sequence
+
+
+class TimestampFeed(BaseService):
+    """
+    Change feed polling the relationships whose timestamp property is past the cursor
+
+    The cursor is the largest timestamp seen so far. Relationships written later with
+    that same timestamp are still picked up: the ids already counted at the cursor
+    are remembered and skipped.
+    """
+
+    def __init__(self, node_label: str, relationship_type: Optional[str], timestamp_property: str):
+        super().__init__()
+        self.label = _label_pattern(node_label)
+        self.rel = f":`{relationship_type}`" if relationship_type else ""
+        self.property = f"`{timestamp_property}`"
+        # Relationship ids already counted with timestamp == cursor
+        self._seen: Set[int] = set()
+
+    async def poll(self, cursor) -> Tuple[Dict[int, int], object]:
+        """Relationships added per node since cursor (None: since the beginning), and the new cursor"""
+        if cursor is None:
+            predicate = f"r.{self.property} IS NOT NULL"
+        else:
+            predicate = f"r.{self.property} >= $cursor AND NOT id(r) IN $seen"
+        query = f"""
+        MATCH (n{self.label})-[r{self.rel}]-()
+        WHERE {predicate}
+        RETURN id(n) as node_id, id(r) as relationship_id, r.{self.property} as timestamp
+        """
+        added: Dict[int, int] = {}
+        last = cursor
+        seen = set(self._seen) if cursor is not None else set()
+        params = {"cursor": cursor, "seen": list(self._seen)}
+        async for row in self.execute_query_stream(query, params):
+            added[row["node_id"]] = added.get(row["node_id"], 0) + 1
+            if last is None or row["timestamp"] > last:
+                last = row["timestamp"]
+                seen = {row["relationship_id"]}
+            elif row["timestamp"] == last:
+                seen.add(row["relationship_id"])
+        self._seen = seen
+        return added, last
+
+    async def start_cursor(self):
+        """Largest timestamp in the graph (None without timestamped relationships)"""
+        query = f"""
+        MATCH ()-[r{self.rel}]->()
+        WITH max(r.{self.property}) as cursor
+        OPTIONAL MATCH ()-[r{self.rel}]->()
+        WHERE r.{self.property} = cursor
+        RETURN cursor, collect(id(r)) as seen
+        """
+        rows = await self.execute_query(query)
+        if not rows or rows[0]["cursor"] is None:
+            self._seen = set()
+            return None
+        self._seen = set(rows[0]["seen"])
+        return rows[0]["cursor"]
+
+
+class AnomalyMonitor(BaseService):
+    """
+    Online degree anomaly detection for one (label, relationship type)
+
+    A baseline pass loads every degree once (Welford mean / variance, KLL sketch,
+    degree per node); each tick then reads the nodes touched since the previous
+    tick from the change feed, scores only them against the current statistics
+    and folds their new degrees in: O(delta) work per interval.
+
+    The sketch is insert-only, so it also keeps the previous degrees of touched nodes
+    (quantiles drift slightly towards older values); mean and variance are exact.
+    """
+
+    def __init__(self, name: str, node_label: str, relationship_type: Optional[str], feed,
+                 interval_seconds: float, options: dict = None):
+        super().__init__()
+        opts = options or {}
+        self.name = name
+        self.node_label = node_label
+        self.relationship_type = relationship_type
+        self.feed = feed
+        self.interval_seconds = interval_seconds
+        self.method = opts.get("method", "zscore")
+        if self.method not in ("zscore", "percentile"):
+            raise ValueError(f"Unknown method: {self.method}. Use 'zscore' or 'percentile'")
+        self.threshold = opts.get("threshold", 0.99 if self.method == "percentile" else 3)
+        self.baseline = opts.get("baseline", True)
+        self.moments = Welford()
+        self.sketch = KLLSketch(settings.anomaly_sketch_k)
+        # Baseline degrees (sorted ids) and degrees of the nodes seen since
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._degrees = np.zeros(0, dtype=np.int64)
+        self._recent: Dict[int, int] = {}
+        self.alerts: Deque[Dict] = deque(maxlen=settings.monitor_alert_history)
+        self.cursor = None
+        self.status = "starting"  # starting, running, stopped, failed
+        self.error: Optional[str] = None
+        self.ticks = 0
+        self.nodes_scored = 0
+        self.started_at = time.time()
+        self.last_tick_at: Optional[float] = None
+        self.last_tick_seconds: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def load_baseline(self) -> None:
+        ids, degrees = array("q"), array("q")
+        if self.baseline:
+            label = _label_pattern(self.node_label)
+            rel = f":`{self.relationship_type}`" if self.relationship_type else ""
+            query = f"""
+            MATCH (n{label})
+            RETURN id(n) as node_id, COUNT {{ (n)-[{rel}]-() }} as degree
+            """
+            async for row in self.execute_query_stream(query, {}):
+                ids.append(row["node_id"])
+                degrees.append(row["degree"])
+        ids = np.frombuffer(ids, dtype=np.int64) if ids else np.zeros(0, dtype=np.int64)
+        degrees = np.frombuffer(degrees, dtype=np.int64) if degrees else np.zeros(0, dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        self._ids, self._degrees = ids[order], degrees[order]
+        self.moments.update_many(self._degrees.astype(np.float64))
+        self.sketch.update_many(self._degrees.astype(np.float64))
+        self.cursor = await self.feed.start_cursor()
+
+    def _previous_degrees(self, node_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(degree before this tick, whether the node was already counted in the statistics)"""
+        known = np.array([node_id in self._recent for node_id in node_ids.tolist()], dtype=bool)
+        previous = np.array([self._recent.get(node_id, 0) for node_id in node_ids.tolist()], dtype=np.int64)
+        if len(self._ids):
+            position = np.minimum(np.searchsorted(self._ids, node_ids), len(self._ids) - 1)
+            in_baseline = (self._ids[position] == node_ids) & ~known
+            previous[in_baseline] = self._degrees[position[in_baseline]]
+            known |= in_baseline
+        return previous, known
+
+    def score(self, degrees: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(anomaly score, alert flag) of degrees against the current statistics"""
+        if self.method == "percentile":
+            cut = self.sketch.quantile(self.threshold)
+            return self.sketch.rank(degrees), degrees > cut
+        zscores = np.abs(degrees - self.moments.mean) / (self.moments.std or 1.0)
+        return zscores, zscores > self.threshold
+
+    async def tick(self) -> List[Dict]:
+        started = time.perf_counter()
+        added, cursor = await self.feed.poll(self.cursor)
+        alerts = []
+        if added:
+            node_ids = np.fromiter(added.keys(), dtype=np.int64, count=len(added))
+            increments = np.fromiter(added.values(), dtype=np.int64, count=len(added))
+            previous, known = self._previous_degrees(node_ids)
+            degrees = previous + increments
+
+            # Score before folding the new degrees in, so a burst does not mask itself
+            if self.moments.count >= settings.monitor_min_observations:
+                scores, flagged = self.score(degrees.astype(np.float64))
+                now = time.time()
+                for i in np.flatnonzero(flagged):
+                    alerts.append({
+                        "monitor": self.name,
+                        "node_id": int(node_ids[i]),
+                        "degree": int(degrees[i]),
+                        "previous_degree": int(previous[i]),
+                        "score": float(scores[i]),
+                        "method": self.method,
+                        "detected_at": now
+                    })
+                self.alerts.extend(alerts)
+
+            self.moments.remove_many(previous[known].astype(np.float64))
+            self.moments.update_many(degrees.astype(np.float64))
+            self.sketch.update_many(degrees.astype(np.float64))
+            self._recent.update(zip(node_ids.tolist(), degrees.tolist()))
+            self.nodes_scored += len(node_ids)
+        self.cursor = cursor
+        self.ticks += 1
+        self.last_tick_at = time.time()
+        self.last_tick_seconds = round(time.perf_counter() - started, 4)
+        return alerts
+
+    async def run(self) -> None:
+        try:
+            await self.load_baseline()
+            self.status = "running"
+            while True:
+                try:
+                    await self.tick()
+                    self.error = None
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Keep monitoring: the feed may be temporarily unavailable
+                    self.error = str(e)
+                await asyncio.sleep(self.interval_seconds)
+        except asyncio.CancelledError:
+            self.status = "stopped"
+            raise
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+
+    def recent_alerts(self, since: Optional[float] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Most recent alerts first"""
+        alerts = [alert for alert in reversed(self.alerts) if since is None or alert["detected_at"] > since]
+        return alerts[:limit] if limit else alerts
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "node_label": self.node_label,
+            "relationship_type": self.relationship_type,
+            "feed": "log" if isinstance(self.feed, ChangeLog) else "timestamp",
+            "method": self.method,
+            "threshold": self.threshold,
+            "status": self.status,
+            "error": self.error,
+            "interval_seconds": self.interval_seconds,
+            "ticks": self.ticks,
+            "nodes_scored": self.nodes_scored,
+            "alerts": len(self.alerts),
+            "cursor": self.cursor,
+            "statistics": {
+                "count": self.moments.count,
+                "mean": self.moments.mean,
+                "std": self.moments.std,
+                "quantile_rank_error": self.sketch.rank_error()
+            },
+            "started_at": self.started_at,
+            "last_tick_at": self.last_tick_at,
+            "last_tick_seconds": self.last_tick_seconds
+        }
+
+
+class MonitorManager:
+    """Running anomaly monitors, by name"""
+
+    def __init__(self):
+        self._monitors: Dict[str, AnomalyMonitor] = {}
+
+    def start(self, node_label: str, relationship_type: Optional[str], feed: str = "timestamp",
+              timestamp_property: str = "created_at", interval_seconds: float = None,
+              options: dict = None, name: Optional[str] = None) -> AnomalyMonitor:
+        name = name or uuid.uuid4().hex[:12]
+        existing = self._monitors.get(name)
+        if existing is not None and existing.status in ("starting", "running"):
+            raise ValueError(f"Monitor {name} is already running")
+        if feed == "log":
+            source = ChangeLog()
+        else:
+            source = TimestampFeed(node_label, relationship_type, timestamp_property)
+        monitor = AnomalyMonitor(
+            name, node_label, relationship_type, source,
+            interval_seconds or settings.monitor_interval_seconds, options
+        )
+        monitor.task = asyncio.create_task(monitor.run())
+        self._monitors[name] = monitor
+        return monitor
+
+    def get(self, name: str) -> Optional[AnomalyMonitor]:
+        return self._monitors.get(name)
+
+    def list_monitors(self) -> List[AnomalyMonitor]:
+        return list(self._monitors.values())
+
+    async def stop(self, name: str) -> Optional[AnomalyMonitor]:
+        monitor = self._monitors.pop(name, None)
+        if monitor is not None and monitor.task is not None and not monitor.task.done():
+            monitor.task.cancel()
+            await asyncio.gather(monitor.task, return_exceptions=True)
+        return monitor
+
+    async def stop_all(self) -> None:
+        for name in list(self._monitors):
+            await self.stop(name)
+
+
+monitor_manager = MonitorManager()
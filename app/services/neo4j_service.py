@@ -1,8 +1,22 @@
+import asyncio
+import time
+
+from app.config import settings
+from app.engines.paths import bidirectional_bfs
+from app.engines.reachability import ReachabilityIndex, build_reachability
 from app.services.base_service import BaseService
-from typing import List
+from app.services.result_cache import result_cache
+from app.services.snapshot_service import snapshot_store
+from typing import Dict, List, Optional
+
+# Snapshot name -> reachability index built on that snapshot
+reachability_indexes: Dict[str, ReachabilityIndex] = {}
+# An index lives as long as its snapshot
+snapshot_store.on_drop(lambda name: reachability_indexes.pop(name, None))
+
 
 class Neo4jService(BaseService):
-    def get_graph_stats(self) -> dict:
+    async def get_graph_stats(self) -> dict:
         """Return graph statistics"""
         query = """
             MATCH (n)
@@ -20,10 +34,10 @@ class Neo4jService(BaseService):
                 relationship_type_count: size(relationship_types)
             } as stats
         """
-        result = self.execute_query(query)
+        result = await self.execute_query(query)
         return result[0]['stats'] if result else {}
 
-    def get_node_by_id(self, node_id: str) -> dict:
+    async def get_node_by_id(self, node_id: str) -> dict:
         """Retrieve a node by its ID."""
         query = """
         MATCH (n) WHERE id(n) = $node_id
@@ -31,10 +45,10 @@ class Neo4jService(BaseService):
                labels(n) as labels, 
                properties(n) as properties
         """
-        result = self.execute_query(query, {"node_id": node_id})
+        result = await self.execute_query(query, {"node_id": node_id})
         return result[0] if result else None
 
-    def get_detailed_stats(self) -> dict:
+    async def get_detailed_stats(self) -> dict:
         """Returns detailed statistics by label and relationship type"""
         # Stats by label
         node_stats_query = """
@@ -63,9 +77,9 @@ class Neo4jService(BaseService):
         } as degree_stats
         """
 
-        node_result = self.execute_query(node_stats_query)
-        rel_result = self.execute_query(rel_stats_query)
-        degree_result = self.execute_query(degree_query)
+        node_result = await self.execute_query(node_stats_query)
+        rel_result = await self.execute_query(rel_stats_query)
+        degree_result = await self.execute_query(degree_query)
 
         return {
             "nodes_by_label": node_result[0]['node_stats'] if node_result else [],
@@ -73,7 +87,7 @@ class Neo4jService(BaseService):
             "degree_statistics": degree_result[0]['degree_stats'] if degree_result else {}
         }
 
-    def get_node_with_relationships(self, node_id: int, limit: int = 50) -> dict:
+    async def get_node_with_relationships(self, node_id: int, limit: int = 50) -> dict:
         """Retrieve a node with its relationships (incoming and outgoing)"""
         query = """
         MATCH (n) WHERE id(n) = $node_id
@@ -103,11 +117,11 @@ class Neo4jService(BaseService):
             incoming_count: size(incoming)
         } as result
         """
-        result = self.execute_query(query, {"node_id": node_id, "limit": limit})
+        result = await self.execute_query(query, {"node_id": node_id, "limit": limit})
         return result[0]['result'] if result else None
 
-    def search_nodes(self, label: str = None, property_filters: dict = None,
-                     limit: int = 100) -> List[dict]:
+    async def search_nodes(self, label: str = None, property_filters: dict = None,
+                           limit: int = 100) -> List[dict]:
         """
         Search for nodes by label and/or properties
 
@@ -140,10 +154,10 @@ class Neo4jService(BaseService):
         LIMIT $limit
         """
 
-        return self.execute_query(query, params)
+        return await self.execute_query(query, params)
 
-    def get_neighbors(self, node_id: int, relationship_type: str = None,
-                      direction: str = "BOTH", limit: int = 50) -> List[dict]:
+    async def get_neighbors(self, node_id: int, relationship_type: str = None,
+                            direction: str = "BOTH", limit: int = 50) -> List[dict]:
         """
         Retrieve a node’s neighbors
 
@@ -172,9 +186,9 @@ class Neo4jService(BaseService):
         LIMIT $limit
         """
 
-        return self.execute_query(query, {"node_id": node_id, "limit": limit})
+        return await self.execute_query(query, {"node_id": node_id, "limit": limit})
 
-    def get_subgraph(self, node_ids: List[int]) -> dict:
+    async def get_subgraph(self, node_ids: List[int]) -> dict:
         """
         Retrieve a subgraph from a list of node IDs
 
@@ -201,24 +215,139 @@ class Neo4jService(BaseService):
             relationships: [r IN relationships WHERE r.type IS NOT NULL | r]
         } as subgraph
         """
-        result = self.execute_query(query, {"node_ids": node_ids})
+        result = await self.execute_query(query, {"node_ids": node_ids})
         return result[0]['subgraph'] if result else {"nodes": [], "relationships": []}
 
-    def check_connection_exists(self, start_id: int, end_id: int,
-                                relationship_type: str = None, max_hops: int = 5) -> bool:
+    async def check_connection_exists(self, start_id: int, end_id: int,
+                                      relationship_type: str = None, max_hops: Optional[int] = 5,
+                                      directed: bool = False, options: dict = None,
+                                      engine: str = "gds") -> bool:
         """Verify if two nodes are connected"""
+        if engine == "native":
+            result = await self.check_connection_native(
+                start_id, end_id, relationship_type, max_hops, directed, options
+            )
+            return result["connected"]
+        if max_hops is None:
+            raise ValueError("max_hops is required unless engine=native")
         rel_pattern = f"[:{relationship_type}*..{max_hops}]" if relationship_type else f"[*..{max_hops}]"
+        arrow = "->" if directed else "-"
 
         query = f"""
         MATCH (start) WHERE id(start) = $start_id
         MATCH (end) WHERE id(end) = $end_id
-        RETURN EXISTS((start)-{rel_pattern}-(end)) as connected
+        RETURN EXISTS((start)-{rel_pattern}{arrow}(end)) as connected
         """
 
-        result = self.execute_query(query, {"start_id": start_id, "end_id": end_id})
+        result = await self.execute_query(query, {"start_id": start_id, "end_id": end_id})
         return result[0]['connected'] if result else False
 
-    def get_database_info(self) -> dict:
+    async def check_connection_native(self, start_id: int, end_id: int, relationship_type: str = None,
+                                      max_hops: Optional[int] = 5, directed: bool = False,
+                                      options: dict = None) -> Dict:
+        """
+        Connection check answered from the reachability index of a snapshot (no Neo4j query)
+
+        Different weak components are never connected; without max_hops the index
+        answers alone (GRAIL labels for directed checks), otherwise a bidirectional BFS
+        bounded by max_hops runs on the snapshot once the index has not ruled it out.
+
+        Options: snapshot, node_label
+        """
+        opts = options or {}
+        index = await self.get_reachability_index(relationship_type, opts)
+        # The graph the index was built on: the snapshot may have been evicted or reloaded since
+        graph = index.graph
+        indices = graph.index_of([start_id, end_id])
+        if (indices < 0).any():
+            missing = [node_id for node_id, i in zip((start_id, end_id), indices.tolist()) if i < 0]
+            raise ValueError(f"Nodes {missing} are not in the snapshot")
+        source, target = indices.tolist()
+        if directed:
+            connected, answered_by = index.reaches(source, target)
+        else:
+            connected = index.connected(source, target)
+            answered_by = "components"
+        if connected and max_hops is not None and source != target:
+            if directed:
+                forward, backward = graph, await asyncio.to_thread(graph.view, "REVERSE")
+            else:
+                forward = backward = await asyncio.to_thread(graph.view, "UNDIRECTED")
+            path = await asyncio.to_thread(bidirectional_bfs, forward, backward, source, target, max_hops)
+            connected = path is not None
+            answered_by = "bfs"
+        return {
+            "connected": connected,
+            "answered_by": answered_by,
+            "index": index.name,
+            "index_age_seconds": round(time.time() - index.built_at, 3)
+        }
+
+    async def build_reachability_index(self, relationship_type: Optional[str], options: dict = None) -> ReachabilityIndex:
+        """
+        Build (or rebuild) the reachability index of a snapshot
+
+        Options: snapshot, node_label, traversals (GRAIL labelings), randomSeed
+        """
+        opts = options or {}
+        name = opts.get("snapshot")
+        if name:
+            snapshot = snapshot_store.get(name)
+            if snapshot is None:
+                raise ValueError(f"Snapshot {name} not found")
+        else:
+            snapshot = await snapshot_store.create(opts.get("node_label"), relationship_type)
+        graph = snapshot.graph.view("NATURAL")
+        index = await asyncio.to_thread(
+            build_reachability, snapshot.name, graph,
+            opts.get("traversals", settings.reachability_traversals), opts.get("randomSeed", 42)
+        )
+        index.graph = graph
+        index.snapshot_loaded_at = snapshot.loaded_at
+        index.relationship_type = relationship_type
+        index.options = opts
+        if snapshot_store.get(snapshot.name) is snapshot:
+            # Not registered when the snapshot was dropped during the build
+            reachability_indexes[snapshot.name] = index
+        return index
+
+    async def get_reachability_index(self, relationship_type: Optional[str], options: dict = None) -> ReachabilityIndex:
+        """The index of the snapshot, built on first use and again after a snapshot refresh"""
+        opts = options or {}
+        name = opts.get("snapshot") or snapshot_store.default_name(opts.get("node_label"), relationship_type, None)
+        index = reachability_indexes.get(name)
+        snapshot = snapshot_store.get(name)
+        if index is None or snapshot is None or snapshot.loaded_at != index.snapshot_loaded_at:
+            index = await self.build_reachability_index(relationship_type, opts)
+        return index
+
+    async def rebuild_reachability_index(self, name: str, refresh: bool = True) -> Optional[ReachabilityIndex]:
+        """Reload the snapshot from Neo4j (unless refresh is false) and rebuild its index"""
+        index = reachability_indexes.get(name)
+        if index is None:
+            return None
+        snapshot = await snapshot_store.refresh(name) if refresh else snapshot_store.get(name)
+        # An evicted snapshot is loaded again from the original parameters
+        options = {**index.options, "snapshot": name} if snapshot is not None else index.options
+        return await self.build_reachability_index(index.relationship_type, options)
+
+    async def reachability_index_info(self, index: ReachabilityIndex) -> Dict:
+        """
+        Index details and staleness:
+        - stale: its snapshot was reloaded since the build
+        - snapshot_outdated: the graph changed since the snapshot was loaded (fingerprint)
+        """
+        snapshot = snapshot_store.get(index.name)
+        info = index.to_dict()
+        info["stale"] = snapshot is None or snapshot.loaded_at != index.snapshot_loaded_at
+        info["snapshot_outdated"] = snapshot is None or snapshot.fingerprint != await result_cache.fingerprint()
+        info["age_seconds"] = round(time.time() - index.built_at, 3)
+        return info
+
+    async def list_reachability_indexes(self) -> List[Dict]:
+        return [await self.reachability_index_info(index) for index in reachability_indexes.values()]
+
+    async def get_database_info(self) -> dict:
         """Retrieve information about the Neo4j database"""
         query = """
         CALL dbms.components() YIELD name, versions, edition
@@ -256,9 +385,9 @@ class Neo4jService(BaseService):
         """
 
         try:
-            db_result = self.execute_query(query)
-            constraints_result = self.execute_query(constraints_query)
-            indexes_result = self.execute_query(indexes_query)
+            db_result = await self.execute_query(query)
+            constraints_result = await self.execute_query(constraints_query)
+            indexes_result = await self.execute_query(indexes_query)
 
             return {
                 "database": db_result[0]['db_info'] if db_result else {},
@@ -0,0 +1,148 @@
+import base64
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+
+class CursorError(ValueError):
+    """Raised for malformed or expired cursors"""
+
+
+class ResultSet:
+    """Sorted head of an algorithm result, kept so that later pages are not recomputed"""
+
+    def __init__(self, fetch: Optional[Callable[[int], AsyncIterator[Dict]]] = None):
+        self.id = uuid.uuid4().hex
+        self.fetch = fetch
+        self.rows: List[Dict] = []
+        # True when rows holds the whole result (the last fetch returned fewer rows than asked)
+        self.exhausted = False
+        # Metadata of the computation (e.g: error bound of a native engine), repeated on every page
+        self.metadata: Dict = {}
+        self.last_used = time.monotonic()
+
+    async def ensure(self, count: int) -> None:
+        """
+        Make sure the first `count` rows are available
+
+        The first fetch reads a window of `count` rows; reading past it runs the query
+        once more without limit and keeps the whole result, so the algorithm runs at
+        most twice per cursor.
+        """
+        if self.exhausted or len(self.rows) >= count:
+            return
+        window = None if self.rows else count
+        rows = [row async for row in self.fetch(window)]
+        self.rows = rows
+        self.exhausted = window is None or len(rows) < window
+
+
+class ResultSetStore:
+    """LRU store of result sets with an idle TTL"""
+
+    def __init__(self):
+        self._sets: "OrderedDict[str, ResultSet]" = OrderedDict()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for key in [k for k, rs in self._sets.items() if now - rs.last_used > settings.result_set_ttl_seconds]:
+            del self._sets[key]
+        while len(self._sets) > settings.result_set_max_entries:
+            self._sets.popitem(last=False)
+
+    def add(self, result_set: ResultSet) -> None:
+        self._sets[result_set.id] = result_set
+        self._expire()
+
+    def get(self, result_set_id: str) -> ResultSet:
+        self._expire()
+        result_set = self._sets.get(result_set_id)
+        if result_set is None:
+            raise CursorError("Cursor expired, request the first page again")
+        result_set.last_used = time.monotonic()
+        self._sets.move_to_end(result_set_id)
+        return result_set
+
+
+result_sets = ResultSetStore()
+
+
+def encode_cursor(result_set_id: str, offset: int, limit: int) -> str:
+    payload = json.dumps({"rs": result_set_id, "o": offset, "l": limit}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return payload["rs"], int(payload["o"]), int(payload["l"])
+    except Exception:
+        raise CursorError("Invalid cursor")
+
+
+def _page(result_set: ResultSet, offset: int, limit: int) -> Tuple[List[Dict], dict]:
+    page = result_set.rows[offset:offset + limit]
+    next_offset = offset + limit
+    has_more = next_offset < len(result_set.rows) or not result_set.exhausted
+
+    metadata = {
+        **result_set.metadata,
+        "limit": limit,
+        "offset": offset,
+        "returned": len(page),
+        "has_more": has_more,
+        "next_cursor": encode_cursor(result_set.id, next_offset, limit) if has_more else None
+    }
+    if result_set.exhausted:
+        metadata["total"] = len(result_set.rows)
+    return page, metadata
+
+
+async def paginate(fetch: Callable[[int], AsyncIterator[Dict]], limit: Optional[int] = None,
+                   offset: int = 0, cursor: Optional[str] = None) -> Tuple[List[Dict], dict]:
+    """
+    Return one page of a sorted result and its pagination metadata
+
+    fetch(top_k) must stream the first top_k rows in order (all of them for None). The
+    first call prefetches several pages; following pages (through the cursor) are served
+    from the result set, and the first cursor past them fetches the rest of the result once.
+    """
+    if cursor:
+        result_set_id, offset, cursor_limit = decode_cursor(cursor)
+        result_set = result_sets.get(result_set_id)
+        limit = limit or cursor_limit
+    else:
+        limit = limit or settings.pagination_default_limit
+        result_set = ResultSet(fetch)
+        await result_set.ensure(offset + limit * settings.pagination_prefetch_pages)
+        result_sets.add(result_set)
+
+    await result_set.ensure(offset + limit)
+    return _page(result_set, offset, limit)
+
+
+async def paginate_result(compute: Callable[[], Awaitable[Dict]], limit: Optional[int] = None,
+                          offset: int = 0, cursor: Optional[str] = None) -> Tuple[List[Dict], dict]:
+    """
+    Same as paginate, for results computed whole ({"data": sorted rows, "metadata": ...})
+    such as the native engines': computed once per cursor, pages are slices of it and
+    carry its metadata
+    """
+    if cursor:
+        result_set_id, offset, cursor_limit = decode_cursor(cursor)
+        result_set = result_sets.get(result_set_id)
+        limit = limit or cursor_limit
+    else:
+        limit = limit or settings.pagination_default_limit
+        result = await compute()
+        result_set = ResultSet()
+        result_set.rows = result["data"]
+        result_set.metadata = result.get("metadata") or {}
+        result_set.exhausted = True
+        result_sets.add(result_set)
+    return _page(result_set, offset, limit)
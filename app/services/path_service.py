@@ -1,10 +1,126 @@
-from app.services.base_service import BaseService
-from typing import Dict, Any
+import asyncio
+import math
+import os
+import time
+from itertools import islice
+
+import numpy as np
+
+from app.config import settings
+from app.engines.csr import CSRGraph
+from app.engines.landmarks import LandmarkIndex, alt_search, build_landmarks
+from app.engines.parallel import chunks, map_reduce, share, use_pool, worker_count
+from app.engines.paths import (
+    _walk, bidirectional_bfs, bidirectional_dijkstra, matrix_rows, settle, yen_k_shortest
+)
+from app.services.base_service import BaseService, report_metadata
+from app.services.projection_catalog import projection_catalog, normalize_orientation
+from app.services.snapshot_service import snapshot_store
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+# Traversal graph of the other end of a bidirectional search
+REVERSED = {"NATURAL": "REVERSE", "REVERSE": "NATURAL", "UNDIRECTED": "UNDIRECTED"}
+
+# Nodes settled by the native SSSP per worker-thread batch
+SSSP_YIELD_ROWS = 5000
+
+# "<snapshot>:<orientation>" -> ALT index built on that snapshot
+landmark_indexes: Dict[str, LandmarkIndex] = {}
+
+
+def _snapshot_name(relationship_type: str, opts: dict, weight_property: Optional[str] = None) -> str:
+    return opts.get("snapshot") or snapshot_store.default_name(None, relationship_type, weight_property)
+
+
+def _sssp_rows(settled: Iterator, graph: CSRGraph, parents: Dict[int, int], hops: Dict[int, int],
+               count: int, include_paths: bool) -> List[Dict]:
+    """Next count rows of a settle() search (runs in a worker thread)"""
+    rows = []
+    for node, distance, parent in islice(settled, count):
+        parents[node] = parent
+        hops[node] = hops[parent] + 1 if parent >= 0 else 0
+        row = {"target_node_id": graph.node_ids[node].item(), "total_cost": distance, "hops": hops[node]}
+        if include_paths:
+            row["path"] = graph.node_ids[_walk(parents, node)[::-1]].tolist()
+        rows.append(row)
+    return rows
+
+
+def _landmark_key(snapshot_name: str, orientation: str) -> str:
+    return f"{snapshot_name}:{orientation}"
+
+
+def _remove_files(index: LandmarkIndex) -> None:
+    # Queries still holding the mapping keep reading it after the unlink
+    for path in index.files:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _drop_landmark_indexes(snapshot_name: str) -> None:
+    """An index lives as long as its snapshot (every orientation)"""
+    for key in [key for key in landmark_indexes if key.rsplit(":", 1)[0] == snapshot_name]:
+        _remove_files(landmark_indexes.pop(key))
+
+
+snapshot_store.on_drop(_drop_landmark_indexes)
+
 
 class PathService(BaseService):
-    def find_shortest_path(self, start_id: int, end_id: int,
-                          relationship_type: str, max_hops: int = 10):
+    async def _native_graphs(self, relationship_type: str, opts: dict,
+                             weight_property: Optional[str] = None) -> Tuple[CSRGraph, CSRGraph]:
+        """
+        Forward / backward views of the snapshot used by the native path engines
+
+        Orientation defaults to UNDIRECTED, as the Cypher and GDS queries.
+        """
+        orientation = normalize_orientation(opts.get("orientation", "UNDIRECTED"))
+        graph = await snapshot_store.get_graph(
+            opts, relationship_type, weight_property=weight_property, orientation=orientation
+        )
+        return graph, await asyncio.to_thread(graph.view, REVERSED[orientation])
+
+    @staticmethod
+    def _endpoints(graph: CSRGraph, *node_ids: int) -> Tuple[int, ...]:
+        indices = graph.index_of(list(node_ids))
+        missing = [node_id for node_id, index in zip(node_ids, indices) if index < 0]
+        if missing:
+            raise ValueError(f"Nodes {missing} are not in the snapshot")
+        return tuple(int(index) for index in indices)
+
+    async def find_shortest_path_native(self, start_id: int, end_id: int, relationship_type: str,
+                                        max_hops: int = 10, options: dict = None):
+        """
+        Fewest-hops path with a bidirectional BFS on a CSR snapshot (at most one row)
+
+        Options: orientation (default: UNDIRECTED), snapshot
+        """
+        opts = options or {}
+        forward, backward = await self._native_graphs(relationship_type, opts)
+        source, target = self._endpoints(forward, start_id, end_id)
+        path = await asyncio.to_thread(bidirectional_bfs, forward, backward, source, target, max_hops)
+        if path is None:
+            return []
+        return [{"path": forward.node_ids[path].tolist(), "hops": len(path) - 1}]
+
+    async def find_shortest_path(self, start_id: int, end_id: int,
+                                relationship_type: str, max_hops: int = 10,
+                                options: dict = None, engine: str = "gds"):
         """Find the shortest path"""
+        return [row async for row in self.find_shortest_path_stream(
+            start_id, end_id, relationship_type, max_hops, options, engine=engine
+        )]
+
+    async def find_shortest_path_stream(self, start_id: int, end_id: int,
+                                       relationship_type: str, max_hops: int = 10,
+                                       options: dict = None, engine: str = "gds"):
+        """Stream the shortest path (at most one row)"""
+        if engine == "native":
+            for row in await self.find_shortest_path_native(start_id, end_id, relationship_type, max_hops, options):
+                yield row
+            return
         query = f"""
         MATCH path = shortestPath(
             (start)-[:{relationship_type}*..{max_hops}]-(end)
@@ -13,22 +129,178 @@ class PathService(BaseService):
         RETURN [n IN nodes(path) | id(n)] as path,
                length(path) as hops
         """
-        return self.execute_query(query, {"start_id": start_id, "end_id": end_id})
+        async for row in self.execute_query_stream(query, {"start_id": start_id, "end_id": end_id}):
+            yield row
+
+    async def find_k_shortest_paths_native(self, start_id: int, end_id: int, relationship_type: str,
+                                           max_hops: Optional[int] = 10, k: int = 100,
+                                           options: dict = None) -> Dict:
+        """
+        The k cheapest loopless paths (Yen) on a CSR snapshot, in cost order
+
+        Options:
+        - relationshipWeightProperty: weighted costs (default: hops)
+        - timeBudgetMs: stop early and return the paths found so far
+        - orientation (default: UNDIRECTED), snapshot
+
+        Returns {"data": rows, "metadata": completion details}
+        """
+        opts = options or {}
+        weight_property = opts.get("relationshipWeightProperty")
+        forward, backward = await self._native_graphs(relationship_type, opts, weight_property)
+        source, target = self._endpoints(forward, start_id, end_id)
+        budget = opts.get("timeBudgetMs")
+        paths, info = await asyncio.to_thread(
+            yen_k_shortest, forward, backward, source, target, k,
+            weighted=bool(weight_property),
+            max_hops=max_hops,
+            time_budget=budget / 1000 if budget else settings.k_shortest_time_budget_seconds
+        )
+        rows = [
+            {
+                "path_ids": forward.node_ids[path].tolist(),
+                "hops": len(path) - 1,
+                "total_cost": cost,
+                "costs": costs
+            }
+            for cost, path, costs in paths
+        ]
+        return {"data": rows, "metadata": info}
 
-    def find_all_paths(self, start_id: int, end_id: int,
-                      relationship_type: str, max_hops: int = 10):
+    async def find_all_paths(self, start_id: int, end_id: int,
+                            relationship_type: str, max_hops: int = 10, k: int = 100,
+                            options: dict = None, engine: str = "gds"):
         """Find all paths"""
+        return [row async for row in self.find_all_paths_stream(
+            start_id, end_id, relationship_type, max_hops, k, options, engine=engine
+        )]
+
+    async def find_all_paths_stream(self, start_id: int, end_id: int,
+                                   relationship_type: str, max_hops: int = 10, k: int = 100,
+                                   options: dict = None, engine: str = "gds"):
+        """
+        Stream up to k paths
+
+        gds: paths as Cypher matches them (arbitrary order); native: the k shortest, in cost order
+        """
+        if engine == "native":
+            result = await self.find_k_shortest_paths_native(start_id, end_id, relationship_type, max_hops, k, options)
+            report_metadata(result["metadata"])
+            for row in result["data"]:
+                yield row
+            return
         query = f"""
         MATCH path = (start)-[:{relationship_type}*..{max_hops}]-(end)
         WHERE id(start) = $start_id AND id(end) = $end_id
         RETURN [n IN nodes(path) | id(n)] as path_ids,
                length(path) as hops
-        LIMIT 100
+        LIMIT $k
         """
-        return self.execute_query(query, {"start_id": start_id, "end_id": end_id})
+        async for row in self.execute_query_stream(query, {"start_id": start_id, "end_id": end_id, "k": k}):
+            yield row
 
-    def find_shortest_path_dijkstra(self, start_id: int, end_id: int,
-                                    relationship_type: str, options: dict = None):
+    async def build_landmark_index(self, relationship_type: str, landmarks: int = None,
+                                   options: dict = None) -> LandmarkIndex:
+        """
+        Build (or rebuild) the ALT landmark index of a snapshot
+
+        Options: relationshipWeightProperty, orientation (default: UNDIRECTED), snapshot, randomSeed
+        """
+        opts = options or {}
+        weight_property = opts.get("relationshipWeightProperty")
+        forward, backward = await self._native_graphs(relationship_type, opts, weight_property)
+        snapshot_name = _snapshot_name(relationship_type, opts, weight_property)
+        key = _landmark_key(snapshot_name, forward.orientation)
+        index = await build_landmarks(
+            key, forward, backward,
+            landmarks or settings.landmark_count,
+            weighted=bool(weight_property),
+            directory=settings.landmark_index_dir,
+            seed=opts.get("randomSeed", 42)
+        )
+        snapshot = snapshot_store.get(snapshot_name)
+        index.snapshot_loaded_at = snapshot.loaded_at if snapshot is not None else None
+        index.relationship_type = relationship_type
+        index.options = opts
+        if snapshot is None:
+            # Dropped during the build: not registered, nothing would remove its files
+            _remove_files(index)
+            return index
+        previous = landmark_indexes.get(key)
+        landmark_indexes[key] = index
+        if previous is not None:
+            _remove_files(previous)
+        return index
+
+    async def rebuild_landmark_index(self, name: str) -> Optional[LandmarkIndex]:
+        """
+        Rebuild an index with its original parameters (e.g: after a snapshot refresh)
+
+        None when there is no such index (indexes are removed with their snapshot).
+        """
+        index = landmark_indexes.get(name)
+        if index is None:
+            return None
+        return await self.build_landmark_index(index.relationship_type, len(index.landmarks), index.options)
+
+    def landmark_index_info(self, index: LandmarkIndex) -> Dict:
+        """Index details, memory footprint and whether its snapshot was reloaded since"""
+        snapshot = snapshot_store.get(index.name.rsplit(":", 1)[0])
+        info = index.to_dict(snapshot.graph.node_ids if snapshot is not None else None)
+        info["stale"] = snapshot is None or snapshot.loaded_at != index.snapshot_loaded_at
+        return info
+
+    def list_landmark_indexes(self) -> List[Dict]:
+        return [self.landmark_index_info(index) for index in landmark_indexes.values()]
+
+    def _fresh_landmark_index(self, relationship_type: str, opts: dict, orientation: str,
+                              weight_property: Optional[str]) -> Optional[LandmarkIndex]:
+        """The ALT index of the snapshot used by a query, if built on its current load"""
+        snapshot_name = _snapshot_name(relationship_type, opts, weight_property)
+        index = landmark_indexes.get(_landmark_key(snapshot_name, orientation))
+        snapshot = snapshot_store.get(snapshot_name)
+        if index is None or snapshot is None or snapshot.loaded_at != index.snapshot_loaded_at:
+            return None
+        return index if index.weighted == bool(weight_property) else None
+
+    async def find_shortest_path_dijkstra_native(self, start_id: int, end_id: int,
+                                                 relationship_type: str, options: dict = None):
+        """
+        Cheapest path on a CSR snapshot (at most one row)
+
+        A* with landmark lower bounds when the snapshot has an up-to-date ALT index,
+        else a bidirectional Dijkstra.
+
+        Options: relationshipWeightProperty, orientation (default: UNDIRECTED), snapshot,
+        useLandmarks (default: true)
+        """
+        opts = options or {}
+        weight_property = opts.get("relationshipWeightProperty")
+        forward, backward = await self._native_graphs(relationship_type, opts, weight_property)
+        source, target = self._endpoints(forward, start_id, end_id)
+        index = None
+        if opts.get("useLandmarks", True):
+            index = self._fresh_landmark_index(relationship_type, opts, forward.orientation, weight_property)
+        if index is not None:
+            cost, path, costs = await asyncio.to_thread(
+                alt_search, forward, index, source, target, bool(weight_property)
+            )
+        else:
+            cost, path, costs = await asyncio.to_thread(
+                bidirectional_dijkstra, forward, backward, source, target, bool(weight_property)
+            )
+        if path is None or math.isinf(cost):
+            return []
+        return [{
+            "path": forward.node_ids[path].tolist(),
+            "total_cost": cost,
+            "hops": len(path) - 1,
+            "step_costs": costs
+        }]
+
+    async def find_shortest_path_dijkstra(self, start_id: int, end_id: int,
+                                          relationship_type: str, options: dict = None,
+                                          engine: str = "gds"):
         """
         Find the shortest path using Dijkstra’s algorithm (GDS)
             Advantages vs native Cypher:
@@ -38,8 +310,20 @@ class PathService(BaseService):
 
             Options:
             - relationshipWeightProperty: property containing the weight (default: None = weight 1)
-            - graph_name: name of the projected graph (auto-generated if not provided)
+            - graph_name: name of an existing projected graph (default: shared projection catalog)
         """
+        return [row async for row in self.find_shortest_path_dijkstra_stream(
+            start_id, end_id, relationship_type, options, engine=engine
+        )]
+
+    async def find_shortest_path_dijkstra_stream(self, start_id: int, end_id: int,
+                                                 relationship_type: str, options: dict = None,
+                                                 engine: str = "gds"):
+        """Stream the Dijkstra shortest path (at most one row)"""
+        if engine == "native":
+            for row in await self.find_shortest_path_dijkstra_native(start_id, end_id, relationship_type, options):
+                yield row
+            return
         # opts = options or {}
         # weight_property = opts.get("relationshipWeightProperty", {})
         # graph_name = opts.get("graph_name", f"temp_dijkstra_{start_id}_{end_id}")
@@ -115,156 +399,270 @@ class PathService(BaseService):
         #     return results
         opts = options or {}
         weight_property = opts.get("relationshipWeightProperty")
-        graph_name = opts.get("graph_name", f"temp_dijkstra_{start_id}_{end_id}")
 
-        try:
-            # Step 1: Create a projected graph with or without weights
-            if weight_property:
-                create_graph_query = """
-                CALL gds.graph.project(
-                    $graph_name,
-                    '*',
-                    {
-                        rel: {
-                            type: $relationship_type,
-                            orientation: 'UNDIRECTED',
-                            properties: $weight_property
-                        }
-                    }
-                )
-                """
-                params = {
-                    "graph_name": graph_name,
-                    "relationship_type": relationship_type,
-                    "weight_property": weight_property
-                }
-            else:
-                create_graph_query = """
-                CALL gds.graph.project(
-                    $graph_name,
-                    '*',
-                    {
-                        rel: {
-                            type: $relationship_type,
-                            orientation: 'UNDIRECTED'
-                        }
-                    }
-                )
-                """
-                params = {
+        dijkstra_config = {
+            "sourceNode": start_id,
+            "targetNode": end_id
+        }
+        if weight_property:
+            dijkstra_config["relationshipWeightProperty"] = weight_property
+
+        dijkstra_query = """
+        CALL gds.shortestPath.dijkstra.stream($graph_name, $config)
+        YIELD index, sourceNode, targetNode, totalCost, nodeIds, costs
+        RETURN nodeIds AS path,
+            totalCost AS total_cost,
+            size(nodeIds) - 1 AS hops,
+            costs AS step_costs
+        """
+
+        # Shared projection (undirected, with or without weights)
+        async with projection_catalog.borrow(
+            relationship_type,
+            orientation="UNDIRECTED",
+            weight_properties=[weight_property] if weight_property else None,
+            graph_name=opts.get("graph_name")
+        ) as graph_name:
+            async for row in self.execute_query_stream(
+                dijkstra_query,
+                {"graph_name": graph_name, "config": dijkstra_config}
+            ):
+                yield row
+
+    async def _distance_matrix_native(self, source_ids: List[int], target_ids: List[int],
+                                      relationship_type: str, opts: dict,
+                                      include_paths: bool) -> Tuple[np.ndarray, Optional[List[Dict]]]:
+        """One search per distinct source on the snapshot, sources spread over the process pool"""
+        weight_property = opts.get("relationshipWeightProperty")
+        graph, _ = await self._native_graphs(relationship_type, opts, weight_property)
+        self._endpoints(graph, *set(source_ids) | set(target_ids))
+        sources, source_rows = np.unique(graph.index_of(source_ids), return_inverse=True)
+        targets = graph.index_of(target_ids)
+        arrays = {"offsets": graph.offsets, "targets": graph.targets}
+        if weight_property and graph.weights is not None:
+            arrays["weights"] = graph.weights
+        parallel = use_pool(len(sources) * max(graph.relationship_count, 1))
+        tasks = chunks(sources, worker_count() if parallel else 1)
+        with share(parallel, **arrays) as shared:
+            results = await map_reduce(matrix_rows, [(shared, chunk, targets, include_paths) for chunk in tasks], parallel)
+        matrix = np.concatenate([rows for rows, _ in results])[source_rows.ravel()]
+        if not include_paths:
+            return matrix, None
+        per_source = [found for _, chunk_paths in results for found in chunk_paths]
+        paths = [
+            {graph.node_ids[target].item(): graph.node_ids[path].tolist() for target, path in per_source[row].items()}
+            for row in source_rows.ravel().tolist()
+        ]
+        return matrix, paths
+
+    async def _distance_matrix_gds(self, source_ids: List[int], target_ids: List[int],
+                                   relationship_type: str, opts: dict,
+                                   include_paths: bool) -> Tuple[np.ndarray, Optional[List[Dict]]]:
+        """One GDS single-source Dijkstra per distinct source, on one shared projection"""
+        weight_property = opts.get("relationshipWeightProperty")
+        columns: Dict[int, List[int]] = {}
+        for j, target_id in enumerate(target_ids):
+            columns.setdefault(target_id, []).append(j)
+        query = """
+        CALL gds.allShortestPaths.dijkstra.stream($graph_name, $config)
+        YIELD targetNode, totalCost, nodeIds
+        WHERE targetNode IN $targets
+        RETURN targetNode as target, totalCost as total_cost,
+               CASE WHEN $include_paths THEN nodeIds ELSE null END as path
+        """
+        rows: Dict[int, Tuple[np.ndarray, Dict]] = {}
+        async with projection_catalog.borrow(
+            relationship_type,
+            orientation="UNDIRECTED",
+            weight_properties=[weight_property] if weight_property else None,
+            graph_name=opts.get("graph_name")
+        ) as graph_name:
+            for source_id in dict.fromkeys(source_ids):
+                config: Dict[str, Any] = {"sourceNode": source_id}
+                if weight_property:
+                    config["relationshipWeightProperty"] = weight_property
+                row = np.full(len(target_ids), np.inf)
+                found = {}
+                async for record in self.execute_query_stream(query, {
                     "graph_name": graph_name,
-                    "relationship_type": relationship_type
-                }
+                    "config": config,
+                    "targets": list(columns),
+                    "include_paths": include_paths
+                }):
+                    row[columns[record["target"]]] = record["total_cost"]
+                    found[record["target"]] = record["path"]
+                if source_id in columns:
+                    row[columns[source_id]] = 0.0
+                    found[source_id] = [source_id]
+                rows[source_id] = (row, found)
+        matrix = np.array([rows[source_id][0] for source_id in source_ids]).reshape(len(source_ids), len(target_ids))
+        return matrix, [rows[source_id][1] for source_id in source_ids] if include_paths else None
 
-            self.execute_query(create_graph_query, params)
+    async def distance_matrix_array(self, source_ids: List[int], target_ids: List[int],
+                                    relationship_type: str, options: dict = None,
+                                    include_paths: bool = False,
+                                    engine: str = "gds") -> Tuple[np.ndarray, Optional[List[Dict]], Dict]:
+        """
+        Sources x targets distances (inf when unreachable), paths per source as
+        {target id: node ids} when include_paths, and run details
+        """
+        opts = options or {}
+        if not source_ids or not target_ids:
+            raise ValueError("source_node_ids and target_node_ids must not be empty")
+        if len(source_ids) * len(target_ids) > settings.path_matrix_max_pairs:
+            raise ValueError(
+                f"{len(source_ids)} x {len(target_ids)} pairs exceed path_matrix_max_pairs "
+                f"({settings.path_matrix_max_pairs})"
+            )
+        started = time.perf_counter()
+        if engine == "native":
+            matrix, paths = await self._distance_matrix_native(
+                source_ids, target_ids, relationship_type, opts, include_paths
+            )
+        else:
+            matrix, paths = await self._distance_matrix_gds(
+                source_ids, target_ids, relationship_type, opts, include_paths
+            )
+        metadata = {
+            "sources": len(source_ids),
+            "targets": len(target_ids),
+            "searches": len(set(source_ids)),
+            "reachable_pairs": int(np.isfinite(matrix).sum()),
+            "elapsed_seconds": round(time.perf_counter() - started, 4)
+        }
+        return matrix, paths, metadata
+
+    async def distance_matrix(self, source_ids: List[int], target_ids: List[int], relationship_type: str,
+                              options: dict = None, layout: str = "dense", include_paths: bool = False,
+                              engine: str = "gds") -> Dict:
+        """
+        Distance matrix as JSON: {"data", "metadata"}
 
-            # Step 2: Execute Dijkstra
-            dijkstra_config = {
-                "sourceNode": start_id,
-                "targetNode": end_id
+        - dense: distances[i][j] from source i to target j (null when unreachable)
+        - sparse: one row per reachable pair
+        """
+        matrix, paths, metadata = await self.distance_matrix_array(
+            source_ids, target_ids, relationship_type, options, include_paths, engine
+        )
+        if layout == "sparse":
+            return {"data": self._sparse_rows(source_ids, target_ids, matrix, paths), "metadata": metadata}
+        data = {
+            "source_node_ids": source_ids,
+            "target_node_ids": target_ids,
+            "distances": [[None if math.isinf(d) else d for d in row] for row in matrix.tolist()]
+        }
+        if paths is not None:
+            data["paths"] = [[found.get(target_id) for target_id in target_ids] for found in paths]
+        return {"data": data, "metadata": metadata}
+
+    @staticmethod
+    def _sparse_rows(source_ids: List[int], target_ids: List[int], matrix: np.ndarray,
+                     paths: Optional[List[Dict]]) -> List[Dict]:
+        rows = []
+        for i, j in zip(*np.nonzero(np.isfinite(matrix))):
+            row = {
+                "source_node_id": source_ids[i],
+                "target_node_id": target_ids[j],
+                "total_cost": float(matrix[i, j])
             }
+            if paths is not None:
+                row["path"] = paths[i].get(target_ids[j])
+            rows.append(row)
+        return rows
 
-            if weight_property:
-                dijkstra_config["relationshipWeightProperty"] = weight_property
+    async def distance_matrix_stream(self, source_ids: List[int], target_ids: List[int],
+                                     relationship_type: str, options: dict = None,
+                                     include_paths: bool = False, engine: str = "gds"):
+        """Stream the reachable (source, target) pairs, sources in request order"""
+        matrix, paths, metadata = await self.distance_matrix_array(
+            source_ids, target_ids, relationship_type, options, include_paths, engine
+        )
+        report_metadata(metadata)
+        for row in self._sparse_rows(source_ids, target_ids, matrix, paths):
+            yield row
 
-            dijkstra_query = """
-            CALL gds.shortestPath.dijkstra.stream($graph_name, $config)
-            YIELD index, sourceNode, targetNode, totalCost, nodeIds, costs
-            RETURN nodeIds AS path,
-                totalCost AS total_cost,
-                size(nodeIds) - 1 AS hops,
-                costs AS step_costs
-            """
+    async def find_all_shortest_paths_native_stream(self, start_id: int, relationship_type: str,
+                                                    options: dict = None):
+        """
+        Single-source shortest paths on a CSR snapshot, streamed as nodes are settled
 
-            results = self.execute_query(
-                dijkstra_query,
-                {"graph_name": graph_name, "config": dijkstra_config}
-            )
+        The search stops at max_distance / max_targets, so a bounded query only
+        touches the ball it returns.
+        """
+        opts = options or {}
+        weight_property = opts.get("relationshipWeightProperty")
+        forward, _ = await self._native_graphs(relationship_type, {"orientation": "NATURAL", **opts}, weight_property)
+        source, = self._endpoints(forward, start_id)
+        max_targets = opts.get("max_targets")
+        include_paths = opts.get("include_paths", False)
+        settled = settle(forward.offsets, forward.targets, forward.weights if weight_property else None,
+                         source, opts.get("max_distance"))
+        parents: Dict[int, int] = {}
+        hops: Dict[int, int] = {}
+        found = 0
+        while max_targets is None or found < max_targets:
+            # The search advances in batches off the event loop, rows are yielded in between
+            count = SSSP_YIELD_ROWS if max_targets is None else min(SSSP_YIELD_ROWS, max_targets - found)
+            rows = await asyncio.to_thread(_sssp_rows, settled, forward, parents, hops, count, include_paths)
+            for row in rows:
+                yield row
+            found += len(rows)
+            if len(rows) < count:
+                break
 
-            # Step 3: Cleanup
-            try:
-                self.drop_graph(graph_name)
-            except Exception as err:
-                print(f"Cleanup error: {err}")
-
-            return results
-        except Exception as e:
-            # Cleanup in case of error
-            try:
-                self.drop_graph(graph_name)
-            except Exception as err:
-                print(f"Error: {err}")
-                pass
-            raise e
-
-    def find_all_shortest_paths_dijkstra(self, start_id: int, relationship_type: str,
-                                         options: dict = None):
+    async def find_all_shortest_paths_dijkstra(self, start_id: int, relationship_type: str,
+                                               options: dict = None, engine: str = "gds"):
         """
         Find all shortest paths from a source node (Single-Source Shortest Path)
 
             Options:
             - relationshipWeightProperty: weight property
             - max_distance: maximum distance (default: infinity)
+            - max_targets: closest targets returned (default: all)
+            - include_paths: node ids of each path (default: false, distances only)
         """
+        return [row async for row in self.find_all_shortest_paths_dijkstra_stream(
+            start_id, relationship_type, options, engine=engine
+        )]
+
+    async def find_all_shortest_paths_dijkstra_stream(self, start_id: int, relationship_type: str,
+                                                      options: dict = None, engine: str = "gds"):
+        """Stream the shortest paths from the source, closest targets first"""
+        if engine == "native":
+            async for row in self.find_all_shortest_paths_native_stream(start_id, relationship_type, options):
+                yield row
+            return
         opts = options or {}
-        weight_property = opts.get("relationshipWeightProperty", {})
-        graph_name = opts.get("graph_name", f"temp_sssp_{start_id}")
+        weight_property = opts.get("relationshipWeightProperty")
+        max_targets = opts.get("max_targets")
 
-        try:
-            # Create projected graph
-            if weight_property:
-                create_query = """
-                CALL gds.graph.project($graph_name, '*', {
-                    rel: {type: $relationship_type, properties: $weight_property}
-                })
-                """
-                self.execute_query(create_query, {
-                    "graph_name": graph_name,
-                    "relationship_type": relationship_type,
-                    "weight_property": weight_property
-                })
-            else:
-                create_query = """
-                CALL gds.graph.project($graph_name, '*', $relationship_type)
-                """
-                self.execute_query(create_query, {
-                    "graph_name": graph_name,
-                    "relationship_type": relationship_type
-                })
-
-            # Single-Source Shortest Path with Dijkstra
-            config: Dict[str, Any] = {"sourceNode": start_id}
-            if weight_property:
-                config["relationshipWeightProperty"] = weight_property
-
-            sssp_query = """
-            CALL gds.allShortestPaths.dijkstra.stream($graph_name, $config)
-            YIELD index, sourceNode, targetNode, totalCost, nodeIds, costs
-            RETURN targetNode as target_node_id,
-                   totalCost as total_cost,
-                   nodeIds as path,
-                   size(nodeIds) - 1 as hops
-            ORDER BY totalCost
-            """
-
-            results = self.execute_query(sssp_query, {
+        # Single-Source Shortest Path with Dijkstra
+        config: Dict[str, Any] = {"sourceNode": start_id}
+        if weight_property:
+            config["relationshipWeightProperty"] = weight_property
+
+        path_column = ",\n               nodeIds as path" if opts.get("include_paths", False) else ""
+        limit = "LIMIT $max_targets" if max_targets is not None else ""
+        sssp_query = f"""
+        CALL gds.allShortestPaths.dijkstra.stream($graph_name, $config)
+        YIELD index, sourceNode, targetNode, totalCost, nodeIds, costs
+        WHERE $max_distance IS NULL OR totalCost <= $max_distance
+        RETURN targetNode as target_node_id,
+               totalCost as total_cost,
+               size(nodeIds) - 1 as hops{path_column}
+        ORDER BY totalCost
+        {limit}
+        """
+
+        async with projection_catalog.borrow(
+            relationship_type,
+            weight_properties=[weight_property] if weight_property else None,
+            graph_name=opts.get("graph_name")
+        ) as graph_name:
+            async for row in self.execute_query_stream(sssp_query, {
                 "graph_name": graph_name,
-                "config": config
-            })
-
-            # Cleanup
-            try:
-                self.drop_graph(graph_name)
-            except Exception as err:
-                print(f"Error: {err}")
-                pass
-
-            return results
-
-        except Exception as e:
-            try:
-                self.drop_graph(graph_name)
-            except Exception as err:
-                print(f"Error: {err}")
-                pass
-            raise e
\ No newline at end of file
+                "config": config,
+                "max_distance": opts.get("max_distance"),
+                "max_targets": max_targets
+            }):
+                yield row
@@ -1,7 +1,26 @@
-from app.services.base_service import BaseService
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.engines.similarity import batch_similarity, sample_recall, single_source_similarity
+from app.services.base_service import BaseService, report_metadata
+from app.services.projection_catalog import projection_catalog, normalize_orientation
+from app.services.snapshot_service import snapshot_store
+
+# Graph of the relationships pointing back to the shared neighbours
+REVERSED = {"NATURAL": "REVERSE", "REVERSE": "NATURAL", "UNDIRECTED": "UNDIRECTED"}
+# Batch rows serialized (or streamed) together
+BATCH_ROWS = 100_000
 
 class PredictionService(BaseService):
-    def predict_links_v0(self, node_id: int, relationship_type: str, options: dict = None):
+    async def predict_links_v0(self, node_id: int, relationship_type: str, options: dict = None):
         """Predict future links (Node Similarity)"""
         opts = options or {"topK": 10}
         config = {
@@ -20,45 +39,150 @@ class PredictionService(BaseService):
             RETURN node2 as target_node_id, similarity
             ORDER BY similarity DESC
             """
-        return self.execute_query(query, {"config": config, "node_id": node_id})
+        return await self.execute_query(query, {"config": config, "node_id": node_id})
+
+    async def predict_links_native(self, node_id: int, relationship_type: str, options: dict = None):
+        """
+        Link suggestions for one node from its 2-hop neighbourhood on a CSR snapshot
 
-    def predict_links(self, node_id: int, relationship_type: str, options: dict = None):
+        Options: topK, similarityCutoff, degreeCutoff, similarityMetric (JACCARD, COSINE,
+        OVERLAP, ADAMIC_ADAR, RESOURCE_ALLOCATION, COMMON_NEIGHBORS), excludeNeighbors,
+        orientation, snapshot
+        """
         opts = options or {}
-        graph_name = opts.get("graph_name", f"temp_similarity_{id(self)}")
+        orientation = normalize_orientation(opts.get("orientation", "NATURAL"))
+        graph = await snapshot_store.get_graph(opts, relationship_type, orientation=orientation)
+        source = int(graph.index_of([node_id])[0])
+        if source < 0:
+            raise ValueError(f"Node {node_id} is not in the snapshot")
+        backward = await asyncio.to_thread(graph.view, REVERSED[orientation])
+        nodes, scores = await asyncio.to_thread(
+            single_source_similarity,
+            graph, backward, source,
+            metric=opts.get("similarityMetric", "JACCARD"),
+            top_k=opts.get("topK", 10),
+            cutoff=opts.get("similarityCutoff", 0.0),
+            degree_cutoff=opts.get("degreeCutoff", 1),
+            exclude_neighbours=opts.get("excludeNeighbors", False)
+        )
+        return [
+            {"target_node_id": target, "similarity": score}
+            for target, score in zip(graph.node_ids[nodes].tolist(), scores.tolist())
+        ]
 
-        try:
-            self.execute_query("""
-                CALL gds.graph.project($graph_name, '*', $relationship_type)
-            """, {"graph_name": graph_name, "relationship_type": relationship_type})
-
-            config = {
-                "topK": opts.get("topK", 10),
-                "similarityCutoff": opts.get("similarityCutoff", 0.0),
-                "degreeCutoff": opts.get("degreeCutoff", 1),
-                "similarityMetric": opts.get("similarityMetric", "JACCARD")
-            }
-            query = """
-            CALL gds.nodeSimilarity.stream($graph_name, $config)
-            YIELD node1, node2, similarity
-            WHERE node1 = $node_id
-            RETURN node2 as target_node_id, similarity
-            ORDER BY similarity DESC
-            """
-            results = self.execute_query(query, {
+    async def predict_links(self, node_id: int, relationship_type: str, options: dict = None,
+                            engine: str = "gds"):
+        """Predict future links (Node Similarity)"""
+        return [row async for row in self.predict_links_stream(node_id, relationship_type, options, engine=engine)]
+
+    async def predict_links_stream(self, node_id: int, relationship_type: str, options: dict = None,
+                                   engine: str = "gds"):
+        """Stream the link suggestions (most similar first)"""
+        if engine == "native":
+            for row in await self.predict_links_native(node_id, relationship_type, options):
+                yield row
+            return
+        opts = options or {}
+        config = {
+            "topK": opts.get("topK", 10),
+            "similarityCutoff": opts.get("similarityCutoff", 0.0),
+            "degreeCutoff": opts.get("degreeCutoff", 1),
+            "similarityMetric": opts.get("similarityMetric", "JACCARD")
+        }
+        query = """
+        CALL gds.nodeSimilarity.stream($graph_name, $config)
+        YIELD node1, node2, similarity
+        WHERE node1 = $node_id
+        RETURN node2 as target_node_id, similarity
+        ORDER BY similarity DESC
+        """
+        async with projection_catalog.borrow(
+            relationship_type,
+            orientation=opts.get("orientation", "NATURAL"),
+            graph_name=opts.get("graph_name")
+        ) as graph_name:
+            async for row in self.execute_query_stream(query, {
                 "graph_name": graph_name,
                 "config": config,
                 "node_id": node_id
-            })
+            }):
+                yield row
 
-            self.drop_graph(graph_name)
-            return results
-        except Exception as e:
-            try:
-                self.drop_graph(graph_name)
-            except Exception as err:
-                print(f"Error: {err}")
-                pass
-            raise e
+    async def _predict_links_batch(self, relationship_type: str, top_k: int, opts: dict):
+        orientation = normalize_orientation(opts.get("orientation", "NATURAL"))
+        graph = await snapshot_store.get_graph(opts, relationship_type, orientation=orientation)
+        metric = opts.get("similarityMetric", "JACCARD")
+        started = time.perf_counter()
+        node, other, score, report = await batch_similarity(
+            graph, metric, top_k,
+            cutoff=opts.get("similarityCutoff", 0.0),
+            degree_cutoff=opts.get("degreeCutoff", 1),
+            bands=opts.get("bands", 16),
+            rows=opts.get("rowsPerBand", 2),
+            max_bucket=opts.get("maxBucketSize", 100),
+            memory_bytes=opts.get("memoryBudgetBytes", settings.link_batch_memory_bytes),
+            seed=opts.get("randomSeed", 42)
+        )
+        sample = opts.get("recallSample", 100)
+        backward = await asyncio.to_thread(graph.view, REVERSED[orientation])
+        report["recall"] = await asyncio.to_thread(
+            sample_recall, graph, backward, node, other, score, metric, top_k,
+            opts.get("similarityCutoff", 0.0), opts.get("degreeCutoff", 1), sample, opts.get("randomSeed", 42)
+        )
+        report["recall_sample"] = sample
+        report["nodes"] = graph.node_count
+        report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        return graph.node_ids[node], graph.node_ids[other], score, report
+
+    @staticmethod
+    def _write_pairs(output_file: str, node_ids: np.ndarray, target_ids: np.ndarray, scores: np.ndarray) -> str:
+        os.makedirs(settings.link_batch_export_dir, exist_ok=True)
+        path = os.path.join(settings.link_batch_export_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", output_file))
+        with open(path, "w") as out:
+            for start in range(0, len(node_ids), BATCH_ROWS):
+                stop = start + BATCH_ROWS
+                out.writelines(
+                    json.dumps({"node_id": a, "target_node_id": b, "similarity": c}, separators=(",", ":")) + "\n"
+                    for a, b, c in zip(node_ids[start:stop].tolist(), target_ids[start:stop].tolist(),
+                                       scores[start:stop].tolist())
+                )
+        return path
+
+    async def predict_links_batch(self, relationship_type: str, top_k: int = 10, output_file: Optional[str] = None,
+                                  options: dict = None) -> Dict:
+        """
+        Top-k link suggestions of every node in one pass: {"data": rows, "metadata": run report}
+
+        With output_file the rows are written to the export directory and data is empty.
+        """
+        opts = options or {}
+        node_ids, target_ids, scores, report = await self._predict_links_batch(relationship_type, top_k, opts)
+        if output_file:
+            report["output_file"] = await asyncio.to_thread(self._write_pairs, output_file, node_ids, target_ids, scores)
+            return {"data": [], "metadata": report}
+        rows = [
+            {"node_id": a, "target_node_id": b, "similarity": c}
+            for a, b, c in zip(node_ids.tolist(), target_ids.tolist(), scores.tolist())
+        ]
+        return {"data": rows, "metadata": report}
+
+    async def predict_links_batch_stream(self, relationship_type: str, top_k: int = 10,
+                                         output_file: Optional[str] = None, options: dict = None):
+        """Stream the suggestion rows (by node, best first), or the run report once written to output_file"""
+        opts = options or {}
+        node_ids, target_ids, scores, report = await self._predict_links_batch(relationship_type, top_k, opts)
+        if output_file:
+            report["output_file"] = await asyncio.to_thread(self._write_pairs, output_file, node_ids, target_ids, scores)
+            report_metadata(report)
+            yield report
+            return
+        report_metadata(report)
+        for start in range(0, len(node_ids), BATCH_ROWS):
+            stop = start + BATCH_ROWS
+            for a, b, c in zip(node_ids[start:stop].tolist(), target_ids[start:stop].tolist(),
+                               scores[start:stop].tolist()):
+                yield {"node_id": a, "target_node_id": b, "similarity": c}
+            await asyncio.sleep(0)
 
     # def predict_node_properties_v1(self, node_label: str, options: dict = None):
     #     """Predict node properties."""
@@ -72,7 +196,7 @@ class PredictionService(BaseService):
     #     """
     #     return self.execute_query(query, {"options": opts})
 
-    def predict_node_properties(self, node_label: str, property_name: str, options: dict = None):
+    async def predict_node_properties(self, node_label: str, property_name: str, options: dict = None):
         """
         Predict missing node properties (manual implementation)
         Uses FastRP (embeddings) + KNN to predict missing properties
@@ -81,6 +205,10 @@ class PredictionService(BaseService):
             - knn_k: number of neighbors for KNN (default: 10)
             - train_fraction: fraction of nodes with property used for training (default: 0.8)
         """
+        return [row async for row in self.predict_node_properties_stream(node_label, property_name, options)]
+
+    async def predict_node_properties_stream(self, node_label: str, property_name: str, options: dict = None):
+        """Stream the predicted values, one row per node"""
         opts = options or {}
         knn_k = opts.get("knn_k", 10)
 
@@ -122,7 +250,8 @@ class PredictionService(BaseService):
                size(neighbor_values) as confidence_score
         """
 
-        return self.execute_query(query, {"knn_k": knn_k})
+        async for row in self.execute_query_stream(query, {"knn_k": knn_k}):
+            yield row
 
     # def predict_node_properties_with_gds_v1(self, node_label: str, property_name: str,
     #                                      relationship_type: str, options: dict = None):
@@ -186,82 +315,58 @@ class PredictionService(BaseService):
     #         print(f"Error: {e}")
     #         return self.predict_node_properties(node_label, property_name, options)
 
-    def predict_node_properties_with_gds(self, node_label: str, property_name: str,
-                                         relationship_type: str, options: dict = None):
+    async def predict_node_properties_with_gds(self, node_label: str, property_name: str,
+                                               relationship_type: str, options: dict = None):
         """
         Predict properties using GDS FastRP + KNN (advanced method)
 
         Full pipeline:
-        1. Create a projected graph
+        1. Borrow a projected graph from the catalog
         2. Compute FastRP embeddings
-        3. Store embeddings as a temporary property
-        4. Use KNN to predict
-        5. Clean up the projected graph
+        3. Store embeddings as a temporary property (unique per request)
+        4. Use KNN on a temporary projection to predict
+        5. Clean up the temporary projection and property
         """
+        return [row async for row in self.predict_node_properties_with_gds_stream(
+            node_label, property_name, relationship_type, options
+        )]
+
+    async def predict_node_properties_with_gds_stream(self, node_label: str, property_name: str,
+                                                      relationship_type: str, options: dict = None):
+        """Stream the FastRP + KNN predictions (falls back to the simple method before the first row)"""
         opts = options or {}
-        graph_name = opts.get("graph_name", f"temp_graph_{node_label}_{property_name}")
         embedding_dim = opts.get("embedding_dimension", 128)
         knn_k = opts.get("knn_k", 10)
+        # Concurrent requests must not overwrite (or remove) each other's embeddings
+        embedding_property = f"fastrp_embedding_{uuid.uuid4().hex}"
+        emitted = False
 
         try:
-            # Check if the graph already exists; if not, create it
-            check_graph_query = """
-            CALL gds.graph.exists($graph_name) YIELD exists
-            RETURN exists
-            """
-            graph_exists = self.execute_query(check_graph_query, {"graph_name": graph_name})
-
-            if not graph_exists or not graph_exists[0]["exists"]:
-                # Create the projected graph
-                create_graph_query = f"""
-                CALL gds.graph.project(
-                    $graph_name,
-                    '{node_label}',
-                    '{relationship_type}'
-                )
-                YIELD graphName, nodeCount, relationshipCount
-                RETURN graphName, nodeCount, relationshipCount
-                """
-                self.execute_query(create_graph_query, {"graph_name": graph_name})
-
-            # Step 2: Compute and store FastRP embeddings as a node property
+            # Step 1-3: Compute and store FastRP embeddings as a node property
             fastrp_write_query = """
             CALL gds.fastRP.write($graph_name, {
                 embeddingDimension: $embedding_dim,
                 randomSeed: 42,
-                writeProperty: 'fastrp_embedding'
+                writeProperty: $embedding_property
             })
             YIELD nodePropertiesWritten
             RETURN nodePropertiesWritten
             """
-            self.execute_query(fastrp_write_query, {
-                "graph_name": graph_name,
-                "embedding_dim": embedding_dim
-            })
-
-            # Step 3: Create a new graph using the embeddings
-            graph_with_embeddings = f"{graph_name}_with_embeddings"
-            create_embedding_graph_query = f"""
-            CALL gds.graph.project(
-                $graph_with_embeddings,
-                {{
-                    {node_label}: {{
-                        properties: ['fastrp_embedding']
-                    }}
-                }},
-                '*'
-            )
-            YIELD graphName
-            RETURN graphName
-            """
-            self.execute_query(create_embedding_graph_query, {
-                "graph_with_embeddings": graph_with_embeddings
-            })
+            async with projection_catalog.borrow(
+                relationship_type,
+                node_label=node_label,
+                graph_name=opts.get("graph_name")
+            ) as graph_name:
+                await self.execute_query(fastrp_write_query, {
+                    "graph_name": graph_name,
+                    "embedding_dim": embedding_dim,
+                    "embedding_property": embedding_property
+                })
 
             # Step 4: Use KNN to predict missing properties
             knn_predict_query = f"""
             CALL gds.knn.stream($graph_with_embeddings, {{
-                nodeProperties: ['fastrp_embedding'],
+                nodeProperties: [$embedding_property],
                 topK: $knn_k,
                 randomSeed: 42,
                 concurrency: 1,
@@ -287,45 +392,35 @@ class PredictionService(BaseService):
                    confidence_score
             ORDER BY confidence_score DESC
             """
+            async with projection_catalog.temporary_projection(
+                "embeddings",
+                {node_label: {"properties": [embedding_property]}},
+                "*"
+            ) as graph_with_embeddings:
+                async for row in self.execute_query_stream(knn_predict_query, {
+                    "graph_with_embeddings": graph_with_embeddings,
+                    "embedding_property": embedding_property,
+                    "knn_k": knn_k
+                }):
+                    emitted = True
+                    yield row
 
-            results = self.execute_query(knn_predict_query, {
-                "graph_with_embeddings": graph_with_embeddings,
-                "knn_k": knn_k
-            })
-
-            # Step 5: Clean up projected graphs and temporary properties
-            # cleanup_queries = [
-            #     f"CALL gds.graph.drop($graph_with_embeddings) YIELD graphName",
-            #     f"CALL gds.graph.drop($graph_name) YIELD graphName",
-            #     f"MATCH (n:{node_label}) REMOVE n.fastrp_embedding"
-            # ]
+        except Exception as e:
+            if emitted:
+                # Rows were already sent: mixing both methods would be misleading
+                raise
+            # Fallback to the simple method
+            print(f"GDS method failed: {str(e)}, falling back to simple KNN")
+            async for row in self.predict_node_properties_stream(node_label, property_name, options):
+                yield row
 
+        finally:
+            # Step 5: Remove the temporary property
             try:
-                self.drop_graph(graph_with_embeddings)
-                self.drop_graph(graph_name)
-                self.execute_query(f"MATCH (n:{node_label}) REMOVE n.fastrp_embedding")
-                # self.execute_query(cleanup_query, {
-                #     "graph_name": graph_name,
-                #     "graph_with_embeddings": graph_with_embeddings
-                # })
+                await self.execute_query(
+                    f"MATCH (n:{node_label}) WHERE n.{embedding_property} IS NOT NULL "
+                    f"REMOVE n.{embedding_property}"
+                )
             except Exception as e:
                 print(f"Error: {e}")
                 pass  # Ignore cleanup errors
-
-            return results
-
-        except Exception as e:
-            # Cleanup in case of errors
-            try:
-                self.drop_graph(graph_name + "_with_embeddings")
-                self.drop_graph(graph_name)
-                # self.execute_query(f"CALL gds.graph.drop($graph_name)", {"graph_name": graph_name})
-                # self.execute_query(f"CALL gds.graph.drop($graph_with_embeddings)",
-                #                    {"graph_with_embeddings": f"{graph_name}_with_embeddings"})
-            except Exception as err:
-                print(f"Error: {err}")
-                pass
-
-            # Fallback to the simple method
-            print(f"GDS method failed: {str(e)}, falling back to simple KNN")
-            return self.predict_node_properties(node_label, property_name, options)
\ No newline at end of file
@@ -0,0 +1,334 @@
+import asyncio
+import contextvars
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.services.base_service import BaseService
+
+# Aliases accepted by some endpoints (e.g: anomaly) for the GDS orientations
+ORIENTATION_ALIASES = {
+    "OUTGOING": "NATURAL",
+    "INCOMING": "REVERSE",
+    "BOTH": "UNDIRECTED"
+}
+
+ProjectionKey = Tuple[str, str, str, Tuple[str, ...]]
+
+# Every projection created by the service is named with this prefix so that
+# graphs leaked by a crashed worker can be found and swept from the GDS catalog
+TEMP_PREFIX = "temp_"
+
+
+# Set by the job runner: collects the names of the projections a job created,
+# so that cancelling the job can drop them (see ProjectionCatalog.discard)
+projection_owner: contextvars.ContextVar[Optional[Set[str]]] = contextvars.ContextVar(
+    "projection_owner", default=None
+)
+
+
+def new_graph_name(purpose: str) -> str:
+    """Return a unique projection name (safe across requests, workers and restarts)"""
+    return f"{TEMP_PREFIX}{purpose}_{uuid.uuid4().hex}"
+
+
+def normalize_orientation(orientation: Optional[str]) -> str:
+    """Map an orientation (or one of its aliases) to a GDS orientation"""
+    value = (orientation or "NATURAL").upper()
+    value = ORIENTATION_ALIASES.get(value, value)
+    if value not in ("NATURAL", "REVERSE", "UNDIRECTED"):
+        raise ValueError(f"Unknown orientation: {orientation}. Use NATURAL, REVERSE or UNDIRECTED")
+    return value
+
+
+class Projection:
+    """A GDS projected graph owned by the catalog"""
+
+    def __init__(self, key: ProjectionKey, graph_name: str):
+        self.key = key
+        self.graph_name = graph_name
+        self.ref_count = 0
+        self.node_count = 0
+        self.relationship_count = 0
+        self.size_in_bytes = 0
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.ready = asyncio.Event()
+        self.error: Optional[Exception] = None
+
+    def to_dict(self) -> dict:
+        node_label, relationship_type, orientation, weight_properties = self.key
+        return {
+            "graph_name": self.graph_name,
+            "node_label": node_label,
+            "relationship_type": relationship_type,
+            "orientation": orientation,
+            "weight_properties": list(weight_properties),
+            "ref_count": self.ref_count,
+            "node_count": self.node_count,
+            "relationship_count": self.relationship_count,
+            "size_in_bytes": self.size_in_bytes,
+            "idle_seconds": round(time.monotonic() - self.last_used, 3) if self.ref_count == 0 else 0.0
+        }
+
+
+class ProjectionCatalog(BaseService):
+    """
+    Shared catalog of GDS projections
+
+    Projections are keyed by (node label, relationship type, orientation, weight properties)
+    and shared by every service: a graph is projected on first use and then reused until it
+    has been idle longer than the TTL or the memory budget forces its eviction (LRU order).
+    A projection is never dropped while it is borrowed (reference counting).
+
+    The catalog also hands out one-off projections (temporary_projection) and bounds
+    how many projections can be built at the same time against the database.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[ProjectionKey, Projection]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(settings.max_concurrent_projections)
+        # Names of the projections this process currently owns (never swept)
+        self._owned: Set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    @staticmethod
+    def make_key(relationship_type: str, node_label: str = "*", orientation: str = "NATURAL",
+                 weight_properties: Optional[List[str]] = None) -> ProjectionKey:
+        if isinstance(weight_properties, str):
+            weight_properties = [weight_properties]
+        return (
+            node_label or "*",
+            relationship_type or "*",
+            normalize_orientation(orientation),
+            tuple(sorted(set(weight_properties or [])))
+        )
+
+    @asynccontextmanager
+    async def borrow(self, relationship_type: str, node_label: str = "*", orientation: str = "NATURAL",
+                     weight_properties: Optional[List[str]] = None, graph_name: Optional[str] = None):
+        """
+        Borrow a projection and yield its graph name
+
+        If graph_name is given, the caller manages that projection itself and the
+        catalog is bypassed.
+        """
+        if graph_name:
+            yield graph_name
+            return
+
+        key = self.make_key(relationship_type, node_label, orientation, weight_properties)
+        entry = await self._acquire(key)
+        try:
+            yield entry.graph_name
+        finally:
+            await self._release(entry)
+
+    async def _acquire(self, key: ProjectionKey) -> Projection:
+        async with self._lock:
+            entry = self._entries.get(key)
+            created = entry is None
+            if created:
+                entry = Projection(key, new_graph_name("catalog"))
+                self._entries[key] = entry
+                owner = projection_owner.get()
+                if owner is not None:
+                    owner.add(entry.graph_name)
+            entry.ref_count += 1
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(key)
+
+        if created:
+            try:
+                await self._project(entry)
+            except BaseException as e:  # includes cancellation of the borrowing request
+                entry.error = e if isinstance(e, Exception) else RuntimeError("Projection was cancelled")
+                async with self._lock:
+                    entry.ref_count -= 1
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+                raise
+            finally:
+                entry.ready.set()
+            await self.evict()
+        else:
+            await entry.ready.wait()
+            if entry.error is not None:
+                async with self._lock:
+                    entry.ref_count -= 1
+                raise entry.error
+        return entry
+
+    async def _release(self, entry: Projection) -> None:
+        async with self._lock:
+            entry.ref_count -= 1
+            entry.last_used = time.monotonic()
+        await self.evict()
+
+    async def _create(self, graph_name: str, node_projection, relationship_projection) -> List[Dict]:
+        self._owned.add(graph_name)
+        try:
+            return await self.execute_query("""
+                CALL gds.graph.project($graph_name, $node_projection, $relationship_projection)
+                YIELD graphName, nodeCount, relationshipCount
+                RETURN nodeCount, relationshipCount
+            """, {
+                "graph_name": graph_name,
+                "node_projection": node_projection,
+                "relationship_projection": relationship_projection
+            })
+        except BaseException:
+            # A cancelled/failed projection may still have been registered by GDS
+            await self._drop(graph_name)
+            raise
+
+    async def _drop(self, graph_name: str) -> None:
+        await self.drop_graph(graph_name)
+        self._owned.discard(graph_name)
+
+    async def _project(self, entry: Projection) -> None:
+        node_label, relationship_type, orientation, weight_properties = entry.key
+        relationship_projection = {"type": relationship_type, "orientation": orientation}
+        if weight_properties:
+            relationship_projection["properties"] = list(weight_properties)
+
+        async with self._slots:
+            result = await self._create(entry.graph_name, node_label, {"rel": relationship_projection})
+        if result:
+            entry.node_count = result[0]["nodeCount"]
+            entry.relationship_count = result[0]["relationshipCount"]
+
+        size = await self.execute_query("""
+            CALL gds.graph.list($graph_name) YIELD sizeInBytes
+            RETURN sizeInBytes
+        """, {"graph_name": entry.graph_name})
+        if size and size[0]["sizeInBytes"] is not None:
+            entry.size_in_bytes = size[0]["sizeInBytes"]
+
+    async def evict(self) -> None:
+        """Drop idle projections past their TTL, then LRU ones while over the memory budget"""
+        now = time.monotonic()
+        to_drop = []
+        async with self._lock:
+            idle = [e for e in self._entries.values() if e.ref_count == 0 and e.ready.is_set()]
+            for entry in idle:
+                if now - entry.last_used > settings.projection_idle_ttl_seconds:
+                    to_drop.append(entry)
+
+            total = sum(e.size_in_bytes for e in self._entries.values() if e not in to_drop)
+            for entry in idle:  # OrderedDict order == least recently used first
+                if total <= settings.projection_memory_budget_bytes:
+                    break
+                if entry not in to_drop:
+                    to_drop.append(entry)
+                    total -= entry.size_in_bytes
+
+            for entry in to_drop:
+                del self._entries[entry.key]
+
+        for entry in to_drop:
+            await self._drop(entry.graph_name)
+
+    async def invalidate(self, relationship_type: Optional[str] = None) -> int:
+        """Drop every idle projection (optionally only those of a relationship type)"""
+        async with self._lock:
+            to_drop = [
+                e for e in self._entries.values()
+                if e.ref_count == 0 and e.ready.is_set()
+                and (relationship_type is None or e.key[1] == relationship_type)
+            ]
+            for entry in to_drop:
+                del self._entries[entry.key]
+        for entry in to_drop:
+            await self._drop(entry.graph_name)
+        return len(to_drop)
+
+    @asynccontextmanager
+    async def temporary_projection(self, purpose: str, node_projection, relationship_projection):
+        """
+        Create a one-off projection under a unique name and drop it on exit
+
+        Used for graphs that cannot be shared (e.g: projections carrying
+        per-request node properties). Holds an in-flight slot for its whole lifetime.
+        """
+        graph_name = new_graph_name(purpose)
+        async with self._slots:
+            await self._create(graph_name, node_projection, relationship_projection)
+            try:
+                yield graph_name
+            finally:
+                await self._drop(graph_name)
+
+    async def sweep_orphans(self) -> int:
+        """
+        Drop temp_* graphs left in the GDS catalog by crashed or killed workers
+
+        Only graphs not owned by this process and older than the orphan age are
+        dropped, so live projections of other workers are left alone.
+        """
+        result = await self.execute_query("""
+            CALL gds.graph.list() YIELD graphName, creationTime
+            WHERE graphName STARTS WITH $prefix
+              AND creationTime < datetime() - duration({seconds: $min_age})
+            RETURN graphName
+        """, {"prefix": TEMP_PREFIX, "min_age": int(settings.orphan_projection_min_age_seconds)})
+
+        orphans = [row["graphName"] for row in result if row["graphName"] not in self._owned]
+        for graph_name in orphans:
+            await self.drop_graph(graph_name)
+        if orphans:
+            print(f"Swept {len(orphans)} orphan projection(s)")
+        return len(orphans)
+
+    async def discard(self, graph_names: Set[str]) -> int:
+        """Drop the given catalog projections right away if nobody else is using them"""
+        async with self._lock:
+            to_drop = [
+                e for e in self._entries.values()
+                if e.graph_name in graph_names and e.ref_count == 0 and e.ready.is_set()
+            ]
+            for entry in to_drop:
+                del self._entries[entry.key]
+        for entry in to_drop:
+            await self._drop(entry.graph_name)
+        return len(to_drop)
+
+    def list_projections(self) -> List[Dict]:
+        return [entry.to_dict() for entry in self._entries.values()]
+
+    async def _every(self, interval: float, job) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await job()
+            except Exception as e:
+                print(f"Error: {e}")
+
+    async def start(self) -> None:
+        try:
+            await self.sweep_orphans()
+        except Exception as e:
+            # GDS may not be installed: the service still starts
+            print(f"Error: {e}")
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._every(max(1.0, settings.projection_idle_ttl_seconds / 2), self.evict)),
+                asyncio.create_task(self._every(settings.orphan_sweep_interval_seconds, self.sweep_orphans))
+            ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        async with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            await self._drop(entry.graph_name)
+
+
+projection_catalog = ProjectionCatalog()
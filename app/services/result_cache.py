@@ -0,0 +1,202 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from app.config import settings
+from app.services.base_service import BaseService
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=str, sort_keys=True, separators=(",", ":"))
+
+
+class CacheBackend:
+    """Storage used by the result cache (entries are {"fingerprint": ..., "data": ...} dicts)"""
+
+    async def get(self, key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def set(self, key: str, entry: dict, size: int) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InMemoryBackend(CacheBackend):
+    """In-process LRU bounded by the (serialized) size of its entries"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[str, Tuple[dict, int]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[dict]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        self._entries.move_to_end(key)
+        return item[0]
+
+    async def set(self, key: str, entry: dict, size: int) -> None:
+        if size > self.max_bytes:
+            return  # Would evict everything else
+        await self.delete(key)
+        self._entries[key] = (entry, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+
+    async def delete(self, key: str) -> None:
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self.bytes -= item[1]
+
+    async def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+
+class RedisBackend(CacheBackend):
+    """
+    Shared backend (several workers/instances)
+
+    Any client exposing the redis.asyncio get/set/delete/scan_iter API can be
+    passed in (e.g: a local stand-in in tests).
+    """
+
+    def __init__(self, url: str = None, client=None, prefix: str = "graph-analysis:cache:"):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise ImportError("The redis package is required for result_cache_backend='redis'")
+            client = redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[dict]:
+        raw = await self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, entry: dict, size: int) -> None:
+        await self.client.set(self.prefix + key, _dumps(entry), ex=int(settings.result_cache_ttl_seconds))
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(self.prefix + key)
+
+    async def clear(self) -> None:
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            await self.client.delete(key)
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "prefix": self.prefix}
+
+
+class ResultCache(BaseService):
+    """
+    Cache of analysis results keyed by the normalized request
+
+    Each entry stores the graph fingerprint it was computed on; an entry whose
+    fingerprint differs from the current one is a miss (the graph has changed).
+    """
+
+    def __init__(self, backend: CacheBackend = None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._fingerprint: Optional[str] = None
+        self._fingerprint_at = 0.0
+        # Bumped whenever a snapshot is dropped or reloaded: native results are stale then
+        self.snapshot_generation = 0
+
+    def get_backend(self) -> CacheBackend:
+        if self.backend is None:
+            if settings.result_cache_backend == "redis":
+                self.backend = RedisBackend(settings.result_cache_redis_url)
+            else:
+                self.backend = InMemoryBackend(settings.result_cache_max_bytes)
+        return self.backend
+
+    @staticmethod
+    def make_key(namespace: str, payload: Any) -> str:
+        return hashlib.sha256(_dumps({"ns": namespace, "request": payload}).encode()).hexdigest()
+
+    async def fingerprint(self) -> str:
+        """
+        Cheap graph version: node/relationship counts (count store) plus an optional
+        last-write marker, refreshed at most every result_cache_fingerprint_ttl_seconds
+        """
+        now = time.monotonic()
+        if self._fingerprint is not None and now - self._fingerprint_at < settings.result_cache_fingerprint_ttl_seconds:
+            return self._fingerprint
+
+        # Independent count subqueries: a graph without relationships still returns a row
+        counts = await self.execute_query("""
+            RETURN COUNT { MATCH (n) } as nodes,
+                   COUNT { MATCH ()-[r]->() } as relationships
+        """)
+        parts = [counts[0]["nodes"], counts[0]["relationships"]] if counts else [0, 0]
+        if settings.result_cache_write_marker_query:
+            marker = await self.execute_query(settings.result_cache_write_marker_query)
+            parts.append(marker[0].get("marker") if marker else None)
+
+        self._fingerprint = _dumps(parts)
+        self._fingerprint_at = now
+        return self._fingerprint
+
+    def invalidate_fingerprint(self) -> None:
+        self._fingerprint = None
+
+    def invalidate_snapshots(self) -> None:
+        self.snapshot_generation += 1
+
+    async def get_or_compute(self, namespace: str, payload: Any,
+                             compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (result, served_from_cache)"""
+        if not settings.result_cache_enabled:
+            return await compute(), False
+
+        backend = self.get_backend()
+        key = self.make_key(namespace, payload)
+        fingerprint = f"{await self.fingerprint()}#{self.snapshot_generation}"
+
+        entry = await backend.get(key)
+        if entry is not None and entry.get("fingerprint") == fingerprint:
+            self.hits += 1
+            return entry["data"], True
+        if entry is not None:
+            await backend.delete(key)
+
+        self.misses += 1
+        data = await compute()
+        entry = {"fingerprint": fingerprint, "data": data}
+        await backend.set(key, entry, len(_dumps(entry)))
+        return data, False
+
+    async def clear(self) -> None:
+        await self.get_backend().clear()
+        self.invalidate_fingerprint()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.result_cache_enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            **self.get_backend().stats()
+        }
+
+
+result_cache = ResultCache()
@@ -0,0 +1,222 @@
+import asyncio
+import time
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.engines.csr import CSRGraph
+from app.services.base_service import BaseService
+from app.services.result_cache import result_cache
+
+
+class SnapshotConflict(ValueError):
+    """Raised when a snapshot name is already used by a different (label, relationship type, weight)"""
+
+
+def _label_pattern(node_label: Optional[str]) -> str:
+    return f":`{node_label}`" if node_label and node_label != "*" else ""
+
+
+class Snapshot:
+    """An in-memory CSR copy of a (label, relationship type, weight) slice of the graph"""
+
+    def __init__(self, name: str, node_label: Optional[str], relationship_type: Optional[str],
+                 weight_property: Optional[str]):
+        self.name = name
+        self.node_label = node_label
+        self.relationship_type = relationship_type
+        self.weight_property = weight_property
+        self.graph: Optional[CSRGraph] = None
+        self.loaded_at: Optional[float] = None
+        self.load_seconds: Optional[float] = None
+        # Graph fingerprint (see ResultCache.fingerprint) at load time
+        self.fingerprint: Optional[str] = None
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def to_dict(self) -> dict:
+        graph = self.graph
+        return {
+            "name": self.name,
+            "node_label": self.node_label,
+            "relationship_type": self.relationship_type,
+            "weight_property": self.weight_property,
+            "node_count": graph.node_count if graph is not None else None,
+            "relationship_count": graph.relationship_count if graph is not None else None,
+            "size_in_bytes": graph.views_nbytes() if graph is not None else None,
+            "views": sorted(graph._views) if graph is not None else [],
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "fingerprint": self.fingerprint
+        }
+
+    def spec(self) -> tuple:
+        return self.node_label or None, self.relationship_type or None, self.weight_property or None
+
+
+class SnapshotService(BaseService):
+    """
+    Registry of CSR snapshots bulk-loaded from Neo4j
+
+    Snapshots are the local compute substrate of the native engines: they are
+    queried in memory and do not need the GDS plugin.
+    """
+
+    def __init__(self):
+        self._snapshots: "OrderedDict[str, Snapshot]" = OrderedDict()
+        # Called with the name of every dropped or evicted snapshot (indexes built on it)
+        self._drop_listeners: List[Callable[[str], None]] = []
+
+    def on_drop(self, listener: Callable[[str], None]) -> None:
+        self._drop_listeners.append(listener)
+
+    def _dropped(self, name: str) -> None:
+        result_cache.invalidate_snapshots()
+        for listener in self._drop_listeners:
+            listener(name)
+
+    @staticmethod
+    def default_name(node_label: Optional[str], relationship_type: Optional[str],
+                     weight_property: Optional[str] = None) -> str:
+        return f"{node_label or '*'}:{relationship_type or '*'}:{weight_property or '-'}"
+
+    async def _load_graph(self, snapshot: Snapshot) -> CSRGraph:
+        label = _label_pattern(snapshot.node_label)
+        rel = f":`{snapshot.relationship_type}`" if snapshot.relationship_type else ""
+        batch = settings.snapshot_fetch_size
+
+        node_ids = array("q")
+        async for row in self.execute_query_stream(f"MATCH (n{label}) RETURN id(n) as id", {}):
+            node_ids.append(row["id"])
+
+        sources, targets, weights = array("q"), array("q"), array("f")
+        query = f"""
+        MATCH (a{label})-[r{rel}]->(b{label})
+        RETURN id(a) as s, id(b) as t, {"r[$weight_property]" if snapshot.weight_property else "null"} as w
+        """
+        async for row in self.execute_query_stream(query, {"weight_property": snapshot.weight_property}):
+            sources.append(row["s"])
+            targets.append(row["t"])
+            if snapshot.weight_property:
+                w = row["w"]
+                weights.append(float(w) if w is not None else settings.snapshot_default_weight)
+            if len(sources) % batch == 0:
+                await asyncio.sleep(0)  # Let other requests run during big loads
+
+        return await asyncio.to_thread(
+            CSRGraph.from_edges,
+            np.frombuffer(node_ids, dtype=np.int64) if node_ids else np.zeros(0, dtype=np.int64),
+            np.frombuffer(sources, dtype=np.int64) if sources else np.zeros(0, dtype=np.int64),
+            np.frombuffer(targets, dtype=np.int64) if targets else np.zeros(0, dtype=np.int64),
+            np.frombuffer(weights, dtype=np.float32) if snapshot.weight_property else None
+        )
+
+    async def _load(self, snapshot: Snapshot) -> Snapshot:
+        started = time.perf_counter()
+        fingerprint = await result_cache.fingerprint()
+        snapshot.graph = await self._load_graph(snapshot)
+        snapshot.fingerprint = fingerprint
+        snapshot.loaded_at = time.time()
+        snapshot.load_seconds = round(time.perf_counter() - started, 3)
+        self._evict(keep=snapshot.name)
+        return snapshot
+
+    def _evict(self, keep: str) -> None:
+        """Drop least recently used snapshots while over the memory budget"""
+        total = sum(s.graph.views_nbytes() for s in self._snapshots.values() if s.graph is not None)
+        for name in list(self._snapshots):
+            if total <= settings.snapshot_memory_budget_bytes:
+                break
+            snapshot = self._snapshots[name]
+            if name == keep or snapshot.graph is None or snapshot.lock.locked():
+                continue
+            total -= snapshot.graph.views_nbytes()
+            del self._snapshots[name]
+            self._dropped(name)
+
+    async def create(self, node_label: Optional[str] = None, relationship_type: Optional[str] = None,
+                     weight_property: Optional[str] = None, name: Optional[str] = None) -> Snapshot:
+        """
+        Load a snapshot (or return it if a snapshot with that name is already loaded)
+
+        Raises SnapshotConflict when the name is taken by another (label, relationship
+        type, weight property): drop it first.
+        """
+        name = name or self.default_name(node_label, relationship_type, weight_property)
+        snapshot = self._snapshots.get(name)
+        if snapshot is None:
+            snapshot = Snapshot(name, node_label, relationship_type, weight_property)
+            self._snapshots[name] = snapshot
+        elif snapshot.spec() != (node_label or None, relationship_type or None, weight_property or None):
+            raise SnapshotConflict(
+                f"Snapshot {name} is already loaded with node_label={snapshot.node_label}, "
+                f"relationship_type={snapshot.relationship_type}, weight_property={snapshot.weight_property}; "
+                f"drop it before loading another graph under this name"
+            )
+        async with snapshot.lock:
+            if snapshot.graph is None:
+                try:
+                    await self._load(snapshot)
+                except Exception:
+                    self._snapshots.pop(name, None)
+                    raise
+        snapshot.last_used = time.monotonic()
+        self._snapshots.move_to_end(name)
+        return snapshot
+
+    async def get_graph(self, options: dict, relationship_type: Optional[str], node_label: Optional[str] = None,
+                        weight_property: Optional[str] = None, orientation: str = "NATURAL") -> CSRGraph:
+        """
+        Resolve the CSR graph used by a native engine
+
+        options["snapshot"] names an existing snapshot; otherwise the snapshot matching
+        (label, relationship type, weight property) is loaded on first use. A named
+        snapshot must be loaded with the requested weight property: the engines would
+        otherwise run unweighted without notice.
+        """
+        name = (options or {}).get("snapshot")
+        if name:
+            snapshot = self.get(name)
+            if snapshot is None:
+                raise ValueError(f"Snapshot {name} not found")
+            if weight_property and snapshot.weight_property != weight_property:
+                raise ValueError(
+                    f"Snapshot {name} is weighted by {snapshot.weight_property or 'no property'}, "
+                    f"not {weight_property}"
+                )
+        else:
+            snapshot = await self.create(node_label, relationship_type, weight_property)
+        # The first REVERSE / UNDIRECTED view sorts every edge: build it off the event loop
+        return await asyncio.to_thread(snapshot.graph.view, orientation)
+
+    async def refresh(self, name: str) -> Optional[Snapshot]:
+        snapshot = self._snapshots.get(name)
+        if snapshot is None:
+            return None
+        async with snapshot.lock:
+            await self._load(snapshot)
+        result_cache.invalidate_snapshots()
+        return snapshot
+
+    def get(self, name: str) -> Optional[Snapshot]:
+        snapshot = self._snapshots.get(name)
+        if snapshot is not None and snapshot.graph is not None:
+            snapshot.last_used = time.monotonic()
+            self._snapshots.move_to_end(name)
+            return snapshot
+        return None
+
+    def drop(self, name: str) -> bool:
+        if self._snapshots.pop(name, None) is None:
+            return False
+        self._dropped(name)
+        return True
+
+    def list_snapshots(self) -> List[Dict]:
+        return [s.to_dict() for s in self._snapshots.values() if s.graph is not None]
+
+
+snapshot_store = SnapshotService()
@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+from typing import AsyncIterator, Dict, Literal, Optional
+
+import numpy as np
+from fastapi.responses import Response, StreamingResponse
+
+OutputFormat = Literal["json", "ndjson", "csv"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv"
+}
+
+# Rows are grouped before being written to the socket to limit per-row overhead
+CHUNK_ROWS = 500
+
+
+def _dumps(value) -> str:
+    # default=str covers the Neo4j temporal/spatial types
+    return json.dumps(value, default=str, separators=(",", ":"))
+
+
+async def _ndjson_chunks(first: Optional[Dict], rows: AsyncIterator[Dict]) -> AsyncIterator[str]:
+    buffer = []
+    if first is not None:
+        buffer.append(_dumps(first))
+    try:
+        async for row in rows:
+            buffer.append(_dumps(row))
+            if len(buffer) >= CHUNK_ROWS:
+                yield "\n".join(buffer) + "\n"
+                buffer = []
+    except Exception as e:
+        # Headers are already sent: report the failure as the last line
+        buffer.append(_dumps({"error": str(e)}))
+    if buffer:
+        yield "\n".join(buffer) + "\n"
+
+
+async def _csv_chunks(first: Optional[Dict], rows: AsyncIterator[Dict]) -> AsyncIterator[str]:
+    if first is None:
+        return
+    out = io.StringIO()
+    writer = csv.writer(out)
+    columns = list(first.keys())
+    writer.writerow(columns)
+
+    def write(row: Dict):
+        # Nested values (lists, maps) are written as JSON
+        writer.writerow([
+            _dumps(row.get(c)) if isinstance(row.get(c), (list, dict)) else row.get(c)
+            for c in columns
+        ])
+
+    write(first)
+    count = 1
+    async for row in rows:
+        write(row)
+        count += 1
+        if count % CHUNK_ROWS == 0:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate(0)
+    yield out.getvalue()
+
+
+async def stream_rows(rows: AsyncIterator[Dict], output_format: OutputFormat) -> StreamingResponse:
+    """
+    Wrap a row generator into a NDJSON or CSV streaming response
+
+    The first row is pulled before the response starts, so errors raised while
+    projecting the graph or starting the query still surface as a HTTP error.
+    """
+    try:
+        first = await rows.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    if output_format == "csv":
+        body = _csv_chunks(first, rows)
+    else:
+        body = _ndjson_chunks(first, rows)
+    return StreamingResponse(body, media_type=MEDIA_TYPES[output_format])
+
+
+def array_response(array: np.ndarray, filename: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    """A NumPy array as a .npy download (np.load reads it back, shape and dtype included)"""
+    out = io.BytesIO()
+    np.save(out, array, allow_pickle=False)
+    return Response(
+        out.getvalue(),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', **(headers or {})}
+    )